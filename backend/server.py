@@ -1,4 +1,5 @@
 from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks, Depends, Header, Request
+from fastapi.responses import Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -8,7 +9,7 @@ from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
 from typing import List, Optional, Dict, Any
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 import httpx
 import json
 from emergentintegrations.llm.chat import LlmChat, UserMessage
@@ -45,10 +46,16 @@ if ATTRACTIONS_FILE.exists():
 # Load districts data
 DISTRICTS_FILE = ROOT_DIR.parent / 'frontend' / 'src' / 'data' / 'districts.js'
 
+# Local settlement gazetteer for offline reverse geocoding (CSV: name,hromada,district,lat,lng)
+GAZETTEER_FILE = Path(os.environ.get('GAZETTEER_FILE', ROOT_DIR / 'data' / 'settlements.csv'))
+ROAD_GRAPH_FILE = Path(os.environ.get('ROAD_GRAPH_FILE', ROOT_DIR / 'data' / 'road_graph.npz'))
+
 # ============= GEOPANDAS MODULE (Розділ 2.5) =============
 # Інтеграція з геоінформаційними інструментами GeoPandas та Shapely
 import geopandas as gpd
 from shapely.geometry import Point, shape
+from shapely.ops import unary_union
+from shapely.validation import make_valid
 import re
 
 # Райони Житомирської області з GeoJSON (згідно Розділу 2.5)
@@ -62,6 +69,13 @@ def load_districts_geojson():
     global DISTRICTS_GEODATA
     
     try:
+        # Точні полігони з districts.js (кеш геометрій); прямокутні межі нижче - резервний варіант
+        geometry_cache = get_district_geometry()
+        if geometry_cache.districts:
+            DISTRICTS_GEODATA = gpd.GeoDataFrame(geometry_cache.as_features(), crs="EPSG:4326")
+            print(f"[GeoPandas] Loaded {len(DISTRICTS_GEODATA)} district polygons into GeoDataFrame")
+            return True
+        
         # Парсимо JavaScript файл для отримання GeoJSON даних
         if DISTRICTS_FILE.exists():
             with open(DISTRICTS_FILE, 'r', encoding='utf-8') as f:
@@ -126,6 +140,7 @@ def load_districts_geojson():
             
             # Створюємо GeoDataFrame
             DISTRICTS_GEODATA = gpd.GeoDataFrame(features, crs="EPSG:4326")
+            DISTRICTS_GEODATA["area_km2"] = DISTRICTS_GEODATA.to_crs(METRIC_CRS).area / 1e6
             print(f"[GeoPandas] Loaded {len(DISTRICTS_GEODATA)} districts into GeoDataFrame")
             return True
             
@@ -136,6 +151,172 @@ def load_districts_geojson():
     return False
 
 
+# Точні полігони районів з districts.js (GeoJSON Feature у полі bounds)
+DISTRICT_POLYGONS = None
+
+
+def load_district_polygons() -> list:
+    """
+    Витягує GeoJSON полігони районів з districts.js.
+    Повертає список {"id", "name", "geometry"} (геометрія shapely, EPSG:4326).
+    """
+    global DISTRICT_POLYGONS
+
+    if DISTRICT_POLYGONS is not None:
+        return DISTRICT_POLYGONS
+
+    DISTRICT_POLYGONS = []
+    if not DISTRICTS_FILE.exists():
+        return DISTRICT_POLYGONS
+
+    try:
+        with open(DISTRICTS_FILE, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+        for match in re.finditer(r'bounds:\s*\{', content):
+            # Пошук кінця об'єкта за балансом фігурних дужок
+            start = match.end() - 1
+            depth = 0
+            for end in range(start, len(content)):
+                if content[end] == '{':
+                    depth += 1
+                elif content[end] == '}':
+                    depth -= 1
+                    if depth == 0:
+                        break
+            feature = json.loads(content[start:end + 1])
+            properties = feature.get('properties', {})
+            geometry = shape(feature['geometry'])
+            if not geometry.is_valid:
+                # Контури з OSM мають самоперетини - виправляємо, залишаючи лише полігони
+                fixed = make_valid(geometry)
+                parts = [g for g in getattr(fixed, 'geoms', [fixed]) if g.geom_type in ('Polygon', 'MultiPolygon')]
+                geometry = unary_union(parts)
+            DISTRICT_POLYGONS.append({
+                "id": properties.get('id'),
+                "name": properties.get('name'),
+                "geometry": geometry
+            })
+        print(f"[GeoPandas] Loaded {len(DISTRICT_POLYGONS)} district polygons from districts.js")
+    except Exception as e:
+        print(f"[GeoPandas] Error parsing district polygons: {str(e)}")
+
+    return DISTRICT_POLYGONS
+
+
+# ============= DISTRICT GEOMETRY CACHE =============
+# Спрощені версії полігонів районів для різних масштабів та попередньо обчислені
+# площа, центроїд і межі - замість обчислення при кожному запиті
+
+DISTRICT_SIMPLIFY_TOLERANCES = (0.0, 0.0005, 0.002, 0.008, 0.03)  # градуси; 0 - повна точність
+METRIC_CRS = "EPSG:32635"  # UTM 35N - метрична проєкція для Житомирської області
+
+
+class DistrictGeometryCache:
+    """
+    Кеш геометрій районів.
+
+    levels[tolerance] - спрощені полігони (спільні межі зберігаються, якщо полігони
+    утворюють коректне покриття; інакше кожен полігон спрощується зі збереженням топології),
+    geojson[tolerance] - серіалізований FeatureCollection (байти) для віддачі без обробки.
+    """
+
+    def __init__(self, districts: list):
+        import shapely
+
+        self.districts = districts
+        self.levels = {}
+        self.geojson = {}
+        self.info = []
+        if not districts:
+            return
+
+        geometries = [d["geometry"] for d in districts]
+        projected = gpd.GeoSeries(geometries, crs="EPSG:4326").to_crs(METRIC_CRS)
+        centroids = projected.centroid.to_crs("EPSG:4326")
+        for d, area_m2, centroid in zip(districts, projected.area, centroids):
+            lng_min, lat_min, lng_max, lat_max = d["geometry"].bounds
+            self.info.append({
+                "id": d["id"],
+                "name": d["name"],
+                "area_km2": round(float(area_m2) / 1e6, 2),
+                "centroid": [round(centroid.y, 6), round(centroid.x, 6)],
+                "bounds": [round(lng_min, 6), round(lat_min, 6), round(lng_max, 6), round(lat_max, 6)]
+            })
+
+        is_coverage = bool(shapely.coverage_is_valid(geometries))
+        for tolerance in DISTRICT_SIMPLIFY_TOLERANCES:
+            if tolerance == 0:
+                simplified = geometries
+            elif is_coverage:
+                simplified = list(shapely.coverage_simplify(geometries, tolerance))
+            else:
+                simplified = [g.simplify(tolerance, preserve_topology=True) for g in geometries]
+            self.levels[tolerance] = simplified
+            self.geojson[tolerance] = self._serialize(simplified, tolerance)
+
+    def _serialize(self, geometries: list, tolerance: float) -> bytes:
+        import shapely
+        from shapely.geometry import mapping
+
+        features = []
+        for info, geometry in zip(self.info, geometries):
+            rounded = shapely.transform(geometry, lambda coords: np.round(coords, 5))
+            features.append({
+                "type": "Feature",
+                "id": info["id"],
+                "properties": {**info, "tolerance": tolerance},
+                "geometry": mapping(rounded)
+            })
+        return json.dumps(
+            {"type": "FeatureCollection", "features": features},
+            ensure_ascii=False, separators=(',', ':')
+        ).encode('utf-8')
+
+    @property
+    def metric_geometries(self) -> list:
+        """Повні полігони районів у METRIC_CRS (обчислюються один раз)"""
+        if not hasattr(self, '_metric_geometries'):
+            self._metric_geometries = list(
+                gpd.GeoSeries([d["geometry"] for d in self.districts], crs="EPSG:4326").to_crs(METRIC_CRS)
+            ) if self.districts else []
+        return self._metric_geometries
+
+    @staticmethod
+    def tolerance_for_zoom(zoom: Optional[int]) -> float:
+        """Найбільший допуск, що не перевищує розмір пікселя тайла 256px на цьому масштабі"""
+        if zoom is None:
+            return 0.0
+        pixel_deg = 360.0 / (2 ** zoom * 256)
+        return max(t for t in DISTRICT_SIMPLIFY_TOLERANCES if t <= pixel_deg)
+
+    def as_features(self) -> list:
+        """Записи для GeoDataFrame районів (повна геометрія + попередньо обчислені атрибути)"""
+        return [
+            {
+                "id": info["id"],
+                "name": info["name"],
+                "center_lat": info["centroid"][0],
+                "center_lng": info["centroid"][1],
+                "area_km2": info["area_km2"],
+                "geometry": d["geometry"]
+            }
+            for info, d in zip(self.info, self.districts)
+        ]
+
+
+DISTRICT_GEOMETRY = None
+
+
+def get_district_geometry() -> DistrictGeometryCache:
+    """Кеш геометрій районів (будується один раз при першому зверненні)"""
+    global DISTRICT_GEOMETRY
+
+    if DISTRICT_GEOMETRY is None:
+        DISTRICT_GEOMETRY = DistrictGeometryCache(load_district_polygons())
+    return DISTRICT_GEOMETRY
+
+
 def determine_district_for_point(lat: float, lng: float) -> dict:
     """
     Визначення районної приналежності точки за допомогою spatial join (Розділ 2.5)
@@ -171,7 +352,7 @@ def determine_district_for_point(lat: float, lng: float) -> dict:
         closest_district = None
         
         for idx, row in DISTRICTS_GEODATA.iterrows():
-            distance = point.distance(row.geometry.centroid)
+            distance = point.distance(Point(row["center_lng"], row["center_lat"]))
             if distance < min_distance:
                 min_distance = distance
                 closest_district = {
@@ -242,9 +423,8 @@ def calculate_district_statistics_geopandas():
                 category_counts = district_data["category"].value_counts()
                 dominant_category = category_counts.index[0] if len(category_counts) > 0 else "Невизначено"
                 
-                # Площа району (приблизна, в км²)
-                # Для Житомирської області середня площа району ~5000-7000 км²
-                area_km2 = district_row.geometry.area * 111 * 111  # Приблизний розрахунок
+                # Площа району в км² (попередньо обчислена в метричній проєкції)
+                area_km2 = district_row["area_km2"]
                 
                 district_stats.append({
                     "district_id": district_id,
@@ -342,6 +522,7 @@ class TripPlace(BaseModel):
     coordinates: Dict[str, float]
     category: Optional[str] = None
     order: int = 0
+    day: Optional[int] = None
 
 class TripPlan(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -350,6 +531,7 @@ class TripPlan(BaseModel):
     name: str
     description: Optional[str] = None
     places: List[TripPlace] = []
+    start: Optional[Dict[str, float]] = None  # точка, з якої починається кожен день (генератор маршрутів)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     total_distance: Optional[float] = None
@@ -359,6 +541,18 @@ class TripPlanCreate(BaseModel):
     name: str
     description: Optional[str] = None
     places: List[TripPlace] = []
+    start: Optional[Dict[str, float]] = None
+    optimize: Optional[bool] = None  # None -> TRIP_AUTO_OPTIMIZE
+
+class TripGenerateRequest(BaseModel):
+    start: Dict[str, float]  # {"lat": ..., "lng": ...}
+    days: int = 1
+    preferences: Dict[str, float] = {}  # вага категорії, як у /recommendations/personalized
+    daily_hours: float = 8.0
+    visited_ids: List[str] = []
+    name: Optional[str] = None
+    profile: str = "car"  # car | bike | foot
+    start_date: Optional[datetime] = None  # початок першого дня; враховуються години роботи
 
 
 # Feedback/Complaint Models
@@ -398,6 +592,7 @@ class PlaceUpdate(BaseModel):
     website: Optional[str] = None
     photos: Optional[List[str]] = None
     category: Optional[str] = None
+    coordinates: Optional[Dict[str, float]] = None
 
 
 # ============= CLUSTER ANALYTICS FUNCTIONS =============
@@ -637,19 +832,23 @@ def prepare_feature_vector(attractions_data: list, use_categories: bool = True,
     return np.array(feature_vectors), valid_attractions
 
 
-def normalize_features(X: 'np.ndarray', feature_weights: dict = None):
+def normalize_features(X: 'np.ndarray', feature_weights: dict = None, scaler=None):
     """
     Нормалізація ознак за методом Z-score (формули 2.11, 2.12):
     lat_norm = (lat - μ_lat) / σ_lat
     lon_norm = (lon - μ_lon) / σ_lon
     
-    Застосовує вагові коефіцієнти для різних типів ознак
+    Застосовує вагові коефіцієнти для різних типів ознак.
+    Якщо передано вже навчений scaler, ознаки лише трансформуються ним.
     """
     from sklearn.preprocessing import StandardScaler
     import numpy as np
     
-    scaler = StandardScaler()
-    X_normalized = scaler.fit_transform(X)
+    if scaler is None:
+        scaler = StandardScaler()
+        X_normalized = scaler.fit_transform(X)
+    else:
+        X_normalized = scaler.transform(X)
     
     # Застосовуємо вагові коефіцієнти
     if feature_weights:
@@ -787,235 +986,3464 @@ def calculate_clustering_metrics():
     }
 
 
-# Admin auth helper
-async def verify_admin(authorization: str = Header(None)):
-    if not authorization or authorization != f"Bearer {ADMIN_PASSWORD}":
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    return True
+# ============= DATASET VERSION & ATTRACTION TABLE =============
+# Єдине колонкове представлення туристичних об'єктів (з урахуванням правок адміністратора).
+# Усі індекси та кеші будуються один раз на версію набору даних.
+import base64
+import hashlib
+import time
+from collections import OrderedDict
+import numpy as np
+from scipy.spatial import cKDTree
 
+EARTH_RADIUS_KM = 6371.0088
 
-# Add your routes to the router instead of directly to app
-@api_router.get("/")
-async def root():
-    return {"message": "Hello World"}
+# Правки адміністратора з db.places: original_id -> змінені поля
+PLACE_OVERRIDES = {}
 
-@api_router.post("/status", response_model=StatusCheck)
-async def create_status_check(input: StatusCheckCreate):
-    status_dict = input.model_dump()
-    status_obj = StatusCheck(**status_dict)
-    
-    # Convert to dict and serialize datetime to ISO string for MongoDB
-    doc = status_obj.model_dump()
-    doc['timestamp'] = doc['timestamp'].isoformat()
-    
-    _ = await db.status_checks.insert_one(doc)
-    return status_obj
 
-@api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    # Exclude MongoDB's _id field from the query results
-    status_checks = await db.status_checks.find({}, {"_id": 0}).to_list(1000)
-    
-    # Convert ISO string timestamps back to datetime objects
-    for check in status_checks:
-        if isinstance(check['timestamp'], str):
-            check['timestamp'] = datetime.fromisoformat(check['timestamp'])
-    
-    return status_checks
+def compute_dataset_version(attractions_data: list) -> str:
+    """
+    Версія набору даних - хеш полів, від яких залежать просторові індекси
+    (id, координати, категорія, рейтинг)
+    """
+    digest = hashlib.sha1()
+    for attr in attractions_data:
+        coords = attr.get('coordinates') or {}
+        digest.update(
+            f"{attr.get('id')}|{coords.get('lat', 0)}|{coords.get('lng', 0)}|"
+            f"{attr.get('category', '')}|{attr.get('rating')}\n".encode('utf-8')
+        )
+    return digest.hexdigest()[:16]
 
 
-# Contact Form Endpoints
-async def send_telegram_notification(name: str, email: str, phone: str, message: str):
-    """Send Telegram notification for new contact form submission"""
-    try:
-        if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
-            logger.warning("Telegram not configured, skipping notification")
-            return
-        
-        # Format message for Telegram
-        telegram_message = f"""📩 <b>Нове повідомлення з сайту!</b>
+DATASET_VERSION = compute_dataset_version(ATTRACTIONS_DATA)
 
-👤 <b>Ім'я:</b> {name}
-📧 <b>Email:</b> {email}
-📱 <b>Телефон:</b> {phone or 'Не вказано'}
 
-💬 <b>Повідомлення:</b>
-{message}
+class AttractionTable:
+    """
+    Колонковий знімок туристичних об'єктів для векторизованих обчислень.
 
-🕐 {datetime.now().strftime('%d.%m.%Y о %H:%M')}
-"""
-        
-        url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json={
-                "chat_id": TELEGRAM_CHAT_ID,
-                "text": telegram_message,
-                "parse_mode": "HTML"
-            })
-            
-            if response.status_code == 200:
-                logger.info("Telegram notification sent successfully")
-            else:
-                logger.error(f"Telegram error: {response.text}")
-                
-    except Exception as e:
-        logger.error(f"Failed to send Telegram notification: {str(e)}")
+    records - об'єднані записи (attractions.json + правки адміністратора),
+    lat/lng/rating - масиви NumPy, category_codes - індекси в categories,
+    has_coords - маска об'єктів з валідними координатами.
+    """
 
+    def __init__(self, records: list, version: str):
+        self.version = version
+        self.records = records
+        self.ids = [str(r.get('id')) for r in records]
+        self.row_by_id = {place_id: row for row, place_id in enumerate(self.ids)}
+
+        n = len(records)
+        self.lat = np.zeros(n, dtype=np.float64)
+        self.lng = np.zeros(n, dtype=np.float64)
+        self.rating = np.zeros(n, dtype=np.float32)
+        self.categories = sorted({r.get('category') or 'other' for r in records})
+        self.category_index = {cat: i for i, cat in enumerate(self.categories)}
+        self.category_codes = np.zeros(n, dtype=np.int16)
+
+        for row, record in enumerate(records):
+            self._fill_row(row, record)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def has_coords(self) -> np.ndarray:
+        return (self.lat != 0) & (self.lng != 0)
+
+    def category_code(self, category: str) -> int:
+        """Код категорії (нова категорія додається в кінець списку)"""
+        if category not in self.category_index:
+            self.category_index[category] = len(self.categories)
+            self.categories.append(category)
+        return self.category_index[category]
+
+    def category_mask(self, category: Optional[str]) -> Optional[np.ndarray]:
+        """Маска рядків заданої категорії (None - без фільтра)"""
+        if not category:
+            return None
+        code = self.category_index.get(category)
+        if code is None:
+            return np.zeros(len(self), dtype=bool)
+        return self.category_codes == code
+
+    def _fill_row(self, row: int, record: dict):
+        coords = record.get('coordinates') or {}
+        self.lat[row] = coords.get('lat') or 0
+        self.lng[row] = coords.get('lng') or 0
+        self.rating[row] = record.get('rating', 3.0) or 3.0
+        self.category_codes[row] = self.category_code(record.get('category') or 'other')
+
+    def update_row(self, row: int, fields: dict):
+        """Інкрементальне оновлення одного запису після правки адміністратора"""
+        self.records[row] = {**self.records[row], **fields}
+        self._fill_row(row, self.records[row])
+
+
+ATTRACTION_TABLE = None
+
+
+def get_attraction_table() -> AttractionTable:
+    """Колонковий знімок для поточної версії набору даних"""
+    global ATTRACTION_TABLE
+
+    if ATTRACTION_TABLE is None:
+        records = [
+            {**attr, **PLACE_OVERRIDES.get(str(attr.get('id')), {})}
+            for attr in ATTRACTIONS_DATA
+        ]
+        ATTRACTION_TABLE = AttractionTable(records, DATASET_VERSION)
+    return ATTRACTION_TABLE
 
-@api_router.post("/contact", response_model=ContactForm)
-async def create_contact_message(input: ContactFormCreate, background_tasks: BackgroundTasks):
-    """Submit a contact form message"""
-    contact_dict = input.model_dump()
-    contact_obj = ContactForm(**contact_dict)
-    
-    doc = contact_obj.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    
-    await db.contact_messages.insert_one(doc)
-    logger.info(f"New contact message from {input.email}")
-    
-    # Send Telegram notification
-    await send_telegram_notification(
-        input.name,
-        input.email,
-        input.phone or "",
-        input.message
-    )
-    
-    return contact_obj
 
+def apply_place_edit(place_id: str, update_data: dict):
+    """
+    Застосування правки адміністратора до in-memory набору даних.
 
-@api_router.get("/contact", response_model=List[ContactForm])
-async def get_contact_messages():
-    """Get all contact messages (for admin)"""
-    messages = await db.contact_messages.find({}, {"_id": 0}).to_list(1000)
-    
-    for msg in messages:
-        if isinstance(msg.get('created_at'), str):
-            msg['created_at'] = datetime.fromisoformat(msg['created_at'])
-    
-    return messages
+    Версія набору даних змінюється ланцюговим хешем, тож кеші, прив'язані до версії,
+    інвалідуються; просторовий індекс оновлюється інкрементально.
+    """
+    global DATASET_VERSION
 
+    fields = {k: v for k, v in update_data.items() if k not in ('original_id', 'updated_at')}
+    PLACE_OVERRIDES[place_id] = {**PLACE_OVERRIDES.get(place_id, {}), **fields}
 
-# Reviews Endpoints
-@api_router.post("/reviews", response_model=Review)
-async def create_review(input: ReviewCreate):
-    """Submit a new review"""
-    review_dict = input.model_dump()
-    review_obj = Review(**review_dict)
-    
-    doc = review_obj.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    
-    await db.reviews.insert_one(doc)
-    logger.info(f"New review from {input.author_name}")
-    
-    return review_obj
+    payload = json.dumps(fields, sort_keys=True, ensure_ascii=False, default=str)
+    DATASET_VERSION = hashlib.sha1(f"{DATASET_VERSION}:{place_id}:{payload}".encode('utf-8')).hexdigest()[:16]
 
+    if ATTRACTION_TABLE is None:
+        return
 
-@api_router.get("/reviews", response_model=List[Review])
-async def get_reviews(approved_only: bool = True):
-    """Get reviews (optionally only approved ones)"""
-    query = {"is_approved": True} if approved_only else {}
-    reviews = await db.reviews.find(query, {"_id": 0}).to_list(100)
-    
-    for review in reviews:
-        if isinstance(review.get('created_at'), str):
-            review['created_at'] = datetime.fromisoformat(review['created_at'])
-    
-    return reviews
+    row = ATTRACTION_TABLE.row_by_id.get(place_id)
+    if row is not None:
+        old_category = ATTRACTION_TABLE.categories[ATTRACTION_TABLE.category_codes[row]]
+        ATTRACTION_TABLE.update_row(row, fields)
+        if SERVICE_AREA_FIELDS & fields.keys():
+            bump_service_area_revisions(old_category,
+                                        ATTRACTION_TABLE.categories[ATTRACTION_TABLE.category_codes[row]])
+    ATTRACTION_TABLE.version = DATASET_VERSION
 
+    if row is not None and SPATIAL_INDEX is not None and 'coordinates' in fields:
+        SPATIAL_INDEX.update_row(row)
+    if SPATIAL_INDEX is not None:
+        SPATIAL_INDEX.version = DATASET_VERSION
 
-# AI Chat Endpoints
-def get_system_prompt():
-    """Generate system prompt with all attractions context"""
-    # Group all attractions by category
-    categories = {
-        'historical': [],
-        'parks': [],
-        'shopping': [],
-        'culture': [],
-        'nature': [],
-        'gastro': [],
-        'hotels': []
-    }
-    
-    for attr in ATTRACTIONS_DATA:
-        cat = attr.get('category', 'other')
-        if cat in categories:
-            categories[cat].append({
-                'name': attr.get('name'),
-                'address': attr.get('address'),
-                'workingHours': attr.get('workingHours'),
-                'phone': attr.get('phone'),
-                'website': attr.get('website')
-            })
-    
-    # Create summary with counts and examples
-    summary_parts = []
-    for cat, items in categories.items():
-        cat_names = {
-            'historical': "Історичні пам'ятки",
-            'parks': 'Парки та сквери',
-            'shopping': 'Торгівельні центри',
-            'culture': 'Культурні заклади',
-            'nature': "Природні об'єкти",
-            'gastro': 'Гастрономія',
-            'hotels': 'Готелі'
-        }
-        summary_parts.append(f"\n### {cat_names.get(cat, cat)} ({len(items)} об'єктів):")
-        # Include all items with names
-        for item in items[:50]:  # Top 50 per category
-            info = f"- {item['name']}"
-            if item.get('address') and item['address'] != 'Житомирська область':
-                info += f" ({item['address']})"
-            if item.get('workingHours'):
-                info += f" - {item['workingHours']}"
-            summary_parts.append(info)
-    
-    attractions_context = '\n'.join(summary_parts)
-    
-    total_count = len(ATTRACTIONS_DATA)
-    
-    return f"""Ти - дружній помічник туристичного сайту Житомирської громади. Твоя задача - допомагати туристам знаходити цікаві місця для відвідування.
+    if row is not None and SIMILARITY_INDEX is not None and {'coordinates', 'category', 'rating'} & fields.keys():
+        SIMILARITY_INDEX.update_row(row)
+    if SIMILARITY_INDEX is not None:
+        SIMILARITY_INDEX.version = DATASET_VERSION
 
-Ти маєш повний доступ до бази даних з {total_count} туристичних об'єктів Житомирщини.
 
-{attractions_context}
+# ============= SPATIAL INDEX (HAVERSINE KD-TREE) =============
 
-Інструкції:
-1. Відповідай українською мовою
-2. Будь дружнім та привітним
-3. Рекомендуй конкретні місця з бази даних з адресами та годинами роботи
-4. Якщо турист не знає що хоче - запитай про його інтереси (історія, природа, їжа, шопінг тощо)
-5. Давай практичну інформацію: адреси, години роботи, телефони якщо є
-6. Якщо питання не стосується туризму - ввічливо поверни розмову до туристичної тематики
-7. Відповідай стисло але інформативно (2-4 рекомендації за раз)
-8. Можеш пропонувати маршрути та комбінації місць для відвідування
-9. НЕ використовуй символи ** для виділення тексту - пиши простим текстом без markdown форматування
-10. Використовуй емодзі для візуального оформлення списків замість **"""
+def latlng_to_unit_xyz(lat, lng) -> np.ndarray:
+    """
+    Перетворення (lat, lng) у точки на одиничній сфері.
+    Евклідова (хордова) відстань між ними монотонна відносно відстані гаверсинуса,
+    тому звичайне KD-дерево дає точний пошук найближчих сусідів на сфері.
+    """
+    lat_rad = np.radians(np.asarray(lat, dtype=np.float64))
+    lng_rad = np.radians(np.asarray(lng, dtype=np.float64))
+    cos_lat = np.cos(lat_rad)
+    return np.column_stack((cos_lat * np.cos(lng_rad), cos_lat * np.sin(lng_rad), np.sin(lat_rad)))
 
 
-# Store chat instances per session
-chat_sessions = {}
+def chord_to_km(chord):
+    """Хордова відстань на одиничній сфері -> відстань по дузі великого кола (км)"""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
 
-@api_router.post("/chat", response_model=ChatResponse)
-async def chat_with_assistant(request: ChatRequest):
-    """Chat with AI assistant about tourist places"""
-    try:
-        if not EMERGENT_LLM_KEY:
-            raise HTTPException(status_code=500, detail="AI not configured")
-        
-        # Generate or use existing session ID
-        session_id = request.session_id or str(uuid.uuid4())
-        
-        # Get or create chat instance for this session
-        if session_id not in chat_sessions:
-            chat = LlmChat(
-                api_key=EMERGENT_LLM_KEY,
-                session_id=session_id,
-                system_message=get_system_prompt()
+
+def km_to_chord(distance_km: float) -> float:
+    """Відстань по дузі великого кола (км) -> хордова відстань на одиничній сфері"""
+    return 2 * np.sin(min(distance_km / EARTH_RADIUS_KM, np.pi) / 2)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Векторизована формула гаверсинуса (км)"""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class HaversineSpatialIndex:
+    """
+    Просторовий індекс туристичних об'єктів: KD-дерево на одиничній сфері.
+
+    Переміщені адміністратором об'єкти не перебудовують дерево одразу:
+    старі позиції маскуються (stale), а нові перевіряються прямим перебором (delta).
+    Коли delta перевищує REBUILD_THRESHOLD, дерево перебудовується повністю.
+    """
+
+    REBUILD_THRESHOLD = 256
+
+    def __init__(self, table: AttractionTable):
+        self.table = table
+        self.version = table.version
+        self.rebuild()
+
+    def rebuild(self):
+        self.rows = np.flatnonzero(self.table.has_coords)
+        self.tree = cKDTree(latlng_to_unit_xyz(self.table.lat[self.rows], self.table.lng[self.rows]))
+        self.stale = np.zeros(len(self.table), dtype=bool)
+        self.delta_rows = set()
+
+    def update_row(self, row: int):
+        """Інкрементальне оновлення позиції одного об'єкта"""
+        if row >= len(self.stale):
+            self.rebuild()
+            return
+        self.stale[row] = True
+        self.delta_rows.add(row)
+        if len(self.delta_rows) > self.REBUILD_THRESHOLD:
+            self.rebuild()
+
+    def _delta_candidates(self, lat: float, lng: float, category_mask):
+        rows = np.fromiter(self.delta_rows, dtype=np.int64, count=len(self.delta_rows))
+        rows = rows[self.table.has_coords[rows]]
+        if category_mask is not None:
+            rows = rows[category_mask[rows]]
+        return rows, haversine_km(lat, lng, self.table.lat[rows], self.table.lng[rows])
+
+    def within(self, lat: float, lng: float, radius_km: float, category_mask: Optional[np.ndarray] = None):
+        """Усі об'єкти в межах radius_km від точки (rows, distances_km) без сортування"""
+        point = latlng_to_unit_xyz([lat], [lng])[0]
+        idx = np.asarray(self.tree.query_ball_point(point, km_to_chord(radius_km), return_sorted=False),
+                         dtype=np.int64)
+        rows = self.rows[idx]
+        keep = ~self.stale[rows]
+        if category_mask is not None:
+            keep &= category_mask[rows]
+        rows = rows[keep]
+        distances = haversine_km(lat, lng, self.table.lat[rows], self.table.lng[rows])
+
+        if self.delta_rows:
+            delta_rows, delta_distances = self._delta_candidates(lat, lng, category_mask)
+            within = delta_distances <= radius_km
+            rows = np.concatenate((rows, delta_rows[within]))
+            distances = np.concatenate((distances, delta_distances[within]))
+        return rows, distances
+
+    def query(self, lat: float, lng: float, k: int = 10, radius_km: Optional[float] = None,
+              category_mask: Optional[np.ndarray] = None):
+        """
+        k найближчих об'єктів до точки (у межах radius_km, якщо задано).
+        Повертає (rows, distances_km), відсортовані за відстанню.
+        """
+        point = latlng_to_unit_xyz([lat], [lng])[0]
+        n_indexed = len(self.rows)
+
+        if radius_km is not None:
+            rows, distances = self.within(lat, lng, radius_km, category_mask)
+        else:
+            # Запит з запасом: частина результатів може бути відкинута фільтром категорії/stale
+            fetch = min(k, n_indexed)
+            while True:
+                if fetch == 0:
+                    rows, distances = np.empty(0, dtype=np.int64), np.empty(0)
+                    break
+                chord, idx = self.tree.query(point, k=fetch)
+                idx = np.atleast_1d(idx)
+                chord = np.atleast_1d(chord)
+                rows = self.rows[idx]
+                keep = ~self.stale[rows]
+                if category_mask is not None:
+                    keep &= category_mask[rows]
+                if keep.sum() >= k or fetch >= n_indexed:
+                    rows, distances = rows[keep], chord_to_km(chord[keep])
+                    break
+                fetch = min(fetch * 4, n_indexed)
+
+            if self.delta_rows:
+                delta_rows, delta_distances = self._delta_candidates(lat, lng, category_mask)
+                rows = np.concatenate((rows, delta_rows))
+                distances = np.concatenate((distances, delta_distances))
+
+        if len(rows) > k:
+            top = np.argpartition(distances, k - 1)[:k]
+            rows, distances = rows[top], distances[top]
+        order = np.argsort(distances, kind='stable')
+        return rows[order], distances[order]
+
+    def query_batch(self, points: list, k: int = 10, radius_km: Optional[float] = None,
+                    category_mask: Optional[np.ndarray] = None):
+        """Пакетний запит для багатьох точок"""
+        return [self.query(lat, lng, k=k, radius_km=radius_km, category_mask=category_mask) for lat, lng in points]
+
+
+SPATIAL_INDEX = None
+
+
+def get_spatial_index() -> HaversineSpatialIndex:
+    """Просторовий індекс для поточної версії набору даних (будується один раз)"""
+    global SPATIAL_INDEX
+
+    table = get_attraction_table()
+    if SPATIAL_INDEX is None or SPATIAL_INDEX.table is not table:
+        SPATIAL_INDEX = HaversineSpatialIndex(table)
+    return SPATIAL_INDEX
+
+
+# ============= DISK SNAPSHOTS =============
+# Знімки похідних масивів зберігаються поруч з сервером, тож перезапуск не перераховує їх
+SNAPSHOT_DIR = Path(os.environ.get('SNAPSHOT_DIR', ROOT_DIR / 'snapshots'))
+
+
+def save_snapshot(name: str, version: str, **arrays):
+    """Атомарний запис знімка {name}-{version}.npz; знімки попередніх версій видаляються"""
+    try:
+        SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+        path = SNAPSHOT_DIR / f"{name}-{version}.npz"
+        tmp_path = SNAPSHOT_DIR / f".{name}-{version}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+        for old in SNAPSHOT_DIR.glob(f"{name}-*.npz"):
+            if old != path:
+                old.unlink(missing_ok=True)
+    except OSError as e:
+        logger.error(f"[Snapshots] Failed to save {name}: {str(e)}")
+
+
+def load_snapshot(name: str, version: str) -> Optional[dict]:
+    """Завантаження знімка для заданої версії набору даних (None, якщо його немає)"""
+    path = SNAPSHOT_DIR / f"{name}-{version}.npz"
+    if not path.exists():
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            return {key: data[key] for key in data.files}
+    except (OSError, ValueError) as e:
+        logger.warning(f"[Snapshots] Failed to load {name}: {str(e)}")
+        return None
+
+
+# ============= IN-MEMORY CACHES =============
+
+class LRUCache:
+    """
+    Обмежений LRU-кеш, прив'язаний до версії набору даних:
+    при зміні версії (ensure_version) всі записи скидаються.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def ensure_version(self, version: str):
+        if self.version != version:
+            self._data.clear()
+            self.version = version
+
+    def get(self, key):
+        if key in self._data:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0,
+            'version': self.version
+        }
+
+
+class TTLCache(LRUCache):
+    """LRU-кеш із часом життя записів: прострочений запис рахується як промах і видаляється"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        super().__init__(maxsize)
+        self.ttl = ttl
+        self.expired = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is not None and time.monotonic() - entry[0] >= self.ttl:
+            del self._data[key]
+            self.expired += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value):
+        super().set(key, (time.monotonic(), value))
+
+    def stats(self) -> dict:
+        return {**super().stats(), 'ttl': self.ttl, 'expired': self.expired}
+
+
+# ============= K-NEAREST-NEIGHBOUR GRAPH =============
+
+KNN_GRAPH_K = 20
+
+
+class KnnGraph:
+    """
+    Граф k найближчих сусідів для кожного об'єкта (компактні масиви NumPy).
+
+    neighbors[i] - рядки сусідів об'єкта i (-1 для об'єктів без координат),
+    distances[i] - відстані гаверсинуса до них у км.
+    """
+
+    def __init__(self, version: str, neighbors: np.ndarray, distances: np.ndarray):
+        self.version = version
+        self.neighbors = neighbors
+        self.distances = distances
+
+    @classmethod
+    def build(cls, table: AttractionTable, k: int = KNN_GRAPH_K) -> 'KnnGraph':
+        n = len(table)
+        neighbors = np.full((n, k), -1, dtype=np.int32)
+        distances = np.full((n, k), np.inf, dtype=np.float32)
+
+        rows = np.flatnonzero(table.has_coords)
+        k_eff = min(k, len(rows) - 1)
+        if k_eff > 0:
+            xyz = latlng_to_unit_xyz(table.lat[rows], table.lng[rows])
+            chord, idx = cKDTree(xyz).query(xyz, k=k_eff + 1, workers=-1)
+
+            # Відкидаємо сам об'єкт (при дублікатах координат він може бути не першим)
+            is_self = idx == np.arange(len(rows))[:, None]
+            is_self[~is_self.any(axis=1), -1] = True
+            idx = idx[~is_self].reshape(len(rows), k_eff)
+            chord = chord[~is_self].reshape(len(rows), k_eff)
+
+            neighbors[rows, :k_eff] = rows[idx]
+            distances[rows, :k_eff] = chord_to_km(chord)
+
+        return cls(table.version, neighbors, distances)
+
+
+KNN_GRAPH = None
+
+
+def get_knn_graph() -> KnnGraph:
+    """Граф k-NN для поточної версії набору даних (зі знімка на диску, якщо він є)"""
+    global KNN_GRAPH
+
+    table = get_attraction_table()
+    if KNN_GRAPH is not None and KNN_GRAPH.version == table.version:
+        return KNN_GRAPH
+
+    snapshot = load_snapshot('knn_graph', table.version)
+    if snapshot is not None and snapshot['neighbors'].shape == (len(table), KNN_GRAPH_K):
+        KNN_GRAPH = KnnGraph(table.version, snapshot['neighbors'], snapshot['distances'])
+    else:
+        KNN_GRAPH = KnnGraph.build(table)
+        save_snapshot('knn_graph', table.version, neighbors=KNN_GRAPH.neighbors, distances=KNN_GRAPH.distances)
+    return KNN_GRAPH
+
+
+def serialize_nearby(table: AttractionTable, rows, distances) -> list:
+    """Компактне представлення результатів просторового пошуку"""
+    return [
+        {
+            'id': table.records[row].get('id'),
+            'name': table.records[row].get('name'),
+            'category': table.records[row].get('category'),
+            'address': table.records[row].get('address'),
+            'coordinates': table.records[row].get('coordinates'),
+            'rating': table.records[row].get('rating'),
+            'distance_km': round(float(distance), 3)
+        }
+        for row, distance in zip(rows.tolist(), distances.tolist())
+    ]
+
+
+# ============= CONTENT SIMILARITY INDEX =============
+
+SIMILARITY_ANN_EPS = 0.1  # (1 + eps)-наближений пошук у KD-дереві
+MAX_SIMILAR_RESULTS = 100
+
+
+class SimilarityIndex:
+    """
+    Індекс «схожих місць» у просторі ознак кластеризації: координати, one-hot
+    за фактичними категоріями таблиці (table.categories) і нормований рейтинг,
+    Z-score з ваговими коефіцієнтами FEATURE_WEIGHTS.
+
+    Наближений пошук найближчих сусідів - KD-дерево з параметром eps.
+    Правки адміністратора не перебудовують індекс: вектор об'єкта
+    перераховується тим самим scaler, стара позиція маскується (stale),
+    а нова перевіряється прямим перебором (delta) до перебудови.
+    """
+
+    REBUILD_THRESHOLD = 256
+
+    def __init__(self, table: AttractionTable):
+        self.table = table
+        self.version = table.version
+        self.rebuild()
+
+    def features(self, rows: np.ndarray) -> np.ndarray:
+        """Ознаки рядків: lat, lng, one-hot категорії, рейтинг за формулою 2.13: (r - 1) / 4"""
+        X = np.zeros((len(rows), self.n_categories + 3))
+        X[:, 0] = self.table.lat[rows]
+        X[:, 1] = self.table.lng[rows]
+        X[np.arange(len(rows)), 2 + self.table.category_codes[rows]] = 1
+        X[:, -1] = (self.table.rating[rows] - 1) / 4
+        return X
+
+    def normalize(self, X: np.ndarray) -> np.ndarray:
+        return self.scaler.transform(X) * self.weights
+
+    def rebuild(self):
+        from sklearn.preprocessing import StandardScaler
+
+        self.rows = np.flatnonzero(self.table.has_coords)
+        self.n_categories = len(self.table.categories)
+        self.dim = self.n_categories + 3
+        self.weights = np.concatenate((
+            np.full(2, FEATURE_WEIGHTS['coordinates']),
+            np.full(self.n_categories, FEATURE_WEIGHTS['category']),
+            [FEATURE_WEIGHTS['rating']]
+        ))
+        self.vectors = np.full((len(self.table), self.dim), np.nan)
+        if len(self.rows) > 1:
+            self.scaler = StandardScaler().fit(self.features(self.rows))
+            X_normalized = self.normalize(self.features(self.rows))
+            self.vectors[self.rows] = X_normalized
+            self.tree = cKDTree(X_normalized)
+        else:
+            self.rows = np.zeros(0, dtype=np.int64)
+            self.scaler = None
+            self.tree = None
+        self.stale = np.zeros(len(self.table), dtype=bool)
+        self.delta_rows = set()
+
+    def update_row(self, row: int):
+        """Інкрементальне оновлення вектора ознак одного об'єкта після правки"""
+        # Нова категорія змінює розмірність one-hot - потрібна перебудова
+        if row >= len(self.stale) or self.scaler is None or len(self.table.categories) != self.n_categories:
+            self.rebuild()
+            return
+        self.stale[row] = True
+        self.delta_rows.discard(row)
+        self.vectors[row] = np.nan
+        if self.table.has_coords[row]:
+            self.vectors[row] = self.normalize(self.features(np.array([row])))[0]
+            self.delta_rows.add(row)
+        if len(self.delta_rows) > self.REBUILD_THRESHOLD:
+            self.rebuild()
+
+    def query(self, row: int, k: int = 10, category_mask: Optional[np.ndarray] = None):
+        """
+        k найсхожіших об'єктів до рядка row (без нього самого).
+        Повертає (rows, distances) у просторі ознак, відсортовані за відстанню.
+        """
+        vector = self.vectors[row]
+        if self.tree is None or np.isnan(vector).any():
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        n_indexed = len(self.rows)
+        fetch = min(k + 1, n_indexed)
+        while True:
+            distances, idx = self.tree.query(vector, k=fetch, eps=SIMILARITY_ANN_EPS)
+            idx, distances = np.atleast_1d(idx), np.atleast_1d(distances)
+            rows = self.rows[idx[idx < n_indexed]]
+            distances = distances[idx < n_indexed]
+            keep = (~self.stale[rows]) & (rows != row)
+            if category_mask is not None:
+                keep &= category_mask[rows]
+            if keep.sum() >= k or fetch >= n_indexed:
+                rows, distances = rows[keep], distances[keep]
+                break
+            fetch = min(fetch * 4, n_indexed)
+
+        if self.delta_rows:
+            delta = np.fromiter(self.delta_rows, dtype=np.int64, count=len(self.delta_rows))
+            delta = delta[delta != row]
+            if category_mask is not None:
+                delta = delta[category_mask[delta]]
+            rows = np.concatenate((rows, delta))
+            distances = np.concatenate((distances, np.linalg.norm(self.vectors[delta] - vector, axis=1)))
+
+        order = np.argsort(distances, kind='stable')[:k]
+        return rows[order], distances[order]
+
+
+SIMILARITY_INDEX = None
+
+
+def get_similarity_index() -> SimilarityIndex:
+    """Індекс схожих місць для поточної версії набору даних"""
+    global SIMILARITY_INDEX
+
+    table = get_attraction_table()
+    if SIMILARITY_INDEX is None or SIMILARITY_INDEX.table is not table:
+        SIMILARITY_INDEX = SimilarityIndex(table)
+    elif SIMILARITY_INDEX.version != table.version:
+        # Правки вже застосовані інкрементально в apply_place_edit
+        SIMILARITY_INDEX.version = table.version
+    return SIMILARITY_INDEX
+
+
+def serialize_similar(table: AttractionTable, rows, distances) -> list:
+    """Результати пошуку схожих місць; similarity = 1 / (1 + відстань у просторі ознак)"""
+    return [
+        {
+            'id': table.records[row].get('id'),
+            'name': table.records[row].get('name'),
+            'category': table.records[row].get('category'),
+            'address': table.records[row].get('address'),
+            'coordinates': table.records[row].get('coordinates'),
+            'rating': table.records[row].get('rating'),
+            'similarity': round(1 / (1 + float(distance)), 4)
+        }
+        for row, distance in zip(rows.tolist(), distances.tolist())
+    ]
+
+
+# ============= TEXT SIMILARITY INDEX (TF-IDF) =============
+
+TEXT_INDEX_NGRAMS = (3, 5)
+TEXT_RETRIEVAL_K = 8
+TEXT_RETRIEVAL_MIN_SCORE = 0.15
+
+
+def attraction_text(record: dict) -> str:
+    """Текст об'єкта для індексу: назва, опис, адреса"""
+    parts = (record.get('name'), record.get('description'), record.get('address'))
+    return ' '.join(str(part) for part in parts if part)
+
+
+class TextIndex:
+    """
+    TF-IDF індекс символьних n-грам (char_wb, 3-5) над назвою, описом і адресою.
+    Символьні n-грами стійкі до відмінювання українських слів.
+
+    matrix - розріджена матриця документів (рядки L2-нормовані), тож косинусна
+    подібність запиту до всіх об'єктів - один розріджений добуток matrix @ q.
+    Словник, idf і матриця зберігаються знімком на диску для поточної версії набору даних.
+    """
+
+    def __init__(self, version: str, vectorizer, matrix):
+        self.version = version
+        self.vectorizer = vectorizer
+        self.matrix = matrix
+
+    @staticmethod
+    def make_vectorizer(vocabulary: Optional[dict] = None):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        return TfidfVectorizer(analyzer='char_wb', ngram_range=TEXT_INDEX_NGRAMS, lowercase=True,
+                               sublinear_tf=True, dtype=np.float32, vocabulary=vocabulary)
+
+    @classmethod
+    def build(cls, table: AttractionTable) -> 'TextIndex':
+        vectorizer = cls.make_vectorizer()
+        matrix = vectorizer.fit_transform([attraction_text(record) for record in table.records]).tocsr()
+        return cls(table.version, vectorizer, matrix)
+
+    @classmethod
+    def from_snapshot(cls, version: str, snapshot: dict) -> 'TextIndex':
+        from scipy import sparse
+
+        terms = snapshot['terms'].tolist()
+        vectorizer = cls.make_vectorizer({term: i for i, term in enumerate(terms)})
+        vectorizer.idf_ = snapshot['idf']
+        matrix = sparse.csr_matrix((snapshot['data'], snapshot['indices'], snapshot['indptr']),
+                                   shape=tuple(snapshot['shape']))
+        return cls(version, vectorizer, matrix)
+
+    def snapshot_arrays(self) -> dict:
+        return {
+            'terms': np.array(self.vectorizer.get_feature_names_out(), dtype=str),
+            'idf': self.vectorizer.idf_,
+            'data': self.matrix.data,
+            'indices': self.matrix.indices,
+            'indptr': self.matrix.indptr,
+            'shape': np.array(self.matrix.shape)
+        }
+
+    def search(self, text: str, k: int = 10, exclude_row: Optional[int] = None):
+        """Top-k об'єктів за косинусною подібністю до тексту (rows, scores); нульові збіги відкидаються"""
+        query = self.vectorizer.transform([text])
+        return self._top_k(self.matrix @ query.T, k, exclude_row)
+
+    def similar(self, row: int, k: int = 10):
+        """Об'єкти, схожі на рядок row за назвою й описом"""
+        return self._top_k(self.matrix @ self.matrix[row].T, k, row)
+
+    @staticmethod
+    def _top_k(scores, k: int, exclude_row: Optional[int]):
+        scores = np.asarray(scores.todense()).ravel()
+        if exclude_row is not None:
+            scores[exclude_row] = 0
+        scores[scores <= 0] = -np.inf
+        return top_k_rows(scores, k)
+
+
+TEXT_INDEX = None
+
+
+def get_text_index() -> TextIndex:
+    """TF-IDF індекс для поточної версії набору даних (зі знімка на диску, якщо він є)"""
+    global TEXT_INDEX
+
+    table = get_attraction_table()
+    if TEXT_INDEX is not None and TEXT_INDEX.version == table.version:
+        return TEXT_INDEX
+
+    snapshot = load_snapshot('text_index', table.version)
+    if snapshot is not None and tuple(snapshot['shape'])[0] == len(table):
+        TEXT_INDEX = TextIndex.from_snapshot(table.version, snapshot)
+    else:
+        TEXT_INDEX = TextIndex.build(table)
+        save_snapshot('text_index', table.version, **TEXT_INDEX.snapshot_arrays())
+    return TEXT_INDEX
+
+
+def retrieve_attractions_context(message: str, k: int = TEXT_RETRIEVAL_K) -> str:
+    """
+    Довідка для AI-помічника: спершу об'єкти, назви яких згадані в повідомленні (триграмний
+    індекс, стійкий до помилок), далі - найрелевантніші за TF-IDF
+    """
+    table = get_attraction_table()
+    selected = get_trigram_index().mentions(message).tolist()
+    rows, scores = get_text_index().search(message, k)
+    selected += [row for row, score in zip(rows.tolist(), scores.tolist())
+                 if score >= TEXT_RETRIEVAL_MIN_SCORE and row not in selected]
+    lines = []
+    for row in selected[:k]:
+        record = table.records[row]
+        line = f"- {record.get('name')} ({record.get('category')})"
+        if record.get('address'):
+            line += f", {record['address']}"
+        if record.get('workingHours'):
+            line += f", {record['workingHours']}"
+        if record.get('phone'):
+            line += f", тел. {record['phone']}"
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+# ============= FULL-TEXT SEARCH =============
+
+SEARCH_FIELD_WEIGHTS = {'name': 3.0, 'address': 1.0, 'description': 1.0}
+SEARCH_WEIGHTS = {'text': 0.7, 'rating': 0.15, 'distance': 0.15}
+SEARCH_BM25_K1 = 1.2
+SEARCH_BM25_B = 0.75
+SEARCH_PREFIX_EXPANSIONS = 20
+SEARCH_PREFIX_DISCOUNT = 0.8  # завершення останнього слова важать менше за точний збіг
+MAX_SEARCH_RESULTS = 100
+
+# Апострофи (м'ята, мʼята, м’ята) відкидаються
+APOSTROPHES = re.compile("['’ʼ`‘′ʹ]")
+SEARCH_TOKEN = re.compile(r'[^\W_]+')
+
+# Транслітерація за постановою КМУ № 55 (2010) + російські літери; кириличні і латинські
+# запити зводяться до однієї латинської форми: «Житомир» і «Zhytomyr» → zhytomyr
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'h', 'ґ': 'g', 'д': 'd', 'е': 'e', 'є': 'ie', 'ж': 'zh',
+    'з': 'z', 'и': 'y', 'і': 'i', 'ї': 'i', 'й': 'i', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n',
+    'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ь': '', 'ю': 'iu', 'я': 'ia',
+    'ё': 'e', 'ы': 'y', 'э': 'e', 'ъ': ''
+}
+# На початку слова: Єнакієве → Yenakiieve, Їжакевич → Yizhakevych
+CYRILLIC_INITIAL = {'є': 'ye', 'ї': 'yi', 'й': 'y', 'ю': 'yu', 'я': 'ya'}
+
+
+def transliterate_token(token: str) -> str:
+    """Кирилиця → латиниця (КМУ 2010); латинські токени не змінюються"""
+    if token.isascii():
+        return token
+    chars = [CYRILLIC_INITIAL.get(token[0]) or CYRILLIC_TO_LATIN.get(token[0], token[0])]
+    chars.extend(CYRILLIC_TO_LATIN.get(char, char) for char in token[1:])
+    return ''.join(chars)
+
+
+def normalize_text(text) -> list:
+    """Токени для пошуку: casefold, без апострофів, у латинській транслітерації"""
+    if not text:
+        return []
+    text = APOSTROPHES.sub('', str(text).casefold())
+    return [token for token in map(transliterate_token, SEARCH_TOKEN.findall(text)) if token]
+
+
+class PrefixTrie:
+    """
+    Префіксне дерево токенів словника. Токени вставляються в порядку спадання частоти,
+    тож кожен вузол зберігає до top_k найчастіших завершень свого префікса (ключ '').
+    """
+
+    def __init__(self, top_k: int = SEARCH_PREFIX_EXPANSIONS):
+        self.top_k = top_k
+        self.root = {}
+
+    def insert(self, token: str):
+        node = self.root
+        for char in token:
+            node = node.setdefault(char, {})
+            completions = node.setdefault('', [])
+            if len(completions) < self.top_k:
+                completions.append(token)
+
+    def complete(self, prefix: str) -> list:
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        return node.get('', [])
+
+
+class SearchIndex:
+    """
+    Інвертований індекс назв, адрес і описів (BM25F: поля зважені SEARCH_FIELD_WEIGHTS).
+
+    postings[token] = (rows, scores): відсортовані рядки AttractionTable і готовий внесок BM25
+    токена в оцінку кожного рядка. Запит - AND усіх слів; останнє слово доповнюється через
+    PrefixTrie (пошук під час введення). Будується один раз для версії набору даних.
+    field_weights - індексовані поля (для автодоповнення - лише назви).
+    """
+
+    def __init__(self, table: AttractionTable, field_weights: Optional[dict] = None):
+        self.table = table
+        self.version = table.version
+        field_weights = field_weights or SEARCH_FIELD_WEIGHTS
+
+        n = len(table)
+        frequencies = {}
+        lengths = np.zeros(n, dtype=np.float64)
+        for row, record in enumerate(table.records):
+            for field, weight in field_weights.items():
+                tokens = normalize_text(record.get(field))
+                lengths[row] += weight * len(tokens)
+                for token in tokens:
+                    doc = frequencies.setdefault(token, {})
+                    doc[row] = doc.get(row, 0.0) + weight
+
+        norm = 1 - SEARCH_BM25_B + SEARCH_BM25_B * lengths / max(lengths.mean(), 1e-9) if n else lengths
+        self.postings = {}
+        for token, doc in frequencies.items():
+            rows = np.fromiter(doc.keys(), dtype=np.int64, count=len(doc))
+            tf = np.fromiter(doc.values(), dtype=np.float64, count=len(doc))
+            idf = np.log(1 + (n - len(doc) + 0.5) / (len(doc) + 0.5))
+            scores = idf * tf * (SEARCH_BM25_K1 + 1) / (tf + SEARCH_BM25_K1 * norm[rows])
+            order = np.argsort(rows)
+            self.postings[token] = (rows[order], scores[order].astype(np.float32))
+
+        self.trie = PrefixTrie()
+        for token in sorted(frequencies, key=lambda t: (-len(frequencies[t]), t)):
+            self.trie.insert(token)
+
+    def expand(self, token: str) -> list:
+        """Точний токен (якщо він є в словнику) і найчастіші завершення префікса"""
+        completions = [t for t in self.trie.complete(token) if t != token]
+        return ([token] if token in self.postings else []) + completions
+
+    def match(self, tokens: list, prefix: bool = True):
+        """
+        Текстові оцінки (щільний масив) і маска рядків, що містять усі слова запиту;
+        з prefix останнє слово може бути початком токена.
+        """
+        n = len(self.table)
+        scores = np.zeros(n, dtype=np.float32)
+        matched = np.ones(n, dtype=bool)
+        for i, token in enumerate(tokens):
+            token_scores = np.zeros(n, dtype=np.float32)
+            candidates = self.expand(token) if prefix and i == len(tokens) - 1 else [token]
+            for candidate in candidates:
+                posting = self.postings.get(candidate)
+                if posting is None:
+                    continue
+                rows, contribution = posting
+                if candidate != token:
+                    contribution = contribution * SEARCH_PREFIX_DISCOUNT
+                np.maximum.at(token_scores, rows, contribution)
+            matched &= token_scores > 0
+            scores += token_scores
+        return scores, matched
+
+    def search(self, query: str, k: int = 20, mask: Optional[np.ndarray] = None, location=None,
+               prefix: bool = True):
+        """
+        Ранжування: SEARCH_WEIGHTS - текстова оцінка (нормована на найкращу), рейтинг
+        і близькість exp(-d / RECOMMENDATION_DISTANCE_SCALE_KM) до location.
+        Повертає (rows, scores, distances або None, кількість збігів).
+        """
+        tokens = normalize_text(query)
+        if not tokens:
+            return np.zeros(0, dtype=np.int64), np.zeros(0), None, 0
+        text, matched = self.match(tokens, prefix)
+        if mask is not None:
+            matched &= mask
+        rows = np.flatnonzero(matched)
+        if len(rows) == 0:
+            return rows, np.zeros(0), None, 0
+
+        table = self.table
+        scores = SEARCH_WEIGHTS['text'] * text[rows] / text[rows].max()
+        scores += SEARCH_WEIGHTS['rating'] * np.clip((table.rating[rows] - 1) / 4, 0, 1)
+        distances = None
+        if location is not None:
+            distances = haversine_km(location[0], location[1], table.lat[rows], table.lng[rows])
+            decay = np.where(table.has_coords[rows], np.exp(-distances / RECOMMENDATION_DISTANCE_SCALE_KM), 0)
+            scores += SEARCH_WEIGHTS['distance'] * decay
+        top, top_scores = top_k_rows(scores, k, rows)
+        return rows[top], top_scores, None if distances is None else distances[top], len(rows)
+
+
+SEARCH_INDEX = None
+NAME_SEARCH_INDEX = None
+
+
+def get_search_index() -> SearchIndex:
+    """Інвертований індекс для поточної версії набору даних"""
+    global SEARCH_INDEX
+
+    table = get_attraction_table()
+    if SEARCH_INDEX is None or SEARCH_INDEX.version != table.version:
+        SEARCH_INDEX = SearchIndex(table)
+    return SEARCH_INDEX
+
+
+def get_name_search_index() -> SearchIndex:
+    """Індекс лише назв об'єктів (словник і PrefixTrie автодоповнення)"""
+    global NAME_SEARCH_INDEX
+
+    table = get_attraction_table()
+    if NAME_SEARCH_INDEX is None or NAME_SEARCH_INDEX.version != table.version:
+        NAME_SEARCH_INDEX = SearchIndex(table, {'name': 1.0})
+    return NAME_SEARCH_INDEX
+
+
+# ============= FUZZY NAME MATCHING (TRIGRAMS) =============
+
+FUZZY_MIN_SIMILARITY = 0.5  # частка триграм запиту, знайдених у назві
+FUZZY_MENTION_COVERAGE = 0.75  # частка триграм назви, знайдених у повідомленні
+FUZZY_MENTION_MIN_TRIGRAMS = 8  # коротші назви («Музей») надто загальні для згадки
+FUZZY_MENTION_K = 5
+# Варіанти транслітерації, що плутаються (и/і/ы → y/i, російське г → g), зводяться до однієї літери
+FUZZY_FOLD = str.maketrans({'y': 'i', 'g': 'h'})
+
+
+def name_trigrams(text) -> set:
+    """Триграми нормалізованих слів (як у pg_trgm: слово доповнюється '  ' зліва і ' ' справа)"""
+    trigrams = set()
+    for token in normalize_text(text):
+        padded = f"  {token.translate(FUZZY_FOLD)} "
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+class TrigramIndex:
+    """
+    Триграмний індекс назв об'єктів для пошуку з помилками («Бердичив» → «Бердичів»).
+
+    Списки рядків для кожної триграми зберігаються у форматі CSR (indptr, rows).
+    Кандидати - об'єднання списків триграм запиту з підрахунком спільних триграм (bincount),
+    тож відстань редагування не рахується для кожного запису.
+    Триграми будуються з транслітерованих токенів normalize_text, тому латиниця теж працює.
+    """
+
+    def __init__(self, table: AttractionTable):
+        self.table = table
+        self.version = table.version
+
+        pairs = []
+        self.sizes = np.zeros(len(table), dtype=np.int64)
+        for row, record in enumerate(table.records):
+            trigrams = name_trigrams(record.get('name'))
+            self.sizes[row] = len(trigrams)
+            pairs.extend((trigram, row) for trigram in trigrams)
+
+        self.vocabulary = {trigram: i for i, trigram in enumerate(sorted({trigram for trigram, _ in pairs}))}
+        ids = np.fromiter((self.vocabulary[trigram] for trigram, _ in pairs), dtype=np.int64, count=len(pairs))
+        rows = np.fromiter((row for _, row in pairs), dtype=np.int64, count=len(pairs))
+        order = np.lexsort((rows, ids))
+        self.rows = rows[order]
+        self.indptr = np.searchsorted(ids[order], np.arange(len(self.vocabulary) + 1))
+
+    def shared_counts(self, text: str):
+        """Кількість спільних з текстом триграм для кожної назви і кількість триграм тексту"""
+        trigrams = name_trigrams(text)
+        ids = [self.vocabulary[trigram] for trigram in trigrams if trigram in self.vocabulary]
+        if not ids:
+            return np.zeros(len(self.table), dtype=np.int64), len(trigrams)
+        postings = np.concatenate([self.rows[self.indptr[i]:self.indptr[i + 1]] for i in ids])
+        return np.bincount(postings, minlength=len(self.table)), len(trigrams)
+
+    def search(self, query: str, k: int = 10, mask: Optional[np.ndarray] = None,
+               min_similarity: float = FUZZY_MIN_SIMILARITY):
+        """
+        Назви, схожі на запит: (rows, similarity). Відбір - частка триграм запиту в назві
+        не менша за min_similarity; similarity - середнє цієї частки та коефіцієнта Жаккара,
+        тож коротша назва з тим самим збігом ранжується вище.
+        """
+        shared, size = self.shared_counts(query)
+        if size == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        coverage = shared / size
+        candidates = coverage >= min_similarity
+        if mask is not None:
+            candidates &= mask
+        rows = np.flatnonzero(candidates)
+        jaccard = shared[rows] / (size + self.sizes[rows] - shared[rows])
+        scores = (coverage[rows] + jaccard) / 2
+        top, top_scores = top_k_rows(scores, k, rows)
+        return rows[top], top_scores
+
+    def mentions(self, text: str, k: int = FUZZY_MENTION_K):
+        """
+        Об'єкти, назви яких згадані в довшому тексті (повідомленні AI-помічнику), навіть з помилками:
+        більшість триграм назви присутня в тексті. Довші (конкретніші) збіги - першими.
+        """
+        shared, _ = self.shared_counts(text)
+        coverage = shared / np.maximum(self.sizes, 1)
+        rows = np.flatnonzero((coverage >= FUZZY_MENTION_COVERAGE) & (shared >= FUZZY_MENTION_MIN_TRIGRAMS))
+        top, _ = top_k_rows(shared[rows] + coverage[rows], k, rows)
+        return rows[top]
+
+
+TRIGRAM_INDEX = None
+
+
+def get_trigram_index() -> TrigramIndex:
+    """Триграмний індекс назв для поточної версії набору даних"""
+    global TRIGRAM_INDEX
+
+    table = get_attraction_table()
+    if TRIGRAM_INDEX is None or TRIGRAM_INDEX.version != table.version:
+        TRIGRAM_INDEX = TrigramIndex(table)
+    return TRIGRAM_INDEX
+
+
+# ============= VISIT COUNTS =============
+# Кількість відвідувань з db.visits, вирівняна з рядками AttractionTable
+
+VISIT_COUNTS_TTL = 300  # секунд
+VISIT_COUNTS = {'loaded_at': 0.0, 'version': None, 'counts': None, 'stamp': ''}
+
+
+async def get_visit_counts(table: AttractionTable):
+    """
+    Масив кількості відвідувань для кожного рядка таблиці та його відбиток (stamp)
+    для ключів кешу. Агрегація в MongoDB оновлюється не частіше ніж раз на VISIT_COUNTS_TTL.
+    """
+    now = time.monotonic()
+    if (VISIT_COUNTS['counts'] is not None and VISIT_COUNTS['version'] == table.version
+            and now - VISIT_COUNTS['loaded_at'] < VISIT_COUNTS_TTL):
+        return VISIT_COUNTS['counts'], VISIT_COUNTS['stamp']
+
+    counts = np.zeros(len(table), dtype=np.float64)
+    pipeline = [{"$group": {"_id": "$attraction_id", "total_visits": {"$sum": 1}}}]
+    async for item in db.visits.aggregate(pipeline):
+        row = table.row_by_id.get(str(item['_id']))
+        if row is not None:
+            counts[row] = item['total_visits']
+
+    VISIT_COUNTS.update({
+        'loaded_at': now,
+        'version': table.version,
+        'counts': counts,
+        'stamp': hashlib.sha1(counts.tobytes()).hexdigest()[:12]
+    })
+    return counts, VISIT_COUNTS['stamp']
+
+
+# ============= KERNEL DENSITY HEATMAP =============
+
+HEATMAP_TILE_SIZE = 256
+HEATMAP_WEIGHTS = ('none', 'rating', 'visits')
+HEATMAP_TILE_CACHE = LRUCache(maxsize=2048)
+HEATMAP_REFERENCE_CACHE = LRUCache(maxsize=64)
+
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LNG = 111.320
+
+
+def tile_bounds(z: int, x: int, y: int):
+    """Межі тайла Web Mercator (lat_min, lat_max, lng_min, lng_max)"""
+    n = 2 ** z
+    lng_min = x / n * 360.0 - 180.0
+    lng_max = (x + 1) / n * 360.0 - 180.0
+    lat_max = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y / n))))
+    lat_min = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + 1) / n))))
+    return float(lat_min), float(lat_max), float(lng_min), float(lng_max)
+
+
+def tile_pixel_centers(z: int, x: int, y: int, size: int):
+    """Широти рядків та довготи стовпців центрів пікселів тайла"""
+    n = 2 ** z
+    frac = (np.arange(size) + 0.5) / size
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + frac) / n))))
+    lngs = (x + frac) / n * 360.0 - 180.0
+    return lats, lngs
+
+
+def default_bandwidth_km(z: int) -> float:
+    """Ширина ядра залежно від масштабу: 0.5 км на z=12, удвічі більше на кожен рівень вище"""
+    return float(np.clip(0.5 * 2 ** (12 - z), 0.2, 20.0))
+
+
+def gaussian_kde_grid(lats: np.ndarray, lngs: np.ndarray, point_lat: np.ndarray, point_lng: np.ndarray,
+                      weights: np.ndarray, bandwidth_km: float) -> np.ndarray:
+    """
+    Векторизована гаусова KDE на регулярній сітці (об'єктів на км²).
+
+    У локальній рівнокутній проєкції ядро розділяється на множники за осями:
+    exp(-(dx² + dy²) / 2h²) = exp(-dx² / 2h²) · exp(-dy² / 2h²),
+    тому вся сітка обчислюється одним матричним добутком Gy · diag(w) · Gxᵀ.
+    """
+    # Відсікаємо об'єкти, що не впливають на сітку (далі ніж 4h від її меж)
+    margin_lat = 4 * bandwidth_km / KM_PER_DEG_LAT
+    cos_lat = np.cos(np.radians(np.clip(np.mean(lats), -85, 85)))
+    margin_lng = 4 * bandwidth_km / (KM_PER_DEG_LNG * cos_lat)
+    mask = ((point_lat >= lats.min() - margin_lat) & (point_lat <= lats.max() + margin_lat) &
+            (point_lng >= lngs.min() - margin_lng) & (point_lng <= lngs.max() + margin_lng) &
+            (weights > 0))
+    if not mask.any():
+        return np.zeros((len(lats), len(lngs)))
+
+    dy = (lats[:, None] - point_lat[mask][None, :]) * KM_PER_DEG_LAT
+    dx = (lngs[:, None] - point_lng[mask][None, :]) * KM_PER_DEG_LNG * cos_lat
+    two_h2 = 2 * bandwidth_km ** 2
+    gy = np.exp(-dy ** 2 / two_h2) * weights[mask][None, :]
+    gx = np.exp(-dx ** 2 / two_h2)
+    return (gy @ gx.T) / (np.pi * two_h2)
+
+
+async def get_heatmap_weights(table: AttractionTable, weight: str):
+    """Ваги об'єктів для KDE та відбиток ваг для ключа кешу"""
+    valid = table.has_coords.astype(np.float64)
+    if weight == 'rating':
+        return valid * table.rating, 'rating'
+    if weight == 'visits':
+        counts, stamp = await get_visit_counts(table)
+        return valid * counts, f"visits:{stamp}"
+    return valid, 'none'
+
+
+def heatmap_reference_density(table: AttractionTable, weights: np.ndarray, weight_key: str,
+                              bandwidth_km: float) -> float:
+    """
+    Опорний максимум щільності для кольорової шкали - однаковий для всіх тайлів,
+    щоб на стиках не було розривів. Оцінюється на грубій сітці навколо даних.
+    """
+    key = (weight_key, round(bandwidth_km, 3))
+    reference = HEATMAP_REFERENCE_CACHE.get(key)
+    if reference is None:
+        valid = table.has_coords
+        if not valid.any():
+            return 1.0
+        step_km = max(bandwidth_km / 2, 0.25)
+        lat_min, lat_max = table.lat[valid].min(), table.lat[valid].max()
+        lng_min, lng_max = table.lng[valid].min(), table.lng[valid].max()
+        cos_lat = np.cos(np.radians((lat_min + lat_max) / 2))
+        n_lat = int(min(512, max(2, (lat_max - lat_min) * KM_PER_DEG_LAT / step_km)))
+        n_lng = int(min(512, max(2, (lng_max - lng_min) * KM_PER_DEG_LNG * cos_lat / step_km)))
+        grid = gaussian_kde_grid(
+            np.linspace(lat_min, lat_max, n_lat), np.linspace(lng_min, lng_max, n_lng),
+            table.lat, table.lng, weights, bandwidth_km
+        )
+        reference = float(grid.max()) or 1.0
+        HEATMAP_REFERENCE_CACHE.set(key, reference)
+    return reference
+
+
+# Кольорова шкала: прозорий -> синій -> зелений -> жовтий -> червоний
+HEATMAP_COLOR_STOPS = np.array([0.0, 0.25, 0.5, 0.75, 1.0])
+HEATMAP_COLORS = np.array([
+    [0, 0, 255, 0],
+    [0, 90, 255, 140],
+    [0, 200, 90, 180],
+    [255, 220, 0, 210],
+    [230, 30, 30, 235],
+], dtype=np.float64)
+
+
+def render_heatmap_png(density: np.ndarray, reference: float) -> bytes:
+    """Рендер сітки щільності в PNG (RGBA) з логарифмічною кольоровою шкалою"""
+    from PIL import Image
+    import io
+
+    level = np.clip(np.log1p(density / reference * 20) / np.log1p(20), 0, 1)
+    rgba = np.stack(
+        [np.interp(level, HEATMAP_COLOR_STOPS, HEATMAP_COLORS[:, c]) for c in range(4)],
+        axis=-1
+    ).astype(np.uint8)
+
+    buffer = io.BytesIO()
+    Image.fromarray(rgba).save(buffer, format='PNG', optimize=False)
+    return buffer.getvalue()
+
+
+async def get_heatmap_tile(z: int, x: int, y: int, fmt: str, size: int, weight: str,
+                           bandwidth_km: Optional[float]):
+    """
+    Тайл теплової карти (PNG-байти або JSON-сітка) з LRU-кешу тайлів.
+    Кеш скидається при зміні версії набору даних.
+    """
+    table = get_attraction_table()
+    HEATMAP_TILE_CACHE.ensure_version(table.version)
+    HEATMAP_REFERENCE_CACHE.ensure_version(table.version)
+
+    bandwidth_km = bandwidth_km or default_bandwidth_km(z)
+    weights, weight_key = await get_heatmap_weights(table, weight)
+
+    key = (z, x, y, fmt, size, weight_key, round(bandwidth_km, 3))
+    cached = HEATMAP_TILE_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    lats, lngs = tile_pixel_centers(z, x, y, size)
+    density = gaussian_kde_grid(lats, lngs, table.lat, table.lng, weights, bandwidth_km)
+
+    if fmt == 'png':
+        result = render_heatmap_png(density, heatmap_reference_density(table, weights, weight_key, bandwidth_km))
+    else:
+        lat_min, lat_max, lng_min, lng_max = tile_bounds(z, x, y)
+        result = {
+            "z": z, "x": x, "y": y,
+            "bounds": {"lat_min": lat_min, "lat_max": lat_max, "lng_min": lng_min, "lng_max": lng_max},
+            "size": size,
+            "bandwidth_km": round(bandwidth_km, 3),
+            "weight": weight,
+            "unit": "objects_per_km2",
+            "max_density": round(float(density.max()), 6),
+            "grid": np.round(density, 6).tolist(),
+            "dataset_version": table.version
+        }
+
+    HEATMAP_TILE_CACHE.set(key, result)
+    return result
+
+
+# ============= MAPBOX VECTOR TILES =============
+# Мінімальний кодувальник MVT 2.1 (protobuf вручну, без додаткових залежностей)
+
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
+MVT_MAX_ZOOM = 18
+MVT_PRERENDER_MAX_ZOOM = 14
+MVT_TILE_CACHES = {}  # zoom -> LRUCache
+MVT_TILES_DIR = SNAPSHOT_DIR / 'tiles'
+
+
+def _pb_varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _pb_field(field: int, wire_type: int) -> bytes:
+    return _pb_varint((field << 3) | wire_type)
+
+
+def _pb_bytes(field: int, payload: bytes) -> bytes:
+    return _pb_field(field, 2) + _pb_varint(len(payload)) + payload
+
+
+def _pb_uint(field: int, value: int) -> bytes:
+    return _pb_field(field, 0) + _pb_varint(value)
+
+
+def _pb_packed(field: int, values) -> bytes:
+    return _pb_bytes(field, b''.join(_pb_varint(v) for v in values))
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _mvt_value(value) -> bytes:
+    """Значення атрибута (Value message)"""
+    import struct
+
+    if isinstance(value, bool):
+        return _pb_uint(7, int(value))
+    if isinstance(value, int):
+        return _pb_uint(6, _zigzag(value))
+    if isinstance(value, float):
+        return _pb_field(3, 1) + struct.pack('<d', value)
+    return _pb_bytes(1, str(value).encode('utf-8'))
+
+
+def _mvt_command(command: int, count: int) -> int:
+    return (command & 0x7) | (count << 3)
+
+
+def mvt_point_geometry(x: int, y: int) -> list:
+    return [_mvt_command(1, 1), _zigzag(x), _zigzag(y)]
+
+
+def mvt_polygon_geometry(polygons) -> list:
+    """
+    Геометрія (Multi)Polygon у координатах тайла. Зовнішні кільця мають додатну
+    площу за формулою Гаусса (вісь y вниз), внутрішні - від'ємну.
+    """
+    from shapely.geometry.polygon import orient
+
+    commands = []
+    cursor_x, cursor_y = 0, 0
+    for polygon in polygons:
+        polygon = orient(polygon, sign=1.0)
+        for ring in [polygon.exterior, *polygon.interiors]:
+            coords = np.round(np.asarray(ring.coords)[:-1]).astype(np.int64)
+            # Прибираємо послідовні дублікати після округлення
+            if len(coords) > 1:
+                keep = np.any(coords != np.roll(coords, 1, axis=0), axis=1)
+                coords = coords[keep]
+            if len(coords) < 3:
+                continue
+            deltas = np.diff(np.vstack(([cursor_x, cursor_y], coords)), axis=0)
+            cursor_x, cursor_y = (int(v) for v in coords[-1])
+            commands.append(_mvt_command(1, 1))
+            commands.extend((_zigzag(int(deltas[0, 0])), _zigzag(int(deltas[0, 1]))))
+            commands.append(_mvt_command(2, len(deltas) - 1))
+            for dx, dy in deltas[1:].tolist():
+                commands.extend((_zigzag(dx), _zigzag(dy)))
+            commands.append(_mvt_command(7, 1))
+    return commands
+
+
+def encode_mvt_layer(name: str, features: list) -> bytes:
+    """
+    Шар MVT. features - список {"id", "type" (1 - точка, 3 - полігон), "geometry", "properties"}
+    """
+    keys, values = {}, {}
+    encoded_features = []
+    for feature in features:
+        tags = []
+        for key, value in feature['properties'].items():
+            if value is None:
+                continue
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault((type(value).__name__, value), len(values)))
+        encoded_features.append(_pb_bytes(2, (
+            _pb_uint(1, feature['id']) +
+            _pb_packed(2, tags) +
+            _pb_uint(3, feature['type']) +
+            _pb_packed(4, feature['geometry'])
+        )))
+
+    layer = (
+        _pb_uint(15, 2) +
+        _pb_bytes(1, name.encode('utf-8')) +
+        b''.join(encoded_features) +
+        b''.join(_pb_bytes(3, key.encode('utf-8')) for key in keys) +
+        b''.join(_pb_bytes(4, _mvt_value(value)) for _, value in values) +
+        _pb_uint(5, MVT_EXTENT)
+    )
+    return _pb_bytes(3, layer)
+
+
+def lnglat_to_tile_pixels(lng, lat, z: int, x: int, y: int):
+    """Проєкція Web Mercator у координати тайла (0..MVT_EXTENT)"""
+    n = 2 ** z
+    lat_rad = np.radians(np.clip(np.asarray(lat, dtype=np.float64), -85.0511, 85.0511))
+    px = ((np.asarray(lng, dtype=np.float64) + 180.0) / 360.0 * n - x) * MVT_EXTENT
+    py = ((1.0 - np.arcsinh(np.tan(lat_rad)) / np.pi) / 2.0 * n - y) * MVT_EXTENT
+    return px, py
+
+
+def get_mvt_district_geometry(z: int) -> list:
+    """Полігони районів, спрощені з допуском не більше 1 пікселя для заданого масштабу"""
+    geometry_cache = get_district_geometry()
+    geometries = geometry_cache.levels.get(geometry_cache.tolerance_for_zoom(z), [])
+    return [
+        {"id": info["id"], "name": info["name"], "geometry": geometry}
+        for info, geometry in zip(geometry_cache.info, geometries)
+    ]
+
+
+def build_mvt_tile(table: AttractionTable, z: int, x: int, y: int) -> bytes:
+    """Векторний тайл з шарами attractions (точки) та districts (полігони)"""
+    import shapely
+
+    # Шар об'єктів: векторизований відбір точок, що потрапляють у тайл з буфером
+    valid = np.flatnonzero(table.has_coords)
+    px, py = lnglat_to_tile_pixels(table.lng[valid], table.lat[valid], z, x, y)
+    inside = ((px >= -MVT_BUFFER) & (px <= MVT_EXTENT + MVT_BUFFER) &
+              (py >= -MVT_BUFFER) & (py <= MVT_EXTENT + MVT_BUFFER))
+    attraction_features = []
+    for row, tx, ty in zip(valid[inside].tolist(), np.round(px[inside]).astype(int).tolist(),
+                           np.round(py[inside]).astype(int).tolist()):
+        record = table.records[row]
+        attraction_features.append({
+            "id": row + 1,
+            "type": 1,
+            "geometry": mvt_point_geometry(tx, ty),
+            "properties": {
+                "id": record.get('id'),
+                "name": record.get('name'),
+                "category": record.get('category'),
+                "rating": round(float(table.rating[row]), 2)
+            }
+        })
+
+    # Шар районів: спрощення під масштаб, проєкція, обрізання по межах тайла
+    district_features = []
+    for i, district in enumerate(get_mvt_district_geometry(z)):
+        def project(coords):
+            tx, ty = lnglat_to_tile_pixels(coords[:, 0], coords[:, 1], z, x, y)
+            return np.column_stack((tx, ty))
+
+        geometry = shapely.clip_by_rect(
+            shapely.transform(district["geometry"], project),
+            -MVT_BUFFER, -MVT_BUFFER, MVT_EXTENT + MVT_BUFFER, MVT_EXTENT + MVT_BUFFER
+        )
+        if geometry.is_empty:
+            continue
+        polygons = [g for g in getattr(geometry, 'geoms', [geometry]) if g.geom_type == 'Polygon']
+        commands = mvt_polygon_geometry(polygons)
+        if commands:
+            district_features.append({
+                "id": i + 1,
+                "type": 3,
+                "geometry": commands,
+                "properties": {"id": district["id"], "name": district["name"]}
+            })
+
+    layers = b''
+    if attraction_features:
+        layers += encode_mvt_layer('attractions', attraction_features)
+    if district_features:
+        layers += encode_mvt_layer('districts', district_features)
+    return layers
+
+
+def get_mvt_tile(z: int, x: int, y: int) -> bytes:
+    """Векторний тайл: кеш масштабу в пам'яті -> попередньо відрендерений файл -> побудова"""
+    table = get_attraction_table()
+    cache = MVT_TILE_CACHES.setdefault(z, LRUCache(maxsize=512))
+    cache.ensure_version(table.version)
+
+    tile = cache.get((x, y))
+    if tile is None:
+        path = MVT_TILES_DIR / table.version / str(z) / str(x) / f"{y}.mvt"
+        tile = path.read_bytes() if path.exists() else build_mvt_tile(table, z, x, y)
+        cache.set((x, y), tile)
+    return tile
+
+
+def prerender_mvt_tiles(min_zoom: int, max_zoom: int) -> int:
+    """
+    Попередній рендер усіх тайлів, що покривають набір даних, на диск
+    ({SNAPSHOT_DIR}/tiles/{version}/{z}/{x}/{y}.mvt). Повертає кількість тайлів.
+    """
+    import shutil
+
+    table = get_attraction_table()
+    lats = [table.lat[table.has_coords]]
+    lngs = [table.lng[table.has_coords]]
+    for district in load_district_polygons():
+        lng_min, lat_min, lng_max, lat_max = district["geometry"].bounds
+        lats.append(np.array([lat_min, lat_max]))
+        lngs.append(np.array([lng_min, lng_max]))
+    lats, lngs = np.concatenate(lats), np.concatenate(lngs)
+    if len(lats) == 0:
+        return 0
+
+    version_dir = MVT_TILES_DIR / table.version
+    count = 0
+    for z in range(min_zoom, max_zoom + 1):
+        n = 2 ** z
+        px, py = lnglat_to_tile_pixels([lngs.min(), lngs.max()], [lats.max(), lats.min()], z, 0, 0)
+        x_range = range(max(0, int(px[0] // MVT_EXTENT)), min(n - 1, int(px[1] // MVT_EXTENT)) + 1)
+        y_range = range(max(0, int(py[0] // MVT_EXTENT)), min(n - 1, int(py[1] // MVT_EXTENT)) + 1)
+        for x in x_range:
+            for y in y_range:
+                path = version_dir / str(z) / str(x) / f"{y}.mvt"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(build_mvt_tile(table, z, x, y))
+                count += 1
+
+    # Тайли попередніх версій набору даних більше не потрібні
+    for old_dir in MVT_TILES_DIR.iterdir():
+        if old_dir.is_dir() and old_dir.name != table.version:
+            shutil.rmtree(old_dir, ignore_errors=True)
+    return count
+
+
+# ============= BUFFER ZONES & DISTANCE ANALYTICS (Розділ 2.5) =============
+# Аналіз у метричній проєкції (UTM 35N) з KD-деревом замість попарних відстаней
+
+BUFFER_RADII_KM = (1.0, 5.0, 10.0)
+NN_DISTANCE_BINS_KM = (0, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20)
+SPATIAL_ANALYTICS_CACHE = LRUCache(maxsize=64)
+_METRIC_TRANSFORMER = None
+
+
+def project_to_metric(lat, lng) -> np.ndarray:
+    """Векторизована проєкція (lat, lng) у METRIC_CRS; повертає масив (n, 2) у метрах"""
+    global _METRIC_TRANSFORMER
+    from pyproj import Transformer
+
+    if _METRIC_TRANSFORMER is None:
+        _METRIC_TRANSFORMER = Transformer.from_crs("EPSG:4326", METRIC_CRS, always_xy=True)
+    x, y = _METRIC_TRANSFORMER.transform(np.asarray(lng, dtype=np.float64), np.asarray(lat, dtype=np.float64))
+    return np.column_stack((x, y))
+
+
+def get_metric_points(table: AttractionTable):
+    """Рядки з координатами, їх метричні координати та KD-дерево (кеш на версію набору даних)"""
+    SPATIAL_ANALYTICS_CACHE.ensure_version(table.version)
+    cached = SPATIAL_ANALYTICS_CACHE.get('metric_points')
+    if cached is None:
+        rows = np.flatnonzero(table.has_coords)
+        xy = project_to_metric(table.lat[rows], table.lng[rows])
+        cached = (rows, xy, cKDTree(xy))
+        SPATIAL_ANALYTICS_CACHE.set('metric_points', cached)
+    return cached
+
+
+def summarize_distribution(values: np.ndarray, digits: int = 3) -> dict:
+    """Описова статистика розподілу"""
+    if len(values) == 0:
+        return {"count": 0}
+    p10, p25, p50, p75, p90 = np.percentile(values, [10, 25, 50, 75, 90])
+    return {
+        "count": int(len(values)),
+        "mean": round(float(values.mean()), digits),
+        "std": round(float(values.std()), digits),
+        "min": round(float(values.min()), digits),
+        "p10": round(float(p10), digits),
+        "p25": round(float(p25), digits),
+        "median": round(float(p50), digits),
+        "p75": round(float(p75), digits),
+        "p90": round(float(p90), digits),
+        "max": round(float(values.max()), digits)
+    }
+
+
+def calculate_buffer_analysis(radius_km: float, include_attractions: bool = False) -> dict:
+    """
+    Буферні зони: кількість об'єктів у радіусі R км від центру кожного району
+    та від кожного об'єкта (без урахування самого об'єкта).
+    """
+    table = get_attraction_table()
+    rows, xy, tree = get_metric_points(table)
+    key = ('buffers', round(radius_km, 3), include_attractions)
+    cached = SPATIAL_ANALYTICS_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    radius_m = radius_km * 1000
+    n_categories = len(table.categories)
+
+    # Буфери навколо центроїдів районів
+    district_buffers = []
+    geometry_cache = get_district_geometry()
+    if geometry_cache.info and len(rows):
+        centers = project_to_metric(
+            [d["centroid"][0] for d in geometry_cache.info],
+            [d["centroid"][1] for d in geometry_cache.info]
+        )
+        for info, neighbours in zip(geometry_cache.info, tree.query_ball_point(centers, radius_m)):
+            by_category = np.bincount(table.category_codes[rows[neighbours]], minlength=n_categories)
+            district_buffers.append({
+                "district_id": info["id"],
+                "district_name": info["name"],
+                "center": info["centroid"],
+                "objects_count": len(neighbours),
+                "buffer_area_km2": round(float(np.pi * radius_km ** 2), 2),
+                "category_distribution": {
+                    table.categories[c]: int(count) for c, count in enumerate(by_category) if count
+                }
+            })
+
+    # Буфери навколо кожного об'єкта (одним пакетним запитом до дерева)
+    neighbour_counts = (tree.query_ball_point(xy, radius_m, return_length=True) - 1
+                        if len(rows) else np.zeros(0, dtype=np.int64))
+    result = {
+        "radius_km": radius_km,
+        "district_buffers": district_buffers,
+        "attraction_buffers": {
+            "summary": summarize_distribution(neighbour_counts.astype(np.float64), digits=2),
+            "isolated_objects": int(np.sum(neighbour_counts == 0)),
+            "by_category": {
+                cat: summarize_distribution(
+                    neighbour_counts[table.category_codes[rows] == code].astype(np.float64), digits=2
+                )
+                for code, cat in enumerate(table.categories)
+                if np.any(table.category_codes[rows] == code)
+            }
+        }
+    }
+    if include_attractions:
+        result["attractions"] = [
+            {"id": table.records[row].get('id'), "objects_within_radius": int(count)}
+            for row, count in zip(rows.tolist(), neighbour_counts.tolist())
+        ]
+
+    SPATIAL_ANALYTICS_CACHE.set(key, result)
+    return result
+
+
+def calculate_nearest_neighbor_distances() -> dict:
+    """
+    Розподіл відстаней до найближчого сусіда тієї ж категорії (км) та
+    індекс Кларка-Еванса R = r̄_obs / (0.5 / √(n / A)): R < 1 - кластеризація, R > 1 - рівномірність.
+    """
+    table = get_attraction_table()
+    rows, xy, tree = get_metric_points(table)
+    cached = SPATIAL_ANALYTICS_CACHE.get('nn_distances')
+    if cached is not None:
+        return cached
+
+    geometry_cache = get_district_geometry()
+    study_area_km2 = sum(d["area_km2"] for d in geometry_cache.info)
+
+    def describe(points_xy: np.ndarray) -> dict:
+        if len(points_xy) < 2:
+            return {"count": int(len(points_xy))}
+        distances_km = cKDTree(points_xy).query(points_xy, k=2)[0][:, 1] / 1000
+        histogram, _ = np.histogram(distances_km, bins=[*NN_DISTANCE_BINS_KM, np.inf])
+        stats = summarize_distribution(distances_km)
+        stats["histogram"] = [
+            {"from_km": lo, "to_km": hi, "count": int(count)}
+            for lo, hi, count in zip(NN_DISTANCE_BINS_KM, [*NN_DISTANCE_BINS_KM[1:], None], histogram)
+        ]
+        if study_area_km2 > 0:
+            expected_km = 0.5 / np.sqrt(len(points_xy) / study_area_km2)
+            stats["clark_evans_index"] = round(float(distances_km.mean() / expected_km), 3)
+        return stats
+
+    codes = table.category_codes[rows]
+    result = {
+        "all_objects": describe(xy),
+        "by_category": {
+            cat: describe(xy[codes == code])
+            for code, cat in enumerate(table.categories)
+            if np.any(codes == code)
+        },
+        "study_area_km2": round(study_area_km2, 2)
+    }
+    SPATIAL_ANALYTICS_CACHE.set('nn_distances', result)
+    return result
+
+
+# ============= SPATIAL AUTOCORRELATION: MORAN'S I & GETIS-ORD Gi* =============
+# Розріджена матриця просторових ваг будується один раз на версію набору даних
+
+HOTSPOT_VARIABLES = ('rating', 'visits')
+HOTSPOT_WEIGHT_TYPES = ('knn', 'distance_band')
+HOTSPOT_PERMUTATION_CHUNK = 99
+_HOTSPOT_POOL = None
+
+
+def build_spatial_weights(table: AttractionTable, weight_type: str = 'knn', k: int = 8,
+                          band_km: float = 2.0):
+    """
+    Бінарна розріджена матриця сусідства W (csr) для об'єктів з координатами.
+    knn - k найближчих сусідів, distance_band - усі сусіди в радіусі band_km.
+    Результат кешується на версію набору даних.
+    """
+    from scipy import sparse
+
+    rows, xy, tree = get_metric_points(table)
+    key = ('weights', weight_type, k if weight_type == 'knn' else round(band_km, 3))
+    cached = SPATIAL_ANALYTICS_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    n = len(rows)
+    if weight_type == 'knn':
+        k_eff = min(k, n - 1)
+        _, idx = tree.query(xy, k=k_eff + 1, workers=-1)
+        # Стовпець 0 - сам об'єкт (або дублікат координат), відкидаємо самопосилання нижче
+        i = np.repeat(np.arange(n), k_eff + 1)
+        j = idx.ravel()
+    else:
+        pairs = tree.query_pairs(band_km * 1000, output_type='ndarray')
+        i = np.concatenate((pairs[:, 0], pairs[:, 1]))
+        j = np.concatenate((pairs[:, 1], pairs[:, 0]))
+
+    keep = i != j
+    weights = sparse.csr_matrix((np.ones(int(keep.sum())), (i[keep], j[keep])), shape=(n, n))
+    weights.data[:] = 1.0  # дублікати пар при kNN сумуються - повертаємо бінарність
+    weights.eliminate_zeros()
+
+    SPATIAL_ANALYTICS_CACHE.set(key, weights)
+    return weights
+
+
+def row_standardize(weights):
+    """Рядкова стандартизація W (сума ваг кожного рядка = 1, ізольовані рядки - 0)"""
+    from scipy import sparse
+
+    row_sums = np.asarray(weights.sum(axis=1)).ravel()
+    inverse = np.divide(1.0, row_sums, out=np.zeros_like(row_sums), where=row_sums > 0)
+    return sparse.diags(inverse) @ weights
+
+
+def _moran_permutation_worker(weights, z: np.ndarray, n_permutations: int, seed: int) -> np.ndarray:
+    """Значення I Морана для випадкових перестановок (виконується в окремому процесі)"""
+    rng = np.random.default_rng(seed)
+    n = len(z)
+    s0 = weights.sum()
+    denominator = float(z @ z)
+    permuted = np.column_stack([rng.permutation(z) for _ in range(n_permutations)])
+    lagged = weights @ permuted
+    return (n / s0) * np.einsum('ij,ij->j', permuted, lagged) / denominator
+
+
+def get_hotspot_pool():
+    """Пул процесів для перестановочного тесту (створюється при першому зверненні)"""
+    global _HOTSPOT_POOL
+    from concurrent.futures import ProcessPoolExecutor
+
+    if _HOTSPOT_POOL is None:
+        _HOTSPOT_POOL = ProcessPoolExecutor(max_workers=max(1, min(4, (os.cpu_count() or 2) - 1)))
+    return _HOTSPOT_POOL
+
+
+async def calculate_morans_i(weights, values: np.ndarray, permutations: int = 999) -> dict:
+    """
+    Глобальний індекс Морана I = (n / S0) · (zᵀ W z) / (zᵀ z), z = x - x̄,
+    з аналітичним тестом (припущення нормальності) та перестановочним псевдо-p.
+    """
+    import asyncio
+    from scipy.stats import norm
+
+    n = len(values)
+    z = values - values.mean()
+    denominator = float(z @ z)
+    if n < 3 or denominator == 0:
+        return {"I": None, "message": "Недостатньо варіації даних"}
+
+    s0 = float(weights.sum())
+    moran_i = (n / s0) * float(z @ (weights @ z)) / denominator
+    expected = -1.0 / (n - 1)
+
+    # Дисперсія при нормальності: VI = (n²S1 - nS2 + 3S0²) / ((n² - 1)S0²) - E[I]²
+    symmetric = weights + weights.T
+    s1 = 0.5 * float(symmetric.multiply(symmetric).sum())
+    s2 = float(np.sum((np.asarray(weights.sum(axis=1)).ravel() + np.asarray(weights.sum(axis=0)).ravel()) ** 2))
+    variance = (n * n * s1 - n * s2 + 3 * s0 * s0) / ((n * n - 1) * s0 * s0) - expected ** 2
+    z_score = (moran_i - expected) / np.sqrt(variance) if variance > 0 else 0.0
+
+    result = {
+        "I": round(moran_i, 5),
+        "expected_I": round(expected, 5),
+        "variance": round(float(variance), 8),
+        "z_score": round(float(z_score), 3),
+        "p_value_normal": round(float(2 * norm.sf(abs(z_score))), 5),
+        "permutations": permutations
+    }
+
+    if permutations > 0:
+        loop = asyncio.get_running_loop()
+        pool = get_hotspot_pool()
+        chunks = [HOTSPOT_PERMUTATION_CHUNK] * (permutations // HOTSPOT_PERMUTATION_CHUNK)
+        if permutations % HOTSPOT_PERMUTATION_CHUNK:
+            chunks.append(permutations % HOTSPOT_PERMUTATION_CHUNK)
+        futures = [
+            loop.run_in_executor(pool, _moran_permutation_worker, weights, z, size, 42 + i)
+            for i, size in enumerate(chunks)
+        ]
+        simulated = np.concatenate(await asyncio.gather(*futures))
+        # Односторонній псевдо-p у напрямку спостереженого відхилення
+        extreme = np.sum(simulated >= moran_i) if moran_i >= simulated.mean() else np.sum(simulated <= moran_i)
+        result.update({
+            "p_value_permutation": round(float((extreme + 1) / (permutations + 1)), 5),
+            "simulated_mean": round(float(simulated.mean()), 5),
+            "simulated_std": round(float(simulated.std()), 5)
+        })
+
+    result["interpretation"] = (
+        "Кластеризація схожих значень" if result["z_score"] > 1.96 else
+        "Дисперсія (шахове розміщення)" if result["z_score"] < -1.96 else
+        "Випадковий просторовий розподіл"
+    )
+    return result
+
+
+def calculate_local_gi_star(weights, values: np.ndarray) -> np.ndarray:
+    """
+    Локальна статистика Getis-Ord Gi* (з урахуванням самого об'єкта, wᵢᵢ = 1) - z-оцінки:
+    Gi* = (Σⱼ wᵢⱼxⱼ - x̄ Σⱼ wᵢⱼ) / (S · √((n Σⱼ wᵢⱼ² - (Σⱼ wᵢⱼ)²) / (n - 1)))
+    """
+    from scipy import sparse
+
+    n = len(values)
+    weights_star = (weights + sparse.identity(n, format='csr')).tocsr()
+    weights_star.data[:] = 1.0
+
+    mean = values.mean()
+    s = np.sqrt(np.mean(values ** 2) - mean ** 2)
+    w_sum = np.asarray(weights_star.sum(axis=1)).ravel()
+    w_sq_sum = np.asarray(weights_star.multiply(weights_star).sum(axis=1)).ravel()
+
+    numerator = weights_star @ values - mean * w_sum
+    denominator = s * np.sqrt(np.maximum(n * w_sq_sum - w_sum ** 2, 0) / (n - 1))
+    return np.divide(numerator, denominator, out=np.zeros(n), where=denominator > 0)
+
+
+async def calculate_hotspots(variable: str, weight_type: str, k: int, band_km: float,
+                             permutations: int, include_all: bool) -> dict:
+    """Гарячі та холодні точки (Gi*) і глобальний I Морана для рейтингу або відвідуваності"""
+    from scipy.stats import norm
+
+    table = get_attraction_table()
+    rows, _, _ = get_metric_points(table)
+    if variable == 'visits':
+        counts, stamp = await get_visit_counts(table)
+        values, value_key = counts[rows], f"visits:{stamp}"
+    else:
+        values, value_key = table.rating[rows].astype(np.float64), 'rating'
+
+    key = ('hotspots', value_key, weight_type, k, round(band_km, 3), permutations, include_all)
+    cached = SPATIAL_ANALYTICS_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    weights = build_spatial_weights(table, weight_type, k, band_km)
+    moran = await calculate_morans_i(row_standardize(weights), values, permutations)
+
+    gi_z = calculate_local_gi_star(weights, values)
+    gi_p = 2 * norm.sf(np.abs(gi_z))
+
+    def classify(z_value: float) -> Optional[str]:
+        if z_value >= 2.58:
+            return "hot_spot_99"
+        if z_value >= 1.96:
+            return "hot_spot_95"
+        if z_value <= -2.58:
+            return "cold_spot_99"
+        if z_value <= -1.96:
+            return "cold_spot_95"
+        return None
+
+    significant = np.flatnonzero(np.abs(gi_z) >= 1.96) if not include_all else np.arange(len(rows))
+    significant = significant[np.argsort(-np.abs(gi_z[significant]), kind='stable')]
+    local = []
+    for i in significant.tolist():
+        record = table.records[rows[i]]
+        local.append({
+            "id": record.get('id'),
+            "name": record.get('name'),
+            "category": record.get('category'),
+            "coordinates": record.get('coordinates'),
+            "value": round(float(values[i]), 3),
+            "gi_z_score": round(float(gi_z[i]), 3),
+            "p_value": round(float(gi_p[i]), 5),
+            "classification": classify(float(gi_z[i]))
+        })
+
+    result = {
+        "variable": variable,
+        "weights": {
+            "type": weight_type,
+            "k": k if weight_type == 'knn' else None,
+            "band_km": band_km if weight_type == 'distance_band' else None,
+            "nonzero": int(weights.nnz),
+            "mean_neighbors": round(weights.nnz / max(len(rows), 1), 2),
+            "isolated": int(np.sum(np.diff(weights.indptr) == 0))
+        },
+        "global_morans_i": moran,
+        "summary": {
+            "hot_spots_99": int(np.sum(gi_z >= 2.58)),
+            "hot_spots_95": int(np.sum((gi_z >= 1.96) & (gi_z < 2.58))),
+            "cold_spots_99": int(np.sum(gi_z <= -2.58)),
+            "cold_spots_95": int(np.sum((gi_z <= -1.96) & (gi_z > -2.58))),
+            "not_significant": int(np.sum(np.abs(gi_z) < 1.96))
+        },
+        "local_gi_star": local
+    }
+    SPATIAL_ANALYTICS_CACHE.set(key, result)
+    return result
+
+
+# ============= COVERAGE GAP GRID =============
+# Регулярна сітка над областю: відстань від кожної клітинки до найближчого об'єкта кожної категорії
+
+# Географічні межі Житомирської області (Розділ 2.4)
+OBLAST_BOUNDS = {"lat_min": 49.44, "lat_max": 51.50, "lng_min": 27.15, "lng_max": 29.15}
+
+COVERAGE_MIN_RESOLUTION_M = 500
+COVERAGE_CACHE = LRUCache(maxsize=8)
+
+
+class CoverageGrid:
+    """
+    Сітка покриття для заданої роздільності.
+
+    lat/lng - центри клітинок (лише ті, що потрапляють у полігони районів),
+    district_idx - індекс району клітинки, distances_km[i, c] - відстань від клітинки i
+    до найближчого об'єкта категорії c (inf, якщо об'єктів категорії немає).
+    """
+
+    def __init__(self, table: AttractionTable, resolution_m: int):
+        from pyproj import Transformer
+        import shapely
+
+        self.resolution_m = resolution_m
+        self.categories = list(table.categories)
+        geometry_cache = get_district_geometry()
+        self.district_ids = [d["id"] for d in geometry_cache.info]
+
+        # Межі сітки: межі області, розширені до меж полігонів районів
+        lat_min, lat_max = OBLAST_BOUNDS["lat_min"], OBLAST_BOUNDS["lat_max"]
+        lng_min, lng_max = OBLAST_BOUNDS["lng_min"], OBLAST_BOUNDS["lng_max"]
+        for info in geometry_cache.info:
+            b_lng_min, b_lat_min, b_lng_max, b_lat_max = info["bounds"]
+            lat_min, lat_max = min(lat_min, b_lat_min), max(lat_max, b_lat_max)
+            lng_min, lng_max = min(lng_min, b_lng_min), max(lng_max, b_lng_max)
+
+        corners = project_to_metric([lat_min, lat_min, lat_max, lat_max], [lng_min, lng_max, lng_min, lng_max])
+        xs = np.arange(corners[:, 0].min() + resolution_m / 2, corners[:, 0].max(), resolution_m)
+        ys = np.arange(corners[:, 1].min() + resolution_m / 2, corners[:, 1].max(), resolution_m)
+        grid_x, grid_y = (a.ravel() for a in np.meshgrid(xs, ys))
+
+        # Обрізання по полігонах районів (векторизований point-in-polygon)
+        self.district_idx = np.full(len(grid_x), -1, dtype=np.int16)
+        if geometry_cache.districts:
+            for i, polygon in enumerate(geometry_cache.metric_geometries):
+                inside = (self.district_idx < 0) & shapely.contains_xy(polygon, grid_x, grid_y)
+                self.district_idx[inside] = i
+            keep = self.district_idx >= 0
+            grid_x, grid_y, self.district_idx = grid_x[keep], grid_y[keep], self.district_idx[keep]
+
+        inverse = Transformer.from_crs(METRIC_CRS, "EPSG:4326", always_xy=True)
+        self.lng, self.lat = inverse.transform(grid_x, grid_y)
+
+        # Відстань до найближчого об'єкта кожної категорії - по одному KD-дереву на категорію
+        rows, xy, _ = get_metric_points(table)
+        codes = table.category_codes[rows]
+        cells = np.column_stack((grid_x, grid_y))
+        self.distances_km = np.full((len(cells), len(self.categories)), np.inf, dtype=np.float32)
+        for code in range(len(self.categories)):
+            category_xy = xy[codes == code]
+            if len(category_xy) and len(cells):
+                self.distances_km[:, code] = cKDTree(category_xy).query(cells, k=1, workers=-1)[0] / 1000
+
+    def __len__(self):
+        return len(self.lat)
+
+    @property
+    def cell_area_km2(self) -> float:
+        return (self.resolution_m / 1000) ** 2
+
+
+def get_coverage_grid(resolution_m: int) -> CoverageGrid:
+    """Сітка покриття для роздільності resolution_m (кеш на версію набору даних)"""
+    table = get_attraction_table()
+    COVERAGE_CACHE.ensure_version(table.version)
+    grid = COVERAGE_CACHE.get(resolution_m)
+    if grid is None:
+        grid = CoverageGrid(table, resolution_m)
+        COVERAGE_CACHE.set(resolution_m, grid)
+    return grid
+
+
+def find_coverage_gaps(grid: CoverageGrid, threshold_km: float, category: Optional[str], limit: int) -> dict:
+    """
+    Недостатньо обслуговані клітинки: відстань до найближчого об'єкта категорії
+    (або будь-якого об'єкта, якщо категорію не задано) перевищує threshold_km
+    """
+    if category:
+        code = grid.categories.index(category) if category in grid.categories else None
+        gap = grid.distances_km[:, code] if code is not None else np.full(len(grid), np.inf, dtype=np.float32)
+    else:
+        gap = grid.distances_km.min(axis=1) if grid.categories else np.full(len(grid), np.inf, dtype=np.float32)
+
+    underserved = np.flatnonzero(gap > threshold_km)
+    if len(underserved) > limit:
+        underserved = underserved[np.argpartition(-gap[underserved], limit - 1)[:limit]]
+    underserved = underserved[np.argsort(-gap[underserved], kind='stable')]
+
+    def finite_km(value) -> Optional[float]:
+        # inf (категорія без координат) не серіалізується в JSON
+        return round(float(value), 2) if np.isfinite(value) else None
+
+    above = grid.distances_km > threshold_km
+    cells = []
+    for i in underserved.tolist():
+        cells.append({
+            "lat": round(float(grid.lat[i]), 5),
+            "lng": round(float(grid.lng[i]), 5),
+            "district_id": grid.district_ids[grid.district_idx[i]] if grid.district_ids else None,
+            "gap_km": finite_km(gap[i]),
+            "distances_km": {cat: finite_km(d) for cat, d in zip(grid.categories, grid.distances_km[i])},
+            "underserved_categories": [cat for cat, flag in zip(grid.categories, above[i]) if flag]
+        })
+
+    return {
+        "resolution_m": grid.resolution_m,
+        "cell_area_km2": grid.cell_area_km2,
+        "threshold_km": threshold_km,
+        "category": category,
+        "total_cells": len(grid),
+        "underserved_cells": int(np.sum(gap > threshold_km)),
+        "underserved_area_km2": round(float(np.sum(gap > threshold_km) * grid.cell_area_km2), 2),
+        "by_category": {
+            cat: {
+                "underserved_cells": int(above[:, code].sum()),
+                "underserved_share": round(float(above[:, code].mean()) * 100, 2) if len(grid) else 0,
+                "mean_distance_km": finite_km(np.mean(grid.distances_km[:, code])) if len(grid) else 0,
+                "max_distance_km": finite_km(np.max(grid.distances_km[:, code])) if len(grid) else 0
+            }
+            for code, cat in enumerate(grid.categories)
+        },
+        "cells": cells
+    }
+
+
+# ============= VORONOI SERVICE AREAS =============
+# Кеш ключується ревізією категорії, тож правки інших категорій його не скидають
+
+SERVICE_AREA_CACHE = LRUCache(maxsize=32)
+SERVICE_AREA_REVISIONS = {}  # категорія (None - усі об'єкти) -> кількість правок її об'єктів
+SERVICE_AREA_FIELDS = {'id', 'name', 'category', 'coordinates'}  # поля, що потрапляють у GeoJSON
+
+
+def bump_service_area_revisions(*categories):
+    """Нова ревізія зон обслуговування для категорій та для зон усіх об'єктів (None)"""
+    for category in {None, *categories}:
+        SERVICE_AREA_REVISIONS[category] = SERVICE_AREA_REVISIONS.get(category, 0) + 1
+
+
+def build_service_areas(table: AttractionTable, category: Optional[str]) -> bytes:
+    """
+    Діаграма Вороного об'єктів категорії в метричній проєкції, обрізана полігонами районів.
+    Кожна комірка - зона обслуговування найближчого об'єкта. Повертає GeoJSON (байти, WGS84).
+    """
+    import shapely
+    from pyproj import Transformer
+    from shapely.geometry import mapping
+
+    mask = table.has_coords if not category else table.has_coords & table.category_mask(category)
+    rows = np.flatnonzero(mask)
+    xy = project_to_metric(table.lat[rows], table.lng[rows])
+
+    # Об'єкти з однаковими координатами мають спільну комірку
+    unique_xy, first_index, inverse_index = np.unique(
+        np.round(xy, 1), axis=0, return_index=True, return_inverse=True
+    )
+    inverse_index = inverse_index.ravel()
+
+    geometry_cache = get_district_geometry()
+    clip_area = unary_union(geometry_cache.metric_geometries) if geometry_cache.districts else None
+
+    features = []
+    if len(unique_xy):
+        points = shapely.points(unique_xy)
+        if len(unique_xy) == 1:
+            cells = np.array([clip_area if clip_area is not None else shapely.box(*shapely.total_bounds(points)).buffer(50000)])
+        else:
+            extent = shapely.box(*shapely.total_bounds(points)).buffer(50000)
+            if clip_area is not None:
+                extent = unary_union([extent, shapely.box(*clip_area.bounds)])
+            diagram = shapely.voronoi_polygons(shapely.multipoints(points), extend_to=extent, ordered=True)
+            cells = np.asarray(shapely.get_parts(diagram))
+        if clip_area is not None:
+            cells = shapely.intersection(cells, clip_area)
+
+        areas_km2 = shapely.area(cells) / 1e6
+        inverse = Transformer.from_crs(METRIC_CRS, "EPSG:4326", always_xy=True)
+
+        def to_wgs84(coords):
+            lng, lat = inverse.transform(coords[:, 0], coords[:, 1])
+            return np.round(np.column_stack((lng, lat)), 5)
+
+        for cell_index, (cell, area_km2) in enumerate(zip(cells, areas_km2)):
+            if cell.is_empty:
+                continue
+            served_rows = rows[inverse_index == cell_index]
+            record = table.records[rows[first_index[cell_index]]]
+            features.append({
+                "type": "Feature",
+                "id": record.get('id'),
+                "properties": {
+                    "attraction_id": record.get('id'),
+                    "name": record.get('name'),
+                    "category": record.get('category'),
+                    "coordinates": record.get('coordinates'),
+                    "area_km2": round(float(area_km2), 3),
+                    "co_located_ids": [table.records[r].get('id') for r in served_rows.tolist()
+                                       if r != rows[first_index[cell_index]]]
+                },
+                "geometry": mapping(shapely.transform(cell, to_wgs84))
+            })
+
+    areas = [f["properties"]["area_km2"] for f in features]
+    collection = {
+        "type": "FeatureCollection",
+        "category": category,
+        "service_areas": len(features),
+        "total_area_km2": round(float(sum(areas)), 2),
+        "mean_area_km2": round(float(np.mean(areas)), 3) if areas else 0,
+        "features": features
+    }
+    return json.dumps(collection, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def get_service_areas(category: Optional[str]) -> bytes:
+    """Зони обслуговування з кешу (ключ - категорія та ревізія її об'єктів)"""
+    table = get_attraction_table()
+    key = (category, SERVICE_AREA_REVISIONS.get(category, 0))
+    geojson = SERVICE_AREA_CACHE.get(key)
+    if geojson is None:
+        geojson = build_service_areas(table, category)
+        SERVICE_AREA_CACHE.set(key, geojson)
+    return geojson
+
+
+# ============= OFFLINE REVERSE GEOCODING =============
+# Найближчий населений пункт та громада для кожного об'єкта з локального довідника
+
+GEOCODE_MAX_DISTANCE_KM = 15.0
+
+
+class SettlementGazetteer:
+    """
+    Довідник населених пунктів з KD-деревом на одиничній сфері.
+
+    Формат CSV (UTF-8, з заголовком): name,hromada,district,lat,lng
+    (district необов'язковий; замість lng допускається lon).
+    """
+
+    def __init__(self, names: list, hromadas: list, districts: list, lat: np.ndarray, lng: np.ndarray):
+        self.names = names
+        self.hromadas = hromadas
+        self.districts = districts
+        self.lat = lat
+        self.lng = lng
+        self.tree = cKDTree(latlng_to_unit_xyz(lat, lng)) if len(names) else None
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def load(cls, path: Path) -> 'SettlementGazetteer':
+        import csv
+
+        names, hromadas, districts, lats, lngs = [], [], [], [], []
+        if path.exists():
+            try:
+                with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+                    for row in csv.DictReader(f):
+                        try:
+                            lat = float(row['lat'])
+                            lng = float(row.get('lng') or row.get('lon'))
+                        except (KeyError, TypeError, ValueError):
+                            continue
+                        names.append((row.get('name') or '').strip())
+                        hromadas.append((row.get('hromada') or '').strip() or None)
+                        districts.append((row.get('district') or '').strip() or None)
+                        lats.append(lat)
+                        lngs.append(lng)
+                logger.info(f"[Geocoder] Loaded {len(names)} settlements from {path.name}")
+            except OSError as e:
+                logger.error(f"[Geocoder] Failed to read gazetteer: {str(e)}")
+        else:
+            logger.warning(f"[Geocoder] Gazetteer file not found: {path}")
+        return cls(names, hromadas, districts, np.array(lats, dtype=np.float64), np.array(lngs, dtype=np.float64))
+
+    def resolve(self, lat, lng, max_distance_km: float = GEOCODE_MAX_DISTANCE_KM):
+        """
+        Пакетне зворотне геокодування: індекс найближчого населеного пункту для кожної
+        точки (-1, якщо довідник порожній, точка без координат або далі max_distance_km)
+        та відстань до нього в км
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lng = np.asarray(lng, dtype=np.float64)
+        idx = np.full(len(lat), -1, dtype=np.int64)
+        distances = np.full(len(lat), np.inf)
+        valid = (lat != 0) & (lng != 0) & np.isfinite(lat) & np.isfinite(lng)
+        if self.tree is None or not valid.any():
+            return idx, distances
+
+        chord, nearest = self.tree.query(latlng_to_unit_xyz(lat[valid], lng[valid]), k=1, workers=-1)
+        distances[valid] = chord_to_km(chord)
+        idx[valid] = np.where(distances[valid] <= max_distance_km, nearest, -1)
+        return idx, distances
+
+    def locality(self, i: int, distance_km: float) -> Optional[dict]:
+        if i < 0:
+            return None
+        return {
+            "settlement": self.names[i],
+            "hromada": self.hromadas[i],
+            "district": self.districts[i],
+            "distance_km": round(float(distance_km), 2)
+        }
+
+    def resolve_records(self, records: list) -> list:
+        """Населені пункти для списку записів з полем coordinates (один векторизований прохід)"""
+        def as_float(value) -> float:
+            try:
+                return float(value or 0)
+            except (TypeError, ValueError):
+                return 0.0
+
+        coords = [r.get('coordinates') if isinstance(r.get('coordinates'), dict) else {} for r in records]
+        idx, distances = self.resolve(
+            [as_float(c.get('lat')) for c in coords],
+            [as_float(c.get('lng')) for c in coords]
+        )
+        return [self.locality(i, d) for i, d in zip(idx.tolist(), distances.tolist())]
+
+
+GAZETTEER = None
+ATTRACTION_LOCALITIES = {'version': None, 'data': []}
+
+
+def get_gazetteer() -> SettlementGazetteer:
+    global GAZETTEER
+
+    if GAZETTEER is None:
+        GAZETTEER = SettlementGazetteer.load(GAZETTEER_FILE)
+    return GAZETTEER
+
+
+def get_attraction_localities() -> list:
+    """Населений пункт і громада для кожного рядка AttractionTable (кеш на версію набору даних)"""
+    table = get_attraction_table()
+    if ATTRACTION_LOCALITIES['version'] != table.version:
+        gazetteer = get_gazetteer()
+        idx, distances = gazetteer.resolve(table.lat, table.lng)
+        ATTRACTION_LOCALITIES.update({
+            'version': table.version,
+            'data': [gazetteer.locality(i, d) for i, d in zip(idx.tolist(), distances.tolist())]
+        })
+    return ATTRACTION_LOCALITIES['data']
+
+
+# ============= OPENING HOURS =============
+
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+OPENING_HOURS_TZ = ZoneInfo('Europe/Kyiv')
+DAY_MINUTES = 24 * 60
+WEEK_MINUTES = 7 * DAY_MINUTES
+WEEKDAYS = ('mo', 'tu', 'we', 'th', 'fr', 'sa', 'su')
+
+OPENING_HOURS_TOKEN = re.compile(
+    r'\s*(?:'
+    r'(?P<always>24/7)'
+    r'|(?P<time>\d{1,2}:\d{2}\s*-\s*\d{1,2}:\d{2})'
+    r'|(?P<days>(?:mo|tu|we|th|fr|sa|su)(?:\s*-\s*(?:mo|tu|we|th|fr|sa|su))?)'
+    r'|(?P<holiday>ph|sh)'
+    r'|(?P<closed>off|closed)'
+    r'|(?P<sep>,)'
+    r')',
+    re.IGNORECASE
+)
+
+
+def _parse_clock(value: str) -> int:
+    hours, minutes = value.strip().split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def _tokenize_opening_rule(rule: str) -> Optional[list]:
+    """Токени одного правила (частина рядка між ';'); None - нерозпізнаний формат"""
+    tokens, position = [], 0
+    rule = rule.strip()
+    while position < len(rule):
+        match = OPENING_HOURS_TOKEN.match(rule, position)
+        if not match or match.end() == position:
+            return None
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind).lower()
+        if kind == 'days':
+            bounds = [WEEKDAYS.index(d.strip()) for d in value.split('-')]
+            first, last = bounds[0], bounds[-1]
+            # Діапазон через кінець тижня, напр. Su-Tu
+            value = [(first + i) % 7 for i in range((last - first) % 7 + 1)]
+        elif kind == 'time':
+            start, end = (_parse_clock(v) for v in value.split('-'))
+            if end <= start:
+                end += DAY_MINUTES  # після півночі, напр. 12:00-02:00
+            value = (start, end)
+        tokens.append((kind, value))
+    return tokens
+
+
+@lru_cache(maxsize=4096)
+def parse_opening_hours(text: Optional[str]) -> Optional[tuple]:
+    """
+    Розбір рядка workingHours (підмножина формату OSM opening_hours) у тижневі інтервали.
+
+    Повертає відсортовані інтервали (start, end) у хвилинах від понеділка 00:00,
+    порожній кортеж - закрито, None - години невідомі або формат не розпізнано.
+    Правила через ';' перекривають попередні для своїх днів, через ',' - доповнюють;
+    PH/SH (свята, канікули) ігноруються.
+    """
+    if not text or not str(text).strip():
+        return None
+
+    week = {}
+    for rule in str(text).strip().strip('"').split(';'):
+        if not rule.strip():
+            continue
+        tokens = _tokenize_opening_rule(rule)
+        if tokens is None:
+            return None
+
+        groups, days, times, closed, holiday = [], [], [], False, False
+        for kind, value in tokens:
+            if kind == 'sep':
+                continue
+            if kind in ('days', 'holiday') and (times or closed):
+                groups.append((days, times, closed, holiday))
+                days, times, closed, holiday = [], [], False, False
+            if kind == 'days':
+                days.extend(value)
+            elif kind == 'holiday':
+                holiday = True
+            elif kind == 'time':
+                times.append(value)
+            elif kind == 'always':
+                times.append((0, DAY_MINUTES))
+            elif kind == 'closed':
+                closed = True
+        groups.append((days, times, closed, holiday))
+
+        assigned = set()
+        for days, times, closed, holiday in groups:
+            if not times and not closed:
+                continue
+            if holiday and not days:
+                continue
+            for day in days or range(7):
+                if day not in assigned:
+                    week[day] = []
+                    assigned.add(day)
+                if not closed:
+                    week[day].extend(times)
+
+    intervals = []
+    for day, times in week.items():
+        for start, end in times:
+            start, end = day * DAY_MINUTES + start, day * DAY_MINUTES + end
+            if end > WEEK_MINUTES:
+                intervals.append((0, end - WEEK_MINUTES))
+                end = WEEK_MINUTES
+            intervals.append((start, end))
+
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return tuple(merged)
+
+
+def week_minute(moment: datetime) -> int:
+    """Хвилина тижня (понеділок 00:00 = 0) за київським часом; наївний datetime вважається місцевим"""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(OPENING_HOURS_TZ)
+    return moment.weekday() * DAY_MINUTES + moment.hour * 60 + moment.minute
+
+
+class OpeningHoursIndex:
+    """
+    Інтервальний індекс годин роботи всіх об'єктів AttractionTable.
+
+    Інтервали зберігаються плоскими масивами, відсортованими за початком:
+    для моменту t searchsorted відсікає інтервали, що починаються пізніше,
+    а решта перевіряється однією векторною умовою end > t.
+    known - маска об'єктів з розпізнаними годинами роботи.
+    """
+
+    def __init__(self, table: AttractionTable):
+        self.version = table.version
+        self.n = len(table)
+        self.known = np.zeros(self.n, dtype=bool)
+        starts, ends, rows = [], [], []
+        for row, record in enumerate(table.records):
+            intervals = parse_opening_hours(record.get('workingHours'))
+            if intervals is None:
+                continue
+            self.known[row] = True
+            for start, end in intervals:
+                starts.append(start)
+                ends.append(end)
+                rows.append(row)
+
+        order = np.argsort(starts, kind='stable')
+        self.starts = np.asarray(starts, dtype=np.int32)[order]
+        self.ends = np.asarray(ends, dtype=np.int32)[order]
+        self.rows = np.asarray(rows, dtype=np.int32)[order]
+
+    def open_mask(self, moment: datetime) -> np.ndarray:
+        """Маска об'єктів, відкритих у заданий момент"""
+        t = week_minute(moment)
+        candidates = np.searchsorted(self.starts, t, side='right')
+        mask = np.zeros(self.n, dtype=bool)
+        mask[self.rows[:candidates][self.ends[:candidates] > t]] = True
+        return mask
+
+    def open_for_mask(self, start: datetime, end: datetime, min_minutes: int) -> np.ndarray:
+        """Маска об'єктів, відкритих безперервно щонайменше min_minutes у вікні [start, end)"""
+        a = week_minute(start)
+        b = a + max(0, int((end - start).total_seconds() // 60))
+        # Вікно може переходити через кінець тижня - додаємо копію інтервалів, зсунуту на тиждень
+        starts = np.concatenate((self.starts, self.starts + WEEK_MINUTES))
+        ends = np.concatenate((self.ends, self.ends + WEEK_MINUTES))
+        rows = np.concatenate((self.rows, self.rows))
+        overlap = np.minimum(ends, b) - np.maximum(starts, a)
+        mask = np.zeros(self.n, dtype=bool)
+        mask[rows[overlap >= min_minutes]] = True
+        return mask
+
+
+OPENING_HOURS_INDEX = None
+
+
+def get_opening_hours_index() -> OpeningHoursIndex:
+    """Індекс годин роботи для поточної версії набору даних"""
+    global OPENING_HOURS_INDEX
+
+    table = get_attraction_table()
+    if OPENING_HOURS_INDEX is None or OPENING_HOURS_INDEX.version != table.version:
+        OPENING_HOURS_INDEX = OpeningHoursIndex(table)
+    return OPENING_HOURS_INDEX
+
+
+def open_at_mask(open_at: Optional[datetime], include_unknown: bool = False) -> Optional[np.ndarray]:
+    """Маска фільтра open_at (None - без фільтра); об'єкти з невідомими годинами - за include_unknown"""
+    if open_at is None:
+        return None
+    index = get_opening_hours_index()
+    mask = index.open_mask(open_at)
+    if include_unknown:
+        mask |= ~index.known
+    return mask
+
+
+def combine_masks(*masks) -> Optional[np.ndarray]:
+    """Логічне І масок рядків (None - відсутній фільтр)"""
+    result = None
+    for mask in masks:
+        if mask is not None:
+            result = mask if result is None else result & mask
+    return result
+
+
+# ============= FACET BITSETS =============
+
+RATING_FACET_THRESHOLDS = (3.0, 3.5, 4.0, 4.5)
+UNKNOWN_DISTRICT = 'unknown'
+MAX_QUERY_RESULTS = 500
+
+
+def pack_mask(mask: np.ndarray) -> np.ndarray:
+    """Булева маска рядків → бітова множина (слова uint64, біт i - рядок i)"""
+    packed = np.packbits(mask, bitorder='little')
+    padded = np.zeros(-(-len(packed) // 8) * 8, dtype=np.uint8)
+    padded[:len(packed)] = packed
+    return padded.view(np.uint64)
+
+
+def popcount(bits: np.ndarray) -> int:
+    return int(np.bitwise_count(bits).sum())
+
+
+def unpack_rows(bits: np.ndarray, n: int) -> np.ndarray:
+    """Номери рядків, встановлених у бітовій множині"""
+    return np.flatnonzero(np.unpackbits(bits.view(np.uint8), count=n, bitorder='little'))
+
+
+def assign_districts(table: AttractionTable) -> tuple:
+    """
+    Район кожного рядка: векторизований point-in-polygon у METRIC_CRS; точки поза полігонами
+    відносяться до найближчого району (як у determine_district_for_point). Повертає (ids, codes).
+    """
+    import shapely
+
+    geometry_cache = get_district_geometry()
+    district_ids = [d["id"] for d in geometry_cache.info]
+    codes = np.full(len(table), -1, dtype=np.int16)
+    rows = np.flatnonzero(table.has_coords)
+    if district_ids and len(rows):
+        xy = project_to_metric(table.lat[rows], table.lng[rows])
+        points = shapely.points(xy)
+        distances = np.column_stack([shapely.distance(polygon, points)
+                                     for polygon in geometry_cache.metric_geometries])
+        codes[rows] = distances.argmin(axis=1)
+    return district_ids, codes
+
+
+class FacetIndex:
+    """
+    Бітові множини фасетів фільтрів карти для поточної версії AttractionTable:
+    категорія, район, пороги рейтингу, наявність телефону і сайту.
+    Фільтр - побітове І множин, кількість - popcount.
+    Години роботи залежать від моменту запиту, тож їх маска пакується під час запиту.
+    """
+
+    def __init__(self, table: AttractionTable):
+        self.table = table
+        self.version = table.version
+
+        n = len(table)
+        self.categories = {
+            category: pack_mask(table.category_codes == code)
+            for category, code in table.category_index.items()
+        }
+        district_ids, codes = assign_districts(table)
+        self.district_codes = codes
+        self.district_ids = district_ids
+        self.districts = {district_id: pack_mask(codes == i) for i, district_id in enumerate(district_ids)}
+        self.districts[UNKNOWN_DISTRICT] = pack_mask(codes < 0)
+        self.ratings = {threshold: pack_mask(table.rating >= threshold) for threshold in RATING_FACET_THRESHOLDS}
+        self.has_phone = pack_mask(np.array([bool(r.get('phone')) for r in table.records], dtype=bool))
+        self.has_website = pack_mask(np.array([bool(r.get('website')) for r in table.records], dtype=bool))
+        self.all = pack_mask(np.ones(n, dtype=bool))
+
+    def union(self, sets: dict, keys) -> np.ndarray:
+        """Побітове АБО значень одного фасета (невідомі значення - порожня множина)"""
+        result = np.zeros_like(self.all)
+        for key in keys:
+            if key in sets:
+                result |= sets[key]
+        return result
+
+    def rating_range(self, min_rating: Optional[float], max_rating: Optional[float]) -> np.ndarray:
+        rating = self.table.rating
+        mask = np.ones(len(rating), dtype=bool)
+        if min_rating is not None:
+            mask &= rating >= min_rating
+        if max_rating is not None:
+            mask &= rating <= max_rating
+        return pack_mask(mask)
+
+    def district_of(self, row: int) -> str:
+        code = int(self.district_codes[row])
+        return self.district_ids[code] if code >= 0 else UNKNOWN_DISTRICT
+
+    def query(self, filters: dict) -> tuple:
+        """
+        filters - бітові множини активних фасетів {назва: bits}.
+        Повертає множину результату і кількості фасетів: кожен фасет рахується з усіма
+        іншими фільтрами, крім власного (щоб було видно, скільки дасть інше значення).
+        """
+        def combined(skip: Optional[str] = None) -> np.ndarray:
+            result = self.all.copy()
+            for name, bits in filters.items():
+                if name != skip:
+                    result &= bits
+            return result
+
+        result = combined()
+        base = combined('category')
+        counts = {'category': {c: popcount(base & bits) for c, bits in self.categories.items()}}
+        base = combined('district')
+        counts['district'] = {d: popcount(base & bits) for d, bits in self.districts.items()}
+        base = combined('rating')
+        counts['rating'] = {f"{t:g}+": popcount(base & bits) for t, bits in self.ratings.items()}
+        base = combined('has_phone')
+        counts['has_phone'] = popcount(base & self.has_phone)
+        base = combined('has_website')
+        counts['has_website'] = popcount(base & self.has_website)
+        if 'open' in filters:
+            counts['open'] = popcount(combined('open') & filters['open'])
+        return result, counts
+
+
+FACET_INDEX = None
+
+
+def get_facet_index() -> FacetIndex:
+    """Бітові множини фасетів для поточної версії набору даних"""
+    global FACET_INDEX
+
+    table = get_attraction_table()
+    if FACET_INDEX is None or FACET_INDEX.version != table.version:
+        FACET_INDEX = FacetIndex(table)
+    return FACET_INDEX
+
+
+# ============= TRAVEL-TIME MATRIX SERVICE =============
+
+from abc import ABC, abstractmethod
+
+# Середня швидкість (км/год) та коефіцієнт звивистості доріг (дорожня відстань / пряма) для профілів
+TRAVEL_SPEED_PROFILES = {'car': 45.0, 'bike': 15.0, 'foot': 4.5}
+TRAVEL_CIRCUITY = {'car': 1.35, 'bike': 1.3, 'foot': 1.25}
+TRAVEL_DEFAULT_PROFILE = 'car'
+TRAVEL_TIME_BACKEND = os.environ.get('TRAVEL_TIME_BACKEND', 'auto')  # auto | haversine | road_graph
+ROAD_GRAPH_CACHE_CELLS = 4_000_000  # вершин у закешованих рядках Dijkstra (хвилини й км для кожної)
+# Щільний результат Dijkstra - (джерела × усі вершини графа), тож джерела обробляються порціями
+ROAD_GRAPH_DIJKSTRA_CELLS = 4_000_000
+
+
+class TravelTimeService(ABC):
+    """
+    Інтерфейс матриці часу в дорозі.
+    matrix() повертає пару масивів (хвилини, км) розміром S×D між точками-джерелами та точками-цілями.
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    def matrix(self, src_lat, src_lng, dst_lat, dst_lng, profile: str = TRAVEL_DEFAULT_PROFILE):
+        """Матриці (хвилини, км) S×D"""
+
+    def square(self, lat, lng, profile: str = TRAVEL_DEFAULT_PROFILE):
+        return self.matrix(lat, lng, lat, lng, profile)
+
+    def legs(self, lat, lng, profile: str = TRAVEL_DEFAULT_PROFILE):
+        """Час і відстань послідовних переїздів маршруту lat[i] -> lat[i+1]"""
+        lat = np.asarray(lat, dtype=np.float64)
+        lng = np.asarray(lng, dtype=np.float64)
+        if len(lat) < 2:
+            return np.zeros(0), np.zeros(0)
+        minutes, km = self.matrix(lat[:-1], lng[:-1], lat[1:], lng[1:], profile)
+        return np.diagonal(minutes).copy(), np.diagonal(km).copy()
+
+    def stats(self) -> dict:
+        return {'backend': self.name, 'profiles': TRAVEL_SPEED_PROFILES}
+
+    @staticmethod
+    def check_profile(profile: str):
+        if profile not in TRAVEL_SPEED_PROFILES:
+            raise ValueError(f"Unknown travel profile: {profile}")
+
+
+class HaversineTravelTime(TravelTimeService):
+    """Відстань гаверсинуса × коефіцієнт звивистості, час - за середньою швидкістю профілю"""
+
+    name = 'haversine'
+
+    def matrix(self, src_lat, src_lng, dst_lat, dst_lng, profile: str = TRAVEL_DEFAULT_PROFILE):
+        self.check_profile(profile)
+        src_lat = np.asarray(src_lat, dtype=np.float64)
+        src_lng = np.asarray(src_lng, dtype=np.float64)
+        km = haversine_km(src_lat[:, None], src_lng[:, None],
+                          np.asarray(dst_lat, dtype=np.float64)[None, :],
+                          np.asarray(dst_lng, dtype=np.float64)[None, :]) * TRAVEL_CIRCUITY[profile]
+        return km / TRAVEL_SPEED_PROFILES[profile] * 60, km
+
+
+class RoadGraphTravelTime(TravelTimeService):
+    """
+    Час у дорозі за локальним дорожнім графом (витяг OSM, збережений у .npz):
+    node_lat, node_lng - вершини; edge_u, edge_v, edge_length_km - ребра;
+    необов'язкові edge_speed_kmh (дозволена швидкість) та edge_oneway (лише для авто).
+
+    Точки прив'язуються до найближчої вершини (KD-дерево на одиничній сфері),
+    під'їзд до вершини рахується як у HaversineTravelTime. Для унікальних вершин-джерел
+    Dijkstra (scipy.sparse.csgraph) виконується порціями до ROAD_GRAPH_DIJKSTRA_CELLS клітинок;
+    LRU-кеш зберігає цілі рядки (profile, вершина-джерело) -> хвилини й км до всіх вершин,
+    з яких цілі вибираються зрізом. Відстань у км - довжина того самого найшвидшого шляху
+    (сума ребер уздовж дерева попередників).
+    Граф орієнтований (односторонні вулиці), тож матриця може бути несиметричною.
+    """
+
+    name = 'road_graph'
+
+    def __init__(self, node_lat, node_lng, edge_u, edge_v, edge_length_km,
+                 edge_speed_kmh=None, edge_oneway=None, version: str = 'road-graph'):
+        self.node_lat = np.asarray(node_lat, dtype=np.float64)
+        self.node_lng = np.asarray(node_lng, dtype=np.float64)
+        self.edge_u = np.asarray(edge_u, dtype=np.int64)
+        self.edge_v = np.asarray(edge_v, dtype=np.int64)
+        self.edge_length_km = np.asarray(edge_length_km, dtype=np.float64)
+        self.edge_speed_kmh = None if edge_speed_kmh is None else np.asarray(edge_speed_kmh, dtype=np.float64)
+        self.edge_oneway = (np.zeros(len(self.edge_u), dtype=bool) if edge_oneway is None
+                            else np.asarray(edge_oneway, dtype=bool))
+        self.version = version
+        self.tree = cKDTree(latlng_to_unit_xyz(self.node_lat, self.node_lng))
+        self.cache = LRUCache(maxsize=max(1, ROAD_GRAPH_CACHE_CELLS // max(len(self.node_lat), 1)))
+        self.cache.ensure_version(version)
+        self._graphs = {}
+
+    @classmethod
+    def load(cls, path: Path) -> 'RoadGraphTravelTime':
+        with np.load(path) as data:
+            arrays = {key: data[key] for key in data.files}
+        optional = {key: arrays.get(key) for key in ('edge_speed_kmh', 'edge_oneway')}
+        version = f"{path.name}:{int(path.stat().st_mtime)}"
+        graph = cls(arrays['node_lat'], arrays['node_lng'], arrays['edge_u'], arrays['edge_v'],
+                    arrays['edge_length_km'], version=version, **optional)
+        logger.info(f"[Travel] Loaded road graph: {len(graph.node_lat)} nodes, {len(graph.edge_u)} edges")
+        return graph
+
+    def _graph(self, profile: str):
+        """
+        Орієнтовані графи для профілю (будуються ліниво): час проїзду ребра і довжина
+        того самого ребра (з паралельних ребер обирається найшвидше)
+        """
+        if profile not in self._graphs:
+            from scipy.sparse import csr_matrix
+
+            speed = np.full(len(self.edge_u), TRAVEL_SPEED_PROFILES[profile])
+            if profile == 'car' and self.edge_speed_kmh is not None:
+                speed = np.where(self.edge_speed_kmh > 0, self.edge_speed_kmh, speed)
+            minutes = self.edge_length_km / speed * 60
+
+            two_way = ~self.edge_oneway if profile == 'car' else np.ones(len(self.edge_u), dtype=bool)
+            u = np.concatenate((self.edge_u, self.edge_v[two_way]))
+            v = np.concatenate((self.edge_v, self.edge_u[two_way]))
+            n = len(self.node_lat)
+            # Найшвидше серед паралельних ребер: сортуємо за часом і залишаємо першу пару (u, v)
+            w = np.concatenate((minutes, minutes[two_way]))
+            length = np.concatenate((self.edge_length_km, self.edge_length_km[two_way]))
+            order = np.lexsort((w, v, u))
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = (u[order][1:] != u[order][:-1]) | (v[order][1:] != v[order][:-1])
+            keep = order[first]
+            # Нульова вага в csr_matrix означає відсутність ребра
+            self._graphs[profile] = tuple(
+                csr_matrix((np.maximum(weight[keep], 1e-9), (u[keep], v[keep])), shape=(n, n))
+                for weight in (w, length)
+            )
+        return self._graphs[profile]
+
+    def snap(self, lat, lng):
+        """Найближча вершина графа та відстань до неї (км)"""
+        chord, nodes = self.tree.query(latlng_to_unit_xyz(lat, lng))
+        return np.atleast_1d(nodes), np.atleast_1d(chord_to_km(chord))
+
+    def matrix(self, src_lat, src_lng, dst_lat, dst_lng, profile: str = TRAVEL_DEFAULT_PROFILE):
+        from scipy.sparse.csgraph import dijkstra
+
+        self.check_profile(profile)
+        src_nodes, src_snap = self.snap(src_lat, src_lng)
+        dst_nodes, dst_snap = self.snap(dst_lat, dst_lng)
+        sources, src_inverse = np.unique(src_nodes, return_inverse=True)
+        targets, dst_inverse = np.unique(dst_nodes, return_inverse=True)
+
+        node_minutes = np.empty((len(sources), len(targets)))
+        node_km = np.empty((len(sources), len(targets)))
+        missing = []
+        for i, u in enumerate(sources.tolist()):
+            cached = self.cache.get((profile, u))
+            if cached is None:
+                missing.append(i)
+            else:
+                node_minutes[i], node_km[i] = cached[0][targets], cached[1][targets]
+
+        if missing:
+            time_graph, length_graph = self._graph(profile)
+            missing = np.asarray(missing, dtype=np.int64)
+            chunk = max(1, ROAD_GRAPH_DIJKSTRA_CELLS // len(self.node_lat))
+            for start in range(0, len(missing), chunk):
+                part = missing[start:start + chunk]
+                distances, predecessors = dijkstra(time_graph, directed=True, indices=sources[part],
+                                                   return_predecessors=True)
+                km = self._tree_km(length_graph, predecessors, sources[part])
+                node_minutes[part], node_km[part] = distances[:, targets], km[:, targets]
+                for i, row_minutes, row_km in zip(sources[part].tolist(), distances, km):
+                    self.cache.set((profile, i), (row_minutes.copy(), row_km.copy()))
+
+        minutes = node_minutes[src_inverse][:, dst_inverse]
+        km = node_km[src_inverse][:, dst_inverse]
+
+        # Під'їзд до графа та від нього
+        access_km = (src_snap[:, None] + dst_snap[None, :]) * TRAVEL_CIRCUITY[profile]
+        minutes = minutes + access_km / TRAVEL_SPEED_PROFILES[profile] * 60
+        km = km + access_km
+
+        # Недосяжні пари (інша компонента зв'язності) - оцінка за прямою
+        unreachable = ~np.isfinite(minutes)
+        if unreachable.any():
+            fallback_minutes, fallback_km = HaversineTravelTime().matrix(src_lat, src_lng, dst_lat, dst_lng, profile)
+            minutes[unreachable] = fallback_minutes[unreachable]
+            km[unreachable] = fallback_km[unreachable]
+        return minutes, km
+
+    @staticmethod
+    def _tree_km(length_graph, predecessors: np.ndarray, sources: np.ndarray) -> np.ndarray:
+        """
+        Довжина найшвидших шляхів від кожного джерела до всіх вершин за деревом попередників.
+        Подвоєння вказівників: km[v] += km[jump[v]], jump[v] = jump[jump[v]] - O(log глибини)
+        векторизованих кроків; корінь (джерело) і недосяжні вершини вказують самі на себе.
+        """
+        n = predecessors.shape[1]
+        nodes = np.broadcast_to(np.arange(n), predecessors.shape)
+        has_parent = predecessors >= 0
+        jump = np.where(has_parent, predecessors, nodes)
+
+        # Довжина ребра предок -> вершина: пошук ключа u * n + v у впорядкованих ключах CSR
+        edge_keys = np.repeat(np.arange(n, dtype=np.int64), np.diff(length_graph.indptr)) * n + length_graph.indices
+        edge_order = np.argsort(edge_keys, kind='stable')
+        keys = jump[has_parent].astype(np.int64) * n + nodes[has_parent]
+        km = np.zeros(predecessors.shape)
+        km[has_parent] = length_graph.data[edge_order[np.searchsorted(edge_keys, keys, sorter=edge_order)]]
+
+        while True:
+            next_jump = np.take_along_axis(jump, jump, axis=1)
+            if np.array_equal(next_jump, jump):
+                break
+            km += np.take_along_axis(km, jump, axis=1)
+            jump = next_jump
+        km[jump != sources[:, None]] = np.inf
+        return km
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            'nodes': len(self.node_lat),
+            'edges': len(self.edge_u),
+            'cache': self.cache.stats()
+        }
+
+
+TRAVEL_TIME_SERVICE = None
+
+
+def get_travel_time_service() -> TravelTimeService:
+    """Дорожній граф, якщо файл доступний (або явно обраний), інакше - гаверсинус"""
+    global TRAVEL_TIME_SERVICE
+
+    if TRAVEL_TIME_SERVICE is None:
+        service = HaversineTravelTime()
+        if TRAVEL_TIME_BACKEND != 'haversine':
+            if ROAD_GRAPH_FILE.exists():
+                try:
+                    service = RoadGraphTravelTime.load(ROAD_GRAPH_FILE)
+                except Exception as e:
+                    logger.error(f"[Travel] Failed to load road graph: {str(e)}")
+            elif TRAVEL_TIME_BACKEND == 'road_graph':
+                logger.warning(f"[Travel] Road graph file not found: {ROAD_GRAPH_FILE}, using haversine")
+        TRAVEL_TIME_SERVICE = service
+    return TRAVEL_TIME_SERVICE
+
+
+# ============= TRIP ROUTE OPTIMIZER =============
+
+TRIP_STOP_MINUTES = 30
+TRIP_OPTIMIZE_TIME_BUDGET_MS = 100
+TRIP_AUTO_OPTIMIZE = os.environ.get('TRIP_AUTO_OPTIMIZE', 'false').lower() in ('1', 'true', 'yes')
+
+
+class RouteOptimizer:
+    """
+    Оптимізація порядку відвідування точок маршруту (відкритий шлях, без повернення).
+
+    Матриця вартостей переїздів (хвилини з TravelTimeService) доповнюється фіктивною вершиною з нульовими відстанями,
+    яка фіксує кінці шляху: [старт, ..., фіктивна] або [фіктивна, ..., фіктивна],
+    якщо початкова точка не закріплена. Початковий маршрут будується методом
+    найближчого сусіда, далі покращується ходами 2-opt та Or-opt (переміщення
+    сегментів довжиною 1-3). Вигода всіх ходів одного типу обчислюється однією
+    матричною операцією NumPy; застосовується найкращий хід, доки є покращення
+    або не вичерпано бюджет часу.
+
+    Матриця може бути несиметричною (односторонній рух), тож для розвернутих сегментів
+    враховується зміна вартості внутрішніх ребер (префіксні суми D[b, a] - D[a, b]).
+    """
+
+    OR_OPT_SEGMENTS = (1, 2, 3)
+    EPS = 1e-9
+
+    def __init__(self, costs: np.ndarray):
+        n = len(costs)
+        self.n = n
+        self.dummy = n
+        self.D = np.zeros((n + 1, n + 1))
+        self.D[:n, :n] = costs
+
+    def nearest_neighbor(self, start: Optional[int]) -> list:
+        D = self.D[:self.n, :self.n]
+        if start is None:
+            # Вільний початок: стартуємо з найвіддаленішої (периферійної) точки
+            start = int(np.argmax(D.sum(axis=1)))
+        visited = np.zeros(self.n, dtype=bool)
+        route = [start]
+        visited[start] = True
+        for _ in range(self.n - 1):
+            row = np.where(visited, np.inf, D[route[-1]])
+            nxt = int(np.argmin(row))
+            route.append(nxt)
+            visited[nxt] = True
+        return route
+
+    def path_length(self, path) -> float:
+        path = np.asarray(path)
+        return float(self.D[path[:-1], path[1:]].sum())
+
+    def reversal_prefix(self, path: np.ndarray) -> np.ndarray:
+        """R[t] - зміна вартості ребер path[0..t] при їх проходженні у зворотному напрямку"""
+        a, b = path[:-1], path[1:]
+        return np.concatenate(([0.0], np.cumsum(self.D[b, a] - self.D[a, b])))
+
+    def best_two_opt(self, path: np.ndarray):
+        """Найкращий хід 2-opt: розворот сегмента path[k+1..l]"""
+        a, b = path[:-1], path[1:]
+        edge = self.D[a, b]
+        delta = self.D[a[:, None], a[None, :]] + self.D[b[:, None], b[None, :]] - edge[:, None] - edge[None, :]
+        # Внутрішні ребра сегмента (k+1 .. l-1) проходяться у зворотному напрямку
+        reversal = self.reversal_prefix(path)
+        delta += reversal[None, :-1] - reversal[1:, None]
+        delta[np.tril_indices(len(a), 1)] = np.inf
+        k, l = np.unravel_index(int(np.argmin(delta)), delta.shape)
+        return float(delta[k, l]), int(k), int(l)
+
+    def best_or_opt(self, path: np.ndarray, length: int):
+        """Найкраще переміщення сегмента path[i..i+length-1] (прямо або у зворотному порядку)"""
+        m = len(path)
+        starts = np.arange(1, m - length)
+        if len(starts) == 0:
+            return np.inf, 0, 0, False
+        seg_s, seg_e = path[starts], path[starts + length - 1]
+        prev, nxt = path[starts - 1], path[starts + length]
+        gain = self.D[prev, seg_s] + self.D[seg_e, nxt] - self.D[prev, nxt]
+
+        a, b = path[:-1], path[1:]
+        edge = self.D[a, b]
+        forward = self.D[a[None, :], seg_s[:, None]] + self.D[seg_e[:, None], b[None, :]] - edge[None, :]
+        reverse = self.D[a[None, :], seg_e[:, None]] + self.D[seg_s[:, None], b[None, :]] - edge[None, :]
+        reversal = self.reversal_prefix(path)
+        reverse += (reversal[starts + length - 1] - reversal[starts])[:, None]
+        cost = np.minimum(forward, reverse) - gain[:, None]
+        # Ребра, що торкаються сегмента, недопустимі для вставки
+        k = np.arange(len(a))[None, :]
+        cost[(k >= starts[:, None] - 1) & (k <= starts[:, None] + length - 1)] = np.inf
+
+        row, col = np.unravel_index(int(np.argmin(cost)), cost.shape)
+        reversed_segment = bool(reverse[row, col] < forward[row, col])
+        return float(cost[row, col]), int(starts[row]), int(col), reversed_segment
+
+    @staticmethod
+    def apply_or_opt(path: np.ndarray, start: int, length: int, edge: int, reversed_segment: bool) -> np.ndarray:
+        segment = path[start:start + length]
+        if reversed_segment:
+            segment = segment[::-1]
+        rest = np.concatenate((path[:start], path[start + length:]))
+        # Індекс ребра зсувається, якщо воно стояло після вилученого сегмента
+        insert_at = edge + 1 if edge < start else edge + 1 - length
+        return np.concatenate((rest[:insert_at], segment, rest[insert_at:]))
+
+    def optimize(self, start: Optional[int] = 0, time_budget_ms: float = TRIP_OPTIMIZE_TIME_BUDGET_MS) -> dict:
+        started = time.perf_counter()
+        deadline = started + time_budget_ms / 1000
+        if self.n <= 1:
+            return {'order': list(range(self.n)), 'cost': 0.0, 'initial_cost': 0.0,
+                    'iterations': 0, 'converged': True, 'elapsed_ms': 0.0}
+
+        route = self.nearest_neighbor(start)
+        head = [] if start is not None else [self.dummy]
+        path = np.array(head + route + [self.dummy])
+        initial = self.path_length(path)
+
+        iterations = 0
+        converged = False
+        while time.perf_counter() < deadline:
+            delta, k, l = self.best_two_opt(path)
+            if delta < -self.EPS:
+                path[k + 1:l + 1] = path[k + 1:l + 1][::-1].copy()
+                iterations += 1
+                continue
+            best = min((self.best_or_opt(path, length) + (length,) for length in self.OR_OPT_SEGMENTS),
+                       key=lambda move: move[0])
+            if best[0] < -self.EPS:
+                cost, seg_start, edge, reversed_segment, length = best
+                path = self.apply_or_opt(path, seg_start, length, edge, reversed_segment)
+                iterations += 1
+                continue
+            converged = True
+            break
+
+        order = [int(v) for v in path if v != self.dummy]
+        return {
+            'order': order,
+            'cost': round(self.path_length(path), 3),
+            'initial_cost': round(initial, 3),
+            'iterations': iterations,
+            'converged': converged,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+
+
+def format_duration(minutes: float) -> str:
+    """Тривалість у форматі «2 год 15 хв»"""
+    minutes = int(round(minutes))
+    hours, mins = divmod(minutes, 60)
+    if hours and mins:
+        return f"{hours} год {mins} хв"
+    return f"{hours} год" if hours else f"{mins} хв"
+
+
+def trip_place_coordinates(places: list):
+    """Координати місць подорожі; місця без координат позначаються маскою"""
+    lat = np.full(len(places), np.nan)
+    lng = np.full(len(places), np.nan)
+    for i, place in enumerate(places):
+        coords = place.get('coordinates') or {}
+        if coords.get('lat') is not None and coords.get('lng') is not None:
+            lat[i], lng[i] = coords['lat'], coords['lng']
+    return lat, lng, ~(np.isnan(lat) | np.isnan(lng))
+
+
+def route_metrics(segments: list, stops: int, profile: str = TRAVEL_DEFAULT_PROFILE) -> dict:
+    """
+    Довжина маршруту в заданому порядку та орієнтовний час (переїзди + огляд).
+    segments - список (lat, lng) окремих днів: переїзд між днями не враховується.
+    """
+    service = get_travel_time_service()
+    total_minutes, total_km = stops * TRIP_STOP_MINUTES, 0.0
+    for lat, lng in segments:
+        minutes, km = service.legs(lat, lng, profile)
+        total_minutes += float(minutes.sum())
+        total_km += float(km.sum())
+    return {'total_distance': round(total_km, 2), 'estimated_time': format_duration(total_minutes)}
+
+
+def plan_trip_route(places: list, optimize: bool = False, keep_start: bool = True,
+                    time_budget_ms: float = TRIP_OPTIMIZE_TIME_BUDGET_MS,
+                    profile: str = TRAVEL_DEFAULT_PROFILE, start: Optional[dict] = None) -> dict:
+    """
+    Впорядкування місць подорожі та розрахунок total_distance / estimated_time.
+    Без optimize місця йдуть у порядку поля order; місця без координат завжди в кінці.
+    Місця з полем day групуються за днями: кожен день оптимізується окремо
+    і починається з start (якщо задано) або з першого місця дня; переїзди між днями не рахуються.
+    """
+    places = sorted(places, key=lambda p: (p.get('day') or 0, p.get('order', 0)))
+    lat, lng, valid = trip_place_coordinates(places)
+    days = np.array([p.get('day') or 0 for p in places], dtype=np.int64)
+    day_values = np.unique(days)
+    has_start = bool(start) and start.get('lat') is not None and start.get('lng') is not None
+    origin = ([start['lat']], [start['lng']]) if has_start else ([], [])
+    stats = []
+    order, segments = [], []
+
+    for day in day_values.tolist():
+        located = np.flatnonzero(valid & (days == day))
+        day_lat = np.concatenate((origin[0], lat[located]))
+        day_lng = np.concatenate((origin[1], lng[located]))
+        if optimize and len(day_lat) > 2:
+            minutes, _ = get_travel_time_service().square(day_lat, day_lng, profile)
+            day_stats = RouteOptimizer(minutes).optimize(start=0 if keep_start or has_start else None,
+                                                         time_budget_ms=time_budget_ms / len(day_values))
+            path = np.asarray(day_stats['order'], dtype=np.int64)
+            located = located[path[path > 0] - 1] if has_start else located[path]
+            stats.append(day_stats)
+        order.extend(located.tolist())
+        segments.append((np.concatenate((origin[0], lat[located])), np.concatenate((origin[1], lng[located]))))
+
+    order.extend(np.flatnonzero(~valid).tolist())
+    ordered = []
+    for position, i in enumerate(order):
+        ordered.append({**places[i], 'order': position})
+
+    result = {'places': ordered, **route_metrics(segments, len(places), profile)}
+    if stats:
+        result['optimization'] = {
+            'cost': round(sum(s['cost'] for s in stats), 3),
+            'initial_cost': round(sum(s['initial_cost'] for s in stats), 3),
+            'iterations': sum(s['iterations'] for s in stats),
+            'converged': all(s['converged'] for s in stats),
+            'elapsed_ms': round(sum(s['elapsed_ms'] for s in stats), 2),
+            'days': len(stats)
+        }
+    return result
+
+
+# ============= MULTI-DAY ITINERARY GENERATOR =============
+
+TRIP_DISTANCE_DECAY_KM = 25.0
+TRIP_DEFAULT_CATEGORY_WEIGHT = 0.1
+TRIP_CANDIDATE_FACTOR = 2
+
+
+def score_trip_candidates(table: AttractionTable, start_lat: float, start_lng: float, preferences: dict,
+                          daily_minutes: float, exclude_ids=None, profile: str = TRAVEL_DEFAULT_PROFILE):
+    """
+    Векторизований відбір кандидатів для маршруту.
+    Оцінка = вага категорії × нормалізований рейтинг × спад за відстанню від старту;
+    відкидаються об'єкти, до яких не можна доїхати й повернутися за один день.
+    """
+    weights = np.full(len(table.categories), TRIP_DEFAULT_CATEGORY_WEIGHT)
+    for category, weight in (preferences or {}).items():
+        code = table.category_index.get(category)
+        if code is not None:
+            weights[code] = float(weight)
+
+    distance = haversine_km(start_lat, start_lng, table.lat, table.lng)
+    travel_minutes, _ = get_travel_time_service().matrix([start_lat], [start_lng], table.lat, table.lng, profile)
+    round_trip_minutes = 2 * travel_minutes[0] + TRIP_STOP_MINUTES
+    mask = table.has_coords & (weights[table.category_codes] > 0) & (round_trip_minutes <= daily_minutes)
+    if exclude_ids:
+        excluded = [table.row_by_id[i] for i in map(str, exclude_ids) if i in table.row_by_id]
+        mask[excluded] = False
+
+    rating_norm = 0.5 + 0.5 * (table.rating.astype(np.float64) - 1) / 4
+    score = weights[table.category_codes] * rating_norm / (1 + distance / TRIP_DISTANCE_DECAY_KM)
+    return np.where(mask, score, -np.inf), distance
+
+
+def select_day_stops(minutes: np.ndarray, daily_minutes: float) -> list:
+    """
+    Жадібний відбір зупинок дня за матрицею часу [старт, кандидати...]
+    (кандидати вже впорядковані за оцінкою): кожна зупинка вставляється
+    в найдешевшу позицію маршруту від старту, поки переїзди та огляд
+    вкладаються в денний бюджет часу. Повертає індекси кандидатів (від 0).
+    """
+    path = [0]
+    travel = 0.0
+    for node in range(1, len(minutes)):
+        to_path = minutes[path, node]
+        from_path = minutes[node, path]
+        # Вставка між сусідніми точками або в кінець шляху
+        edges = minutes[path[:-1], path[1:]]
+        costs = np.append(to_path[:-1] + from_path[1:] - edges, to_path[-1])
+        position = int(np.argmin(costs))
+        if travel + costs[position] + len(path) * TRIP_STOP_MINUTES > daily_minutes:
+            continue
+        path.insert(position + 1, node)
+        travel += float(costs[position])
+    return [node - 1 for node in path[1:]]
+
+
+def generate_itinerary(start_lat: float, start_lng: float, days: int, preferences: dict,
+                       daily_minutes: float, exclude_ids=None, profile: str = TRAVEL_DEFAULT_PROFILE,
+                       start_date: Optional[datetime] = None) -> dict:
+    """
+    Генерація багатоденного маршруту:
+    1) векторизований відбір і оцінка кандидатів;
+    2) K-Means (k = кількість днів) на метричних координатах кандидатів - географічні групи днів;
+    3) жадібне наповнення кожного дня в межах бюджету часу;
+    4) впорядкування зупинок дня оптимізатором маршруту (старт закріплено).
+    З start_date кожен день відкидає об'єкти, які за розкладом не відкриті
+    щонайменше TRIP_STOP_MINUTES у межах денного вікна (невідомі години не відкидаються).
+    Група без доступних зупинок не займає день: наступна група планується на той самий
+    календарний день, тож номери днів ідуть без пропусків; planned_days - фактична кількість днів.
+    """
+    from sklearn.cluster import KMeans
+
+    table = get_attraction_table()
+    score, _ = score_trip_candidates(table, start_lat, start_lng, preferences, daily_minutes, exclude_ids, profile)
+    eligible = int(np.isfinite(score).sum())
+    per_day = max(1, int(daily_minutes // TRIP_STOP_MINUTES))
+    pool_size = min(eligible, days * per_day * TRIP_CANDIDATE_FACTOR)
+    if pool_size == 0:
+        return {'days': [], 'places': [], 'total_distance': 0.0, 'minutes': 0.0, 'planned_days': 0}
+
+    pool = np.argpartition(-score, pool_size - 1)[:pool_size]
+    pool = pool[np.argsort(-score[pool], kind='stable')]
+    n_days = min(days, pool_size)
+
+    labels = np.zeros(pool_size, dtype=int)
+    if n_days > 1:
+        kmeans = KMeans(n_clusters=n_days, init='k-means++', n_init=3, random_state=42)
+        labels = kmeans.fit_predict(project_to_metric(table.lat[pool], table.lng[pool]))
+
+    # Ближчі до старту групи - на перші дні
+    centroid_distance = [
+        float(haversine_km(start_lat, start_lng, table.lat[pool[labels == label]].mean(),
+                           table.lng[pool[labels == label]].mean()))
+        for label in range(n_days)
+    ]
+
+    service = get_travel_time_service()
+    day_plans, places = [], []
+    for label in np.argsort(centroid_distance):
+        day = len(day_plans) + 1
+        members = pool[labels == label]
+        if start_date is not None:
+            hours = get_opening_hours_index()
+            day_start = start_date + timedelta(days=day - 1)
+            day_end = day_start + timedelta(minutes=daily_minutes)
+            available = hours.open_for_mask(day_start, day_end, TRIP_STOP_MINUTES) | ~hours.known
+            members = members[available[members]]
+        lat = np.concatenate(([start_lat], table.lat[members]))
+        lng = np.concatenate(([start_lng], table.lng[members]))
+        travel_minutes, travel_km = service.square(lat, lng, profile)
+
+        selected = np.asarray(select_day_stops(travel_minutes, daily_minutes), dtype=int) + 1
+        if len(selected) == 0:
+            continue
+        nodes = np.concatenate(([0], selected))
+        order = nodes[RouteOptimizer(travel_minutes[np.ix_(nodes, nodes)]).optimize(start=0)['order']]
+        rows = members[order[1:] - 1]
+        distance = float(travel_km[order[:-1], order[1:]].sum())
+        minutes = float(travel_minutes[order[:-1], order[1:]].sum()) + len(rows) * TRIP_STOP_MINUTES
+
+        for row in rows.tolist():
+            record = table.records[row]
+            places.append({
+                'place_id': table.ids[row],
+                'name': record.get('name', ''),
+                'address': record.get('address'),
+                'coordinates': {'lat': float(table.lat[row]), 'lng': float(table.lng[row])},
+                'category': record.get('category'),
+                'order': len(places),
+                'day': day
+            })
+        day_plans.append({'day': day, 'stops': len(rows), 'distance_km': round(distance, 2), 'minutes': minutes})
+
+    return {
+        'days': day_plans,
+        'places': places,
+        'total_distance': round(sum(d['distance_km'] for d in day_plans), 2),
+        'minutes': sum(d['minutes'] for d in day_plans),
+        'planned_days': len(day_plans)
+    }
+
+
+# Admin auth helper
+async def verify_admin(authorization: str = Header(None)):
+    if not authorization or authorization != f"Bearer {ADMIN_PASSWORD}":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return True
+
+
+# Add your routes to the router instead of directly to app
+@api_router.get("/")
+async def root():
+    return {"message": "Hello World"}
+
+@api_router.post("/status", response_model=StatusCheck)
+async def create_status_check(input: StatusCheckCreate):
+    status_dict = input.model_dump()
+    status_obj = StatusCheck(**status_dict)
+    
+    # Convert to dict and serialize datetime to ISO string for MongoDB
+    doc = status_obj.model_dump()
+    doc['timestamp'] = doc['timestamp'].isoformat()
+    
+    _ = await db.status_checks.insert_one(doc)
+    return status_obj
+
+@api_router.get("/status", response_model=List[StatusCheck])
+async def get_status_checks():
+    # Exclude MongoDB's _id field from the query results
+    status_checks = await db.status_checks.find({}, {"_id": 0}).to_list(1000)
+    
+    # Convert ISO string timestamps back to datetime objects
+    for check in status_checks:
+        if isinstance(check['timestamp'], str):
+            check['timestamp'] = datetime.fromisoformat(check['timestamp'])
+    
+    return status_checks
+
+
+# Contact Form Endpoints
+async def send_telegram_notification(name: str, email: str, phone: str, message: str):
+    """Send Telegram notification for new contact form submission"""
+    try:
+        if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
+            logger.warning("Telegram not configured, skipping notification")
+            return
+        
+        # Format message for Telegram
+        telegram_message = f"""📩 <b>Нове повідомлення з сайту!</b>
+
+👤 <b>Ім'я:</b> {name}
+📧 <b>Email:</b> {email}
+📱 <b>Телефон:</b> {phone or 'Не вказано'}
+
+💬 <b>Повідомлення:</b>
+{message}
+
+🕐 {datetime.now().strftime('%d.%m.%Y о %H:%M')}
+"""
+        
+        url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+        
+        async with httpx.AsyncClient() as client:
+            response = await client.post(url, json={
+                "chat_id": TELEGRAM_CHAT_ID,
+                "text": telegram_message,
+                "parse_mode": "HTML"
+            })
+            
+            if response.status_code == 200:
+                logger.info("Telegram notification sent successfully")
+            else:
+                logger.error(f"Telegram error: {response.text}")
+                
+    except Exception as e:
+        logger.error(f"Failed to send Telegram notification: {str(e)}")
+
+
+@api_router.post("/contact", response_model=ContactForm)
+async def create_contact_message(input: ContactFormCreate, background_tasks: BackgroundTasks):
+    """Submit a contact form message"""
+    contact_dict = input.model_dump()
+    contact_obj = ContactForm(**contact_dict)
+    
+    doc = contact_obj.model_dump()
+    doc['created_at'] = doc['created_at'].isoformat()
+    
+    await db.contact_messages.insert_one(doc)
+    logger.info(f"New contact message from {input.email}")
+    
+    # Send Telegram notification
+    await send_telegram_notification(
+        input.name,
+        input.email,
+        input.phone or "",
+        input.message
+    )
+    
+    return contact_obj
+
+
+@api_router.get("/contact", response_model=List[ContactForm])
+async def get_contact_messages():
+    """Get all contact messages (for admin)"""
+    messages = await db.contact_messages.find({}, {"_id": 0}).to_list(1000)
+    
+    for msg in messages:
+        if isinstance(msg.get('created_at'), str):
+            msg['created_at'] = datetime.fromisoformat(msg['created_at'])
+    
+    return messages
+
+
+# Reviews Endpoints
+@api_router.post("/reviews", response_model=Review)
+async def create_review(input: ReviewCreate):
+    """Submit a new review"""
+    review_dict = input.model_dump()
+    review_obj = Review(**review_dict)
+    
+    doc = review_obj.model_dump()
+    doc['created_at'] = doc['created_at'].isoformat()
+    
+    await db.reviews.insert_one(doc)
+    logger.info(f"New review from {input.author_name}")
+    
+    return review_obj
+
+
+@api_router.get("/reviews", response_model=List[Review])
+async def get_reviews(approved_only: bool = True):
+    """Get reviews (optionally only approved ones)"""
+    query = {"is_approved": True} if approved_only else {}
+    reviews = await db.reviews.find(query, {"_id": 0}).to_list(100)
+    
+    for review in reviews:
+        if isinstance(review.get('created_at'), str):
+            review['created_at'] = datetime.fromisoformat(review['created_at'])
+    
+    return reviews
+
+
+# AI Chat Endpoints
+def get_system_prompt():
+    """Generate system prompt with all attractions context"""
+    # Group all attractions by category
+    categories = {
+        'historical': [],
+        'parks': [],
+        'shopping': [],
+        'culture': [],
+        'nature': [],
+        'gastro': [],
+        'hotels': []
+    }
+    
+    table = get_attraction_table()
+    localities = get_attraction_localities()
+    
+    for attr in ATTRACTIONS_DATA:
+        cat = attr.get('category', 'other')
+        if cat in categories:
+            row = table.row_by_id.get(str(attr.get('id')))
+            categories[cat].append({
+                'name': attr.get('name'),
+                'address': attr.get('address'),
+                'locality': localities[row] if row is not None else None,
+                'workingHours': attr.get('workingHours'),
+                'phone': attr.get('phone'),
+                'website': attr.get('website')
+            })
+    
+    # Create summary with counts and examples
+    summary_parts = []
+    for cat, items in categories.items():
+        cat_names = {
+            'historical': "Історичні пам'ятки",
+            'parks': 'Парки та сквери',
+            'shopping': 'Торгівельні центри',
+            'culture': 'Культурні заклади',
+            'nature': "Природні об'єкти",
+            'gastro': 'Гастрономія',
+            'hotels': 'Готелі'
+        }
+        summary_parts.append(f"\n### {cat_names.get(cat, cat)} ({len(items)} об'єктів):")
+        # Include all items with names
+        for item in items[:50]:  # Top 50 per category
+            info = f"- {item['name']}"
+            if item.get('address') and item['address'] != 'Житомирська область':
+                info += f" ({item['address']})"
+            elif item.get('locality'):
+                # Загальна адреса - додаємо найближчий населений пункт з довідника
+                locality = item['locality']
+                place = locality['settlement']
+                if locality.get('hromada'):
+                    place += f", {locality['hromada']} громада"
+                info += f" (поблизу: {place})"
+            if item.get('workingHours'):
+                info += f" - {item['workingHours']}"
+            summary_parts.append(info)
+    
+    attractions_context = '\n'.join(summary_parts)
+    
+    total_count = len(ATTRACTIONS_DATA)
+    
+    return f"""Ти - дружній помічник туристичного сайту Житомирської громади. Твоя задача - допомагати туристам знаходити цікаві місця для відвідування.
+
+Ти маєш повний доступ до бази даних з {total_count} туристичних об'єктів Житомирщини.
+
+{attractions_context}
+
+Інструкції:
+1. Відповідай українською мовою
+2. Будь дружнім та привітним
+3. Рекомендуй конкретні місця з бази даних з адресами та годинами роботи
+4. Якщо турист не знає що хоче - запитай про його інтереси (історія, природа, їжа, шопінг тощо)
+5. Давай практичну інформацію: адреси, години роботи, телефони якщо є
+6. Якщо питання не стосується туризму - ввічливо поверни розмову до туристичної тематики
+7. Відповідай стисло але інформативно (2-4 рекомендації за раз)
+8. Можеш пропонувати маршрути та комбінації місць для відвідування
+9. НЕ використовуй символи ** для виділення тексту - пиши простим текстом без markdown форматування
+10. Використовуй емодзі для візуального оформлення списків замість **"""
+
+
+# Store chat instances per session
+chat_sessions = {}
+
+@api_router.post("/chat", response_model=ChatResponse)
+async def chat_with_assistant(request: ChatRequest):
+    """Chat with AI assistant about tourist places"""
+    try:
+        if not EMERGENT_LLM_KEY:
+            raise HTTPException(status_code=500, detail="AI not configured")
+        
+        # Generate or use existing session ID
+        session_id = request.session_id or str(uuid.uuid4())
+        
+        # Get or create chat instance for this session
+        if session_id not in chat_sessions:
+            chat = LlmChat(
+                api_key=EMERGENT_LLM_KEY,
+                session_id=session_id,
+                system_message=get_system_prompt()
             ).with_model("anthropic", "claude-4-sonnet-20250514")
             chat_sessions[session_id] = chat
         else:
@@ -1030,8 +4458,12 @@ async def chat_with_assistant(request: ChatRequest):
         }
         await db.chat_history.insert_one(user_msg)
         
-        # Send message to AI
-        user_message = UserMessage(text=request.message)
+        # Send message to AI with the most relevant attractions from the TF-IDF index
+        context = retrieve_attractions_context(request.message)
+        prompt = request.message
+        if context:
+            prompt = f"{request.message}\n\n[Довідка з бази об'єктів, релевантних до запиту:\n{context}]"
+        user_message = UserMessage(text=prompt)
         response = await chat.send_message(user_message)
         
         # Store assistant response in DB
@@ -1064,10 +4496,22 @@ async def get_chat_history(session_id: str):
 
 # ============= TRIP PLANNER ENDPOINTS =============
 
+def build_trip_data(trip: TripPlanCreate) -> dict:
+    """Дані подорожі з упорядкованими місцями та розрахованими total_distance / estimated_time"""
+    data = trip.model_dump()
+    optimize = data.pop('optimize')
+    route = plan_trip_route(data['places'], optimize=TRIP_AUTO_OPTIMIZE if optimize is None else optimize,
+                            start=data.get('start'))
+    data['places'] = route['places']
+    data['total_distance'] = route['total_distance']
+    data['estimated_time'] = route['estimated_time']
+    return data
+
+
 @api_router.post("/trips", response_model=TripPlan)
 async def create_trip(trip: TripPlanCreate):
     """Create a new trip plan"""
-    trip_obj = TripPlan(**trip.model_dump())
+    trip_obj = TripPlan(**build_trip_data(trip))
     doc = trip_obj.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     doc['updated_at'] = doc['updated_at'].isoformat()
@@ -1077,6 +4521,48 @@ async def create_trip(trip: TripPlanCreate):
     return trip_obj
 
 
+@api_router.post("/trips/generate", response_model=TripPlan)
+async def generate_trip(request: TripGenerateRequest):
+    """
+    Генерація багатоденного маршруту від стартової точки
+
+    - days: кількість днів (1-14)
+    - preferences: ваги категорій (невказані категорії мають вагу 0.1, вага 0 - виключити)
+    - daily_hours: час на день (переїзди + огляд), 1-16 год
+    """
+    start_lat, start_lng = request.start.get('lat'), request.start.get('lng')
+    if start_lat is None or start_lng is None:
+        raise HTTPException(status_code=400, detail="start must contain lat and lng")
+    if not 1 <= request.days <= 14:
+        raise HTTPException(status_code=400, detail="days must be between 1 and 14")
+    if not 1 <= request.daily_hours <= 16:
+        raise HTTPException(status_code=400, detail="daily_hours must be between 1 and 16")
+    if request.profile not in TRAVEL_SPEED_PROFILES:
+        raise HTTPException(status_code=400, detail=f"profile must be one of {list(TRAVEL_SPEED_PROFILES)}")
+
+    itinerary = generate_itinerary(start_lat, start_lng, request.days, request.preferences,
+                                   request.daily_hours * 60, request.visited_ids, request.profile,
+                                   request.start_date)
+    if not itinerary['places']:
+        raise HTTPException(status_code=404, detail="No attractions match the given preferences")
+
+    summary = "; ".join(
+        f"День {d['day']}: {d['stops']} місць, {d['distance_km']} км, {format_duration(d['minutes'])}"
+        for d in itinerary['days']
+    )
+    planned_days = itinerary['planned_days']
+    if planned_days < request.days:
+        summary = f"Заплановано {planned_days} з {request.days} дн. (бракує доступних місць); {summary}"
+    return TripPlan(
+        name=request.name or f"Маршрут на {planned_days} дн.",
+        description=summary,
+        places=itinerary['places'],
+        start={'lat': start_lat, 'lng': start_lng},
+        total_distance=itinerary['total_distance'],
+        estimated_time=format_duration(itinerary['minutes'])
+    )
+
+
 @api_router.get("/trips", response_model=List[TripPlan])
 async def get_trips():
     """Get all trip plans"""
@@ -1100,7 +4586,7 @@ async def update_trip(trip_id: str, trip: TripPlanCreate):
     if not existing:
         raise HTTPException(status_code=404, detail="Trip not found")
     
-    update_data = trip.model_dump()
+    update_data = build_trip_data(trip)
     update_data['updated_at'] = datetime.now(timezone.utc).isoformat()
     
     await db.trips.update_one({"id": trip_id}, {"$set": update_data})
@@ -1109,6 +4595,39 @@ async def update_trip(trip_id: str, trip: TripPlanCreate):
     return updated
 
 
+@api_router.post("/trips/{trip_id}/optimize", response_model=TripPlan)
+async def optimize_trip(trip_id: str, keep_start: bool = True, time_budget_ms: int = TRIP_OPTIMIZE_TIME_BUDGET_MS,
+                        profile: str = TRAVEL_DEFAULT_PROFILE):
+    """
+    Оптимізація порядку відвідування місць подорожі (найближчий сусід + 2-opt/Or-opt)
+
+    - keep_start: залишити перше місце стартовою точкою (маршрут зі start щодня починається зі start)
+    - time_budget_ms: бюджет часу на покращення маршруту (1-5000 мс)
+    - profile: профіль пересування (car, bike, foot)
+    """
+    existing = await db.trips.find_one({"id": trip_id}, {"_id": 0})
+    if not existing:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    if not 1 <= time_budget_ms <= 5000:
+        raise HTTPException(status_code=400, detail="time_budget_ms must be between 1 and 5000")
+    if profile not in TRAVEL_SPEED_PROFILES:
+        raise HTTPException(status_code=400, detail=f"profile must be one of {list(TRAVEL_SPEED_PROFILES)}")
+
+    route = plan_trip_route(existing.get('places', []), optimize=True, keep_start=keep_start,
+                            time_budget_ms=time_budget_ms, profile=profile, start=existing.get('start'))
+    update_data = {
+        'places': route['places'],
+        'total_distance': route['total_distance'],
+        'estimated_time': route['estimated_time'],
+        'updated_at': datetime.now(timezone.utc).isoformat()
+    }
+    await db.trips.update_one({"id": trip_id}, {"$set": update_data})
+    if 'optimization' in route:
+        logger.info(f"Trip {trip_id} optimized: {route['optimization']}")
+
+    return {**existing, **update_data}
+
+
 @api_router.delete("/trips/{trip_id}")
 async def delete_trip(trip_id: str):
     """Delete a trip plan"""
@@ -1243,6 +4762,9 @@ async def update_place(place_id: str, update: PlaceUpdate, admin: bool = Depends
         upsert=True
     )
     
+    # Оновлюємо in-memory набір даних та просторовий індекс
+    apply_place_edit(place_id, update_data)
+    
     return {"message": "Place updated successfully"}
 
 
@@ -1344,126 +4866,1381 @@ async def get_place_details(place_name, location_lat, location_lng):
         return None
 
 
-@api_router.get("/places/details/{attraction_id}")
-async def get_attraction_place_details(attraction_id: str):
+@api_router.get("/places/details/{attraction_id}")
+async def get_attraction_place_details(attraction_id: str):
+    """
+    Отримати Google Places деталі для туристичного об'єкта
+    """
+    try:
+        # Знайти об'єкт в даних
+        attraction = next((a for a in ATTRACTIONS_DATA if str(a.get('id')) == attraction_id), None)
+        
+        if not attraction:
+            raise HTTPException(status_code=404, detail="Attraction not found")
+        
+        # Отримати деталі з Google Places
+        coords = attraction.get('coordinates', {})
+        place_details = await get_place_details(
+            attraction.get('name'),
+            coords.get('lat', 0),
+            coords.get('lng', 0)
+        )
+        
+        if place_details:
+            return {
+                "success": True,
+                "attraction": attraction,
+                "google_details": place_details
+            }
+        else:
+            return {
+                "success": True,
+                "attraction": attraction,
+                "google_details": None,
+                "message": "Google Places data not available"
+            }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get place details error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ============= NEARBY SEARCH ENDPOINTS =============
+
+MAX_NEARBY_RESULTS = 500
+
+
+class NearbyPoint(BaseModel):
+    lat: float = Field(ge=-90, le=90)
+    lng: float = Field(ge=-180, le=180)
+
+class NearbyBatchRequest(BaseModel):
+    points: List[NearbyPoint]
+    radius: Optional[float] = Field(default=None, gt=0)
+    k: int = Field(default=10, ge=1, le=MAX_NEARBY_RESULTS)
+    category: Optional[str] = None
+    profile: Optional[str] = None
+    open_at: Optional[datetime] = None
+    include_unknown_hours: bool = False
+
+
+def attach_travel_times(table: AttractionTable, lat: float, lng: float, results: list, rows,
+                        profile: str) -> list:
+    """Час і відстань у дорозі від точки запиту (TravelTimeService), сортування за часом"""
+    if not results:
+        return results
+    minutes, km = get_travel_time_service().matrix([lat], [lng], table.lat[rows], table.lng[rows], profile)
+    for item, value_minutes, value_km in zip(results, minutes[0].tolist(), km[0].tolist()):
+        item['travel_minutes'] = round(value_minutes, 1)
+        item['travel_distance_km'] = round(value_km, 2)
+    return sorted(results, key=lambda item: item['travel_minutes'])
+
+
+@api_router.get("/attractions/nearby")
+async def get_nearby_attractions(lat: float, lng: float, radius: Optional[float] = None,
+                                 k: int = 20, category: Optional[str] = None, profile: Optional[str] = None,
+                                 open_at: Optional[datetime] = None, include_unknown_hours: bool = False):
+    """
+    Пошук найближчих туристичних об'єктів до точки
+
+    - radius: радіус пошуку в км (без нього - k найближчих)
+    - k: максимальна кількість результатів
+    - category: фільтр за категорією
+    - profile: профіль пересування (car, bike, foot) - додає час у дорозі
+    - open_at: лише об'єкти, відкриті в цей момент (include_unknown_hours - разом з невідомими годинами)
+    Результати відсортовані за відстанню гаверсинуса (з profile - за часом у дорозі).
+    """
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise HTTPException(status_code=400, detail="Invalid coordinates")
+    if radius is not None and radius <= 0:
+        raise HTTPException(status_code=400, detail="Radius must be positive")
+    if k < 1 or k > MAX_NEARBY_RESULTS:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {MAX_NEARBY_RESULTS}")
+    if profile is not None and profile not in TRAVEL_SPEED_PROFILES:
+        raise HTTPException(status_code=400, detail=f"profile must be one of {list(TRAVEL_SPEED_PROFILES)}")
+
+    try:
+        index = get_spatial_index()
+        rows, distances = index.query(
+            lat, lng, k=k, radius_km=radius,
+            category_mask=combine_masks(index.table.category_mask(category),
+                                        open_at_mask(open_at, include_unknown_hours))
+        )
+        data = serialize_nearby(index.table, rows, distances)
+        if profile:
+            data = attach_travel_times(index.table, lat, lng, data, rows, profile)
+        return {
+            "success": True,
+            "total": len(rows),
+            "data": data,
+            "dataset_version": index.version
+        }
+    except Exception as e:
+        logger.error(f"Nearby search error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.post("/attractions/nearby/batch")
+async def get_nearby_attractions_batch(request: NearbyBatchRequest):
+    """
+    Пакетний пошук найближчих об'єктів для багатьох точок запиту
+    """
+    if len(request.points) > 1000:
+        raise HTTPException(status_code=400, detail="Too many points (max 1000)")
+    if request.profile is not None and request.profile not in TRAVEL_SPEED_PROFILES:
+        raise HTTPException(status_code=400, detail=f"profile must be one of {list(TRAVEL_SPEED_PROFILES)}")
+
+    try:
+        index = get_spatial_index()
+        results = index.query_batch(
+            [(p.lat, p.lng) for p in request.points],
+            k=request.k,
+            radius_km=request.radius,
+            category_mask=combine_masks(index.table.category_mask(request.category),
+                                        open_at_mask(request.open_at, request.include_unknown_hours))
+        )
+        return {
+            "success": True,
+            "data": [
+                {
+                    "point": {"lat": p.lat, "lng": p.lng},
+                    "total": len(rows),
+                    "results": (
+                        attach_travel_times(index.table, p.lat, p.lng, serialize_nearby(index.table, rows, distances),
+                                            rows, request.profile)
+                        if request.profile else serialize_nearby(index.table, rows, distances)
+                    )
+                }
+                for p, (rows, distances) in zip(request.points, results)
+            ],
+            "dataset_version": index.version
+        }
+    except Exception as e:
+        logger.error(f"Batch nearby search error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/attractions/{attraction_id}/nearby")
+async def get_attraction_neighbors(attraction_id: str, k: int = 10, category: Optional[str] = None):
+    """
+    Найближчі об'єкти до заданого об'єкта з попередньо обчисленого графа k-NN
+    """
+    if k < 1 or k > KNN_GRAPH_K:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {KNN_GRAPH_K}")
+
+    try:
+        table = get_attraction_table()
+        row = table.row_by_id.get(attraction_id)
+        if row is None:
+            raise HTTPException(status_code=404, detail="Attraction not found")
+
+        graph = get_knn_graph()
+        rows, distances = graph.neighbors[row], graph.distances[row]
+        keep = rows >= 0
+        if category:
+            keep &= table.category_codes[rows] == table.category_index.get(category, -1)
+        rows, distances = rows[keep][:k], distances[keep][:k]
+
+        return {
+            "success": True,
+            "attraction_id": attraction_id,
+            "total": len(rows),
+            "data": serialize_nearby(table, rows, distances),
+            "dataset_version": graph.version
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Attraction neighbors error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ============= SEARCH ENDPOINTS =============
+
+@api_router.get("/search")
+async def search(q: str, category: Optional[str] = None, limit: int = 20,
+                 lat: Optional[float] = None, lng: Optional[float] = None,
+                 open_at: Optional[datetime] = None, include_unknown_hours: bool = False, fuzzy: bool = True):
+    """
+    Повнотекстовий пошук об'єктів за назвою, адресою та описом
+
+    - q: запит кирилицею або латиницею (останнє слово - префікс)
+    - fuzzy: якщо точних збігів менше за limit, решта доповнюється схожими назвами (триграми)
+    - category: фільтр за категорією
+    - lat/lng: бонус за близькість і відстань у відповіді
+    - open_at: лише об'єкти, відкриті в цей момент (include_unknown_hours - разом з невідомими годинами)
+    """
+    if limit < 1 or limit > MAX_SEARCH_RESULTS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_SEARCH_RESULTS}")
+    if (lat is None) != (lng is None):
+        raise HTTPException(status_code=400, detail="lat and lng must be provided together")
+    if lat is not None and not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise HTTPException(status_code=400, detail="Invalid coordinates")
+
+    try:
+        index = get_search_index()
+        table = index.table
+        location = (lat, lng) if lat is not None else None
+        mask = combine_masks(table.category_mask(category), open_at_mask(open_at, include_unknown_hours))
+        rows, scores, distances, total = index.search(q, k=limit, location=location, mask=mask)
+        matches = ['text'] * len(rows)
+        if fuzzy and len(rows) < limit:
+            fuzzy_mask = np.ones(len(table), dtype=bool) if mask is None else mask.copy()
+            fuzzy_mask[rows] = False
+            fuzzy_rows, fuzzy_scores = get_trigram_index().search(q, k=limit - len(rows), mask=fuzzy_mask)
+            if len(fuzzy_rows):
+                # Схожі назви йдуть після точних збігів; оцінка - триграмна подібність
+                rows = np.concatenate([rows, fuzzy_rows])
+                scores = np.concatenate([scores, fuzzy_scores])
+                if location is not None:
+                    distances = haversine_km(lat, lng, table.lat[rows], table.lng[rows])
+                matches += ['fuzzy'] * len(fuzzy_rows)
+                total += len(fuzzy_rows)
+        data = []
+        for i, row in enumerate(rows.tolist()):
+            record = table.records[row]
+            data.append({
+                'id': record.get('id'),
+                'name': record.get('name'),
+                'category': record.get('category'),
+                'address': record.get('address'),
+                'coordinates': record.get('coordinates'),
+                'rating': record.get('rating'),
+                'score': round(float(scores[i]), 4),
+                'distance_km': (round(float(distances[i]), 3)
+                                if distances is not None and table.has_coords[row] else None),
+                'match': matches[i]
+            })
+        return {
+            "success": True,
+            "query": q,
+            "total": total,
+            "data": data,
+            "dataset_version": index.version
+        }
+    except Exception as e:
+        logger.error(f"Search error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/search/autocomplete")
+async def search_autocomplete(q: str, limit: int = 10, category: Optional[str] = None):
+    """
+    Підказки під час введення: назви об'єктів, що містять усі слова запиту (останнє - префікс).
+    Шукається лише в назвах - адреси й описи («Житомирська область») не дають підказок.
+    """
+    if limit < 1 or limit > MAX_SEARCH_RESULTS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_SEARCH_RESULTS}")
+
+    try:
+        index = get_name_search_index()
+        rows, _, _, total = index.search(q, k=limit, mask=index.table.category_mask(category))
+        return {
+            "success": True,
+            "total": total,
+            "suggestions": [
+                {
+                    'id': index.table.records[row].get('id'),
+                    'name': index.table.records[row].get('name'),
+                    'category': index.table.records[row].get('category')
+                }
+                for row in rows.tolist()
+            ]
+        }
+    except Exception as e:
+        logger.error(f"Autocomplete error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ============= FACETED QUERY ENDPOINT =============
+
+def split_values(value: Optional[str]) -> list:
+    """Значення фасета через кому: "historical,culture" → ["historical", "culture"]"""
+    return [v.strip() for v in value.split(',') if v.strip()] if value else []
+
+
+@api_router.get("/attractions/query")
+async def query_attractions(category: Optional[str] = None, district: Optional[str] = None,
+                            min_rating: Optional[float] = None, max_rating: Optional[float] = None,
+                            has_phone: Optional[bool] = None, has_website: Optional[bool] = None,
+                            open_now: bool = False, open_at: Optional[datetime] = None,
+                            include_unknown_hours: bool = False, limit: int = 100, offset: int = 0):
+    """
+    Фільтрація об'єктів за фасетами карти з кількістю для кожного значення фасета
+
+    - category, district: одне або кілька значень через кому (АБО в межах фасета)
+    - min_rating / max_rating: діапазон рейтингу
+    - has_phone, has_website: наявність (true) або відсутність (false) контакту
+    - open_now / open_at: відкриті зараз або в заданий момент (include_unknown_hours - разом з невідомими)
+    - limit, offset: сторінка результатів у порядку таблиці
+    """
+    if limit < 1 or limit > MAX_QUERY_RESULTS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_QUERY_RESULTS}")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must be non-negative")
+    if min_rating is not None and max_rating is not None and min_rating > max_rating:
+        raise HTTPException(status_code=400, detail="min_rating must not exceed max_rating")
+
+    try:
+        index = get_facet_index()
+        table = index.table
+        filters = {}
+        if category:
+            filters['category'] = index.union(index.categories, split_values(category))
+        if district:
+            filters['district'] = index.union(index.districts, split_values(district))
+        if min_rating is not None or max_rating is not None:
+            filters['rating'] = index.rating_range(min_rating, max_rating)
+        if has_phone is not None:
+            filters['has_phone'] = index.has_phone if has_phone else index.all & ~index.has_phone
+        if has_website is not None:
+            filters['has_website'] = index.has_website if has_website else index.all & ~index.has_website
+        if open_now and open_at is None:
+            open_at = datetime.now(OPENING_HOURS_TZ)
+        if open_at is not None:
+            filters['open'] = pack_mask(open_at_mask(open_at, include_unknown_hours))
+
+        result, facets = index.query(filters)
+        rows = unpack_rows(result, len(table))
+        return {
+            "success": True,
+            "total": len(rows),
+            "offset": offset,
+            "data": [
+                {
+                    'id': table.records[row].get('id'),
+                    'name': table.records[row].get('name'),
+                    'category': table.records[row].get('category'),
+                    'coordinates': table.records[row].get('coordinates'),
+                    'rating': table.records[row].get('rating'),
+                    'district': index.district_of(row)
+                }
+                for row in rows[offset:offset + limit].tolist()
+            ],
+            "facets": facets,
+            "dataset_version": index.version
+        }
+    except Exception as e:
+        logger.error(f"Faceted query error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ============= PUBLIC ATTRACTIONS API =============
+
+ATTRACTION_FIELDS = ('id', 'name', 'category', 'description', 'address', 'coordinates',
+                     'phone', 'website', 'workingHours', 'osm_id', 'rating')
+MAX_ATTRACTIONS_PAGE = 1000
+DEFAULT_COORDINATE_PRECISION = 6  # ~0.1 м, достатньо для карти
+ATTRACTIONS_PAGE_CACHE = LRUCache(maxsize=256)
+
+
+def encode_cursor(row: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({'r': row}).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> int:
+    """Номер рядка, з якого починається сторінка (ValueError для некоректного курсора)"""
+    try:
+        row = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))['r']
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(row, int) or row < 0:
+        raise ValueError("Invalid cursor")
+    return row
+
+
+def project_record(record: dict, fields: tuple, precision: Optional[int]) -> dict:
+    """Запис лише з вибраними полями; координати округлюються до precision знаків"""
+    result = {field: record.get(field) for field in fields}
+    coords = result.get('coordinates')
+    if precision is not None and isinstance(coords, dict):
+        result['coordinates'] = {
+            key: round(value, precision) if isinstance(value, (int, float)) else value
+            for key, value in coords.items()
+        }
+    return result
+
+
+def matches_etag(if_none_match: Optional[str], etag: str) -> bool:
+    """Перевірка If-None-Match (список тегів, слабкі теги W/ і *)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in (tag[2:] if tag.startswith('W/') else tag for tag in tags)
+
+
+@api_router.get("/attractions")
+async def list_attractions(cursor: Optional[str] = None, limit: int = 100, fields: Optional[str] = None,
+                           precision: Optional[int] = DEFAULT_COORDINATE_PRECISION,
+                           if_none_match: Optional[str] = Header(None)):
+    """
+    Туристичні об'єкти посторінково (з правками адміністратора з db.places)
+
+    - cursor: курсор наступної сторінки з попередньої відповіді (next_cursor)
+    - limit: розмір сторінки (1-1000)
+    - fields: поля через кому, напр. "id,name,coordinates" (за замовчуванням - усі)
+    - precision: кількість знаків координат (0-8)
+    Відповідь має ETag; з If-None-Match без змін повертається 304.
+    """
+    if limit < 1 or limit > MAX_ATTRACTIONS_PAGE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_ATTRACTIONS_PAGE}")
+    if precision is not None and not 0 <= precision <= 8:
+        raise HTTPException(status_code=400, detail="precision must be between 0 and 8")
+    selected = tuple(split_values(fields)) or ATTRACTION_FIELDS
+    unknown = [field for field in selected if field not in ATTRACTION_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {unknown}; allowed: {list(ATTRACTION_FIELDS)}")
+    try:
+        start = decode_cursor(cursor) if cursor else 0
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    table = get_attraction_table()
+    ATTRACTIONS_PAGE_CACHE.ensure_version(table.version)
+    key = (start, limit, selected, precision)
+    page = ATTRACTIONS_PAGE_CACHE.get(key)
+    if page is None:
+        end = min(start + limit, len(table))
+        body = json.dumps({
+            "success": True,
+            "total": len(table),
+            "data": [project_record(record, selected, precision) for record in table.records[start:end]],
+            "next_cursor": encode_cursor(end) if end < len(table) else None,
+            "dataset_version": table.version
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        page = (body, '"' + hashlib.sha1(body).hexdigest()[:20] + '"')
+        ATTRACTIONS_PAGE_CACHE.set(key, page)
+
+    body, etag = page
+    headers = {"ETag": etag, "Cache-Control": "public, no-cache"}
+    if matches_etag(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# ============= SIMILAR PLACES ENDPOINTS =============
+
+class SimilarBatchRequest(BaseModel):
+    ids: List[str]
+    k: int = Field(default=10, ge=1, le=MAX_SIMILAR_RESULTS)
+    category: Optional[str] = None
+
+
+@api_router.get("/attractions/{attraction_id}/similar")
+async def get_similar_attractions(attraction_id: str, k: int = 10, category: Optional[str] = None):
+    """
+    Схожі місця: найближчі сусіди в нормалізованому просторі ознак
+    (координати, категорія, рейтинг - як у кластеризації, розділ 2.4)
+    """
+    if k < 1 or k > MAX_SIMILAR_RESULTS:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {MAX_SIMILAR_RESULTS}")
+
+    index = get_similarity_index()
+    row = index.table.row_by_id.get(attraction_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Attraction not found")
+
+    rows, distances = index.query(row, k=k, category_mask=index.table.category_mask(category))
+    return {
+        "success": True,
+        "attraction_id": attraction_id,
+        "total": len(rows),
+        "data": serialize_similar(index.table, rows, distances),
+        "dataset_version": index.version
+    }
+
+
+@api_router.post("/attractions/similar/batch")
+async def get_similar_attractions_batch(request: SimilarBatchRequest):
+    """Схожі місця для багатьох об'єктів одним запитом (невідомі id повертаються з порожнім списком)"""
+    if len(request.ids) > 500:
+        raise HTTPException(status_code=400, detail="Too many ids (max 500)")
+
+    index = get_similarity_index()
+    category_mask = index.table.category_mask(request.category)
+    data = []
+    for attraction_id in request.ids:
+        row = index.table.row_by_id.get(attraction_id)
+        if row is None:
+            data.append({"attraction_id": attraction_id, "total": 0, "results": []})
+            continue
+        rows, distances = index.query(row, k=request.k, category_mask=category_mask)
+        data.append({
+            "attraction_id": attraction_id,
+            "total": len(rows),
+            "results": serialize_similar(index.table, rows, distances)
+        })
+    return {"success": True, "data": data, "dataset_version": index.version}
+
+
+# ============= ITEM-ITEM COLLABORATIVE FILTERING =============
+
+COVISITATION_TOP_N = 20
+COVISITATION_SIMILARITIES = ('cosine', 'jaccard')
+COVISITATION_SIMILARITY = os.environ.get('COVISITATION_SIMILARITY', 'cosine')
+COVISITATION_REFRESH_S = int(os.environ.get('COVISITATION_REFRESH_S', 3600))
+COVISITATION_BATCH = 10000  # розмір порції курсора db.visits при пакетній побудові
+COVISITATION_REPLAY_SLACK = timedelta(minutes=1)
+ANONYMOUS_USERS = {'', 'anonymous'}
+
+
+class CoVisitationModel:
+    """
+    Модель «ті, хто відвідав X, також відвідали» на основі db.visits.
+
+    Пакетна побудова: бінарна розріджена матриця користувач × об'єкт X,
+    спільні відвідування C = Xᵀ X (діагональ - кількість унікальних відвідувачів n).
+    Подібність: cosine = C_ij / √(n_i n_j) або jaccard = C_ij / (n_i + n_j - C_ij).
+    Для кожного об'єкта зберігаються top-N сусідів у компактних масивах
+    neighbors (int32, -1 - порожньо) та scores (float32) - пошук за O(1).
+
+    Нові відвідування застосовуються інкрементально: приріст C накопичується
+    в delta, а top-N перераховується лише для зачеплених об'єктів.
+    Повна перебудова виконується за розкладом (COVISITATION_REFRESH_S).
+    """
+
+    def __init__(self, n_items: int, similarity: str = 'cosine', top_n: int = COVISITATION_TOP_N):
+        from scipy import sparse
+
+        self.n_items = n_items
+        self.similarity = similarity
+        self.top_n = top_n
+        self.user_items = {}
+        self.item_users = np.zeros(n_items, dtype=np.int64)
+        self.co = sparse.csr_matrix((n_items, n_items), dtype=np.int64)
+        self.delta = {}
+        self.neighbors = np.full((n_items, top_n), -1, dtype=np.int32)
+        self.scores = np.zeros((n_items, top_n), dtype=np.float32)
+        self.visits = 0
+        self.built_at = None
+
+    @classmethod
+    def build(cls, table: AttractionTable, visits, similarity: str = 'cosine',
+              top_n: int = COVISITATION_TOP_N) -> 'CoVisitationModel':
+        """Побудова з будь-якого ітерованого набору відвідувань (список, генератор)"""
+        model = cls(len(table), similarity, top_n)
+        model.collect(table, visits)
+        return model.finalize()
+
+    def collect(self, table: AttractionTable, visits):
+        """
+        Накопичення пар користувач → об'єкти до finalize. Можна викликати порціями:
+        зберігаються лише множини рядків користувачів, не самі документи
+        """
+        for visit in visits:
+            user = str(visit.get('user_id') or '')
+            row = table.row_by_id.get(str(visit.get('attraction_id')))
+            if row is not None and user not in ANONYMOUS_USERS:
+                self.user_items.setdefault(user, set()).add(row)
+
+    def finalize(self) -> 'CoVisitationModel':
+        """Матриця спільних відвідувань і top-N з накопичених пар"""
+        from scipy import sparse
+
+        users = np.repeat(np.arange(len(self.user_items)), [len(items) for items in self.user_items.values()])
+        items = np.fromiter((row for rows in self.user_items.values() for row in rows), dtype=np.int64,
+                            count=len(users))
+        visits_matrix = sparse.csr_matrix((np.ones(len(users), dtype=np.int64), (users, items)),
+                                          shape=(len(self.user_items), self.n_items))
+        co = (visits_matrix.T @ visits_matrix).tocsr()
+        self.item_users = co.diagonal().astype(np.int64)
+        co = (co - sparse.diags(self.item_users, dtype=np.int64)).tocsr()
+        co.eliminate_zeros()
+        co.sort_indices()
+        self.co = co
+        self.visits = len(users)
+        self.built_at = datetime.now(timezone.utc)
+        self._refresh_all()
+        return self
+
+    def _similarity(self, rows: np.ndarray, cols: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        n_i, n_j = self.item_users[rows], self.item_users[cols]
+        if self.similarity == 'jaccard':
+            return counts / np.maximum(n_i + n_j - counts, 1)
+        return counts / np.sqrt(np.maximum(n_i * n_j, 1))
+
+    def _refresh_all(self):
+        """Top-N для всіх об'єктів одним векторизованим проходом по CSR"""
+        self.neighbors.fill(-1)
+        self.scores.fill(0)
+        if self.co.nnz == 0:
+            return
+        rows = np.repeat(np.arange(self.n_items), np.diff(self.co.indptr))
+        sims = self._similarity(rows, self.co.indices, self.co.data)
+        # Сортування: рядок, спадання подібності, номер сусіда (детермінованість)
+        order = np.lexsort((self.co.indices, -sims, rows))
+        rows, cols, sims = rows[order], self.co.indices[order], sims[order]
+        rank = np.arange(len(rows)) - self.co.indptr[rows]
+        keep = rank < self.top_n
+        self.neighbors[rows[keep], rank[keep]] = cols[keep]
+        self.scores[rows[keep], rank[keep]] = sims[keep]
+
+    def _row_counts(self, row: int):
+        start, end = self.co.indptr[row], self.co.indptr[row + 1]
+        counts = dict(zip(self.co.indices[start:end].tolist(), self.co.data[start:end].tolist()))
+        for col, increment in self.delta.get(row, {}).items():
+            counts[col] = counts.get(col, 0) + increment
+        return counts
+
+    def _refresh_rows(self, rows):
+        for row in rows:
+            counts = self._row_counts(row)
+            self.neighbors[row].fill(-1)
+            self.scores[row].fill(0)
+            if not counts:
+                continue
+            cols = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+            sims = self._similarity(np.full(len(cols), row), cols, values)
+            order = np.lexsort((cols, -sims))[:self.top_n]
+            self.neighbors[row, :len(order)] = cols[order]
+            self.scores[row, :len(order)] = sims[order]
+
+    def add_visit(self, user_id, row: int) -> bool:
+        """Інкрементальне врахування нового відвідування; False - пара вже врахована або анонімна"""
+        user = str(user_id or '')
+        if user in ANONYMOUS_USERS or row >= self.n_items:
+            return False
+        items = self.user_items.setdefault(user, set())
+        if row in items:
+            return False
+
+        for other in items:
+            self.delta.setdefault(row, {})[other] = self.delta.get(row, {}).get(other, 0) + 1
+            self.delta.setdefault(other, {})[row] = self.delta.get(other, {}).get(row, 0) + 1
+        self.item_users[row] += 1
+        items.add(row)
+        self.visits += 1
+
+        # Зміна n_row впливає на подібність row з усіма його сусідами
+        self._refresh_rows({row} | items | set(self._row_counts(row)))
+        return True
+
+    def neighbors_of(self, row: int):
+        """Top-N сусідів об'єкта (rows, scores) - O(1) зріз компактних масивів"""
+        rows = self.neighbors[row]
+        valid = rows >= 0
+        return rows[valid], self.scores[row][valid]
+
+    def stats(self) -> dict:
+        return {
+            'similarity': self.similarity,
+            'top_n': self.top_n,
+            'users': len(self.user_items),
+            'visits': self.visits,
+            'items_with_neighbors': int((self.neighbors[:, 0] >= 0).sum()),
+            'built_at': self.built_at.isoformat() if self.built_at else None
+        }
+
+
+COVISITATION_MODEL = None
+_COVISITATION_TASK = None
+_COVISITATION_LOCK = None
+
+
+def get_covisitation_lock():
+    global _COVISITATION_LOCK
+    import asyncio
+
+    if _COVISITATION_LOCK is None:
+        _COVISITATION_LOCK = asyncio.Lock()
+    return _COVISITATION_LOCK
+
+
+def covisitation_model_stale() -> bool:
+    return COVISITATION_MODEL is None or COVISITATION_MODEL.n_items != len(get_attraction_table())
+
+
+async def build_covisitation_model(similarity: Optional[str] = None, force: bool = True) -> CoVisitationModel:
     """
-    Отримати Google Places деталі для туристичного об'єкта
+    Пакетна побудова моделі спільних відвідувань з db.visits.
+    Побудови серіалізуються блокуванням; force=False - лише якщо модель відсутня або застаріла.
+    Відвідування, записані під час проходу (після high_water), додаються до нової моделі
+    перед заміною: log_visit у цей час оновлює ще стару модель.
     """
-    try:
-        # Знайти об'єкт в даних
-        attraction = next((a for a in ATTRACTIONS_DATA if str(a.get('id')) == attraction_id), None)
-        
-        if not attraction:
-            raise HTTPException(status_code=404, detail="Attraction not found")
-        
-        # Отримати деталі з Google Places
-        coords = attraction.get('coordinates', {})
-        place_details = await get_place_details(
-            attraction.get('name'),
-            coords.get('lat', 0),
-            coords.get('lng', 0)
-        )
-        
-        if place_details:
-            return {
-                "success": True,
-                "attraction": attraction,
-                "google_details": place_details
-            }
-        else:
-            return {
-                "success": True,
-                "attraction": attraction,
-                "google_details": None,
-                "message": "Google Places data not available"
-            }
-    
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Get place details error: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    global COVISITATION_MODEL
+
+    async with get_covisitation_lock():
+        if not force and not covisitation_model_stale():
+            return COVISITATION_MODEL
+
+        table = get_attraction_table()
+        model = CoVisitationModel(len(table), similarity or COVISITATION_SIMILARITY)
+        high_water = datetime.now().isoformat()
+        fields = {"_id": 0, "user_id": 1, "attraction_id": 1}
+        # Курсор читається порціями: у пам'яті лише поточна порція і множини об'єктів користувачів
+        cursor = db.visits.find({"created_at": {"$not": {"$gt": high_water}}}, fields)
+        while batch := await cursor.to_list(COVISITATION_BATCH):
+            model.collect(table, batch)
+        model.finalize()
+
+        # Повторне додавання вже врахованих пар ігнорується, тож запас COVISITATION_REPLAY_SLACK
+        # безпечно покриває відвідування, час яких узято до high_water, а запис - після
+        replay_from = (datetime.fromisoformat(high_water) - COVISITATION_REPLAY_SLACK).isoformat()
+        recent = await db.visits.find({"created_at": {"$gte": replay_from}}, fields).to_list(None)
+        for visit in recent:
+            row = table.row_by_id.get(str(visit.get('attraction_id')))
+            if row is not None:
+                model.add_visit(visit.get('user_id'), row)
+        COVISITATION_MODEL = model
+        logger.info(f"[CF] Co-visitation model built: {COVISITATION_MODEL.stats()}")
+        return COVISITATION_MODEL
+
+
+async def get_covisitation_model() -> CoVisitationModel:
+    if covisitation_model_stale():
+        await build_covisitation_model(force=False)
+    return COVISITATION_MODEL
+
+
+async def covisitation_refresh_loop():
+    """Періодична повна перебудова моделі (інкрементальні зміни між перебудовами - з log_visit)"""
+    import asyncio
+
+    while True:
+        try:
+            await build_covisitation_model(COVISITATION_MODEL.similarity if COVISITATION_MODEL else None)
+        except Exception as e:
+            logger.error(f"[CF] Co-visitation rebuild failed: {str(e)}")
+        await asyncio.sleep(COVISITATION_REFRESH_S)
+
+
+# ============= ROUTE PATTERN MINING =============
+# Часті послідовні переходи між об'єктами для підказок «куди далі»
+
+ROUTE_MINING_BATCH = 10000
+ROUTE_CHECKPOINT_EVERY = 200000  # записів між збереженнями контрольної точки
+ROUTE_PATTERN_CAPACITY = int(os.environ.get('ROUTE_PATTERN_CAPACITY', 500000))
+ROUTE_SESSION_GAP = timedelta(hours=12)  # довша перерва між відвідуваннями - новий маршрут
+ROUTE_MINING_REFRESH_S = int(os.environ.get('ROUTE_MINING_REFRESH_S', 6 * 3600))
+MAX_NEXT_STOPS = 50
+ROUTE_VISIT_FIELDS = {"_id": 0, "id": 1, "user_id": 1, "attraction_id": 1, "visit_date": 1, "created_at": 1}
+
+
+def route_layout(table: AttractionTable) -> str:
+    """Відбиток порядку id у таблиці: лічильники зберігають номери рядків, а не поля об'єктів"""
+    return hashlib.sha1('\n'.join(map(str, table.ids)).encode('utf-8')).hexdigest()[:16]
+
+
+def parse_visit_time(value) -> Optional[datetime]:
+    """visit_date у UTC (наївний час вважається UTC); None, якщо дата нерозпізнана"""
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        try:
+            moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    return moment if moment.tzinfo is not None else moment.replace(tzinfo=timezone.utc)
+
+
+class RoutePatterns:
+    """
+    Лічильники послідовних пар A→B і трійок A→B→C з db.visits
+    (відвідування кожного користувача впорядковані за visit_date).
+
+    pairs[a] = {b: n}, triples[a * n_items + b] = {c: n}; pair_totals[a] - усі переходи з a
+    (без урахування відсікання), тож ймовірності залишаються каліброваними.
+    Пам'ять обмежена: коли записів більше за ROUTE_PATTERN_CAPACITY, рідкісні записи
+    (не частіші за медіану) відкидаються, поріг зберігається в pruned_floor (lossy counting):
+    новий запис починається з pruned_floor - стільки переходів могло бути відкинуто раніше.
+
+    Пакетний прохід читає db.visits порціями, відсортованими за (user_id, visit_date, id),
+    тож стан користувача - лише дві останні зупинки (tail). Позиція курсора, tail і лічильники
+    зберігаються контрольною точкою, з якої перерваний прохід продовжується.
+    Відвідування, створені після high_water, застосовуються інкрементально (record_route_visit).
+    """
+
+    def __init__(self, n_items: int, layout: str, high_water: str):
+        self.n_items = n_items
+        self.layout = layout
+        self.high_water = high_water
+        self.pairs = {}
+        self.triples = {}
+        self.pair_totals = np.zeros(n_items, dtype=np.int64)
+        self.entries = {'pairs': 0, 'triples': 0}
+        self.pruned_floor = {'pairs': 0, 'triples': 0}
+        self.cursor = None
+        self.tail = [None, -1, -1, None]
+        self.processed = 0
+        self.done = False
+        self.live = False
+
+    def _increment(self, kind: str, key: int, row: int):
+        counter = self.pairs if kind == 'pairs' else self.triples
+        inner = counter.setdefault(key, {})
+        if row not in inner:
+            self.entries[kind] += 1
+            floor = self.pruned_floor[kind]
+            if kind == 'pairs':
+                # Переходів a→b не більше, ніж усіх переходів з a
+                floor = min(floor, int(self.pair_totals[key]))
+            inner[row] = floor
+        inner[row] += 1
+        if self.entries[kind] > ROUTE_PATTERN_CAPACITY:
+            self._prune(kind)
+
+    def _prune(self, kind: str):
+        counter = self.pairs if kind == 'pairs' else self.triples
+        counts = np.fromiter((c for inner in counter.values() for c in inner.values()), dtype=np.int64,
+                             count=self.entries[kind])
+        floor = int(np.partition(counts, len(counts) // 2)[len(counts) // 2])
+        for key in list(counter):
+            inner = {row: c for row, c in counter[key].items() if c > floor}
+            if inner:
+                counter[key] = inner
+            else:
+                del counter[key]
+        self.entries[kind] = sum(len(inner) for inner in counter.values())
+        self.pruned_floor[kind] = max(self.pruned_floor[kind], floor)
+
+    def consume(self, user: str, row: Optional[int], visit_date, count: bool = True):
+        """Наступне відвідування потоку, впорядкованого за користувачем і часом"""
+        tail_user, prev2, prev1, last = self.tail
+        moment = parse_visit_time(visit_date)
+        if (user != tail_user or row is None
+                or (moment is not None and last is not None and moment - last > ROUTE_SESSION_GAP)):
+            prev2, prev1 = -1, -1
+        if row is not None and row != prev1:
+            if count and prev1 >= 0:
+                self._increment('pairs', prev1, row)
+                self.pair_totals[prev1] += 1
+                if prev2 >= 0:
+                    self._increment('triples', prev2 * self.n_items + prev1, row)
+            prev2, prev1 = prev1, row
+        self.tail = [user, prev2, prev1, moment]
+
+    def next_stops(self, row: int, k: int = 10, previous: Optional[int] = None) -> list:
+        """
+        Найімовірніші наступні зупинки після row: [(row, ймовірність, кількість, шаблон)].
+        З previous спершу використовуються трійки previous→row→next, решта доповнюється парами.
+        """
+        result, seen = [], {row}
+        if previous is not None:
+            followers = self.triples.get(previous * self.n_items + row, {})
+            total = sum(followers.values())
+            for nxt, count in sorted(followers.items(), key=lambda item: (-item[1], item[0]))[:k]:
+                result.append((nxt, count / total, count, 'triple'))
+                seen.add(nxt)
+        total = int(self.pair_totals[row])
+        for nxt, count in sorted(self.pairs.get(row, {}).items(), key=lambda item: (-item[1], item[0])):
+            if len(result) >= k:
+                break
+            if nxt not in seen:
+                result.append((nxt, count / total, count, 'pair'))
+        return result
+
+    def state(self) -> dict:
+        return {
+            'layout': self.layout,
+            'high_water': self.high_water,
+            'cursor': self.cursor,
+            'tail': self.tail[:3] + [self.tail[3].isoformat() if self.tail[3] else None],
+            'processed': self.processed,
+            'done': self.done,
+            'entries': self.entries,
+            'pruned_floor': self.pruned_floor
+        }
+
+    def snapshot_arrays(self) -> dict:
+        def flatten(counter):
+            keys = np.fromiter((key for key, inner in counter.items() for _ in inner), dtype=np.int64)
+            rows = np.fromiter((row for inner in counter.values() for row in inner), dtype=np.int64)
+            counts = np.fromiter((c for inner in counter.values() for c in inner.values()), dtype=np.int64)
+            return keys, rows, counts
+
+        pair_src, pair_dst, pair_count = flatten(self.pairs)
+        triple_ctx, triple_dst, triple_count = flatten(self.triples)
+        return {
+            'pair_src': pair_src, 'pair_dst': pair_dst, 'pair_count': pair_count,
+            'triple_ctx': triple_ctx, 'triple_dst': triple_dst, 'triple_count': triple_count,
+            'pair_totals': self.pair_totals,
+            'state': np.array([json.dumps(self.state())])
+        }
+
+    @classmethod
+    def from_snapshot(cls, n_items: int, snapshot: dict) -> 'RoutePatterns':
+        state = json.loads(str(snapshot['state'][0]))
+        model = cls(n_items, state['layout'], state['high_water'])
+        for key, row, count in zip(snapshot['pair_src'].tolist(), snapshot['pair_dst'].tolist(),
+                                   snapshot['pair_count'].tolist()):
+            model.pairs.setdefault(key, {})[row] = count
+        for key, row, count in zip(snapshot['triple_ctx'].tolist(), snapshot['triple_dst'].tolist(),
+                                   snapshot['triple_count'].tolist()):
+            model.triples.setdefault(key, {})[row] = count
+        model.pair_totals = snapshot['pair_totals'].astype(np.int64)
+        model.cursor = state['cursor']
+        model.tail = state['tail'][:3] + [parse_visit_time(state['tail'][3]) if state['tail'][3] else None]
+        model.processed = state['processed']
+        model.done = state['done']
+        model.entries = state['entries']
+        model.pruned_floor = state['pruned_floor']
+        return model
+
+    def save_checkpoint(self):
+        save_snapshot('route_patterns', self.layout, **self.snapshot_arrays())
+
+    def stats(self) -> dict:
+        state = self.state()
+        state.pop('tail')
+        state.pop('layout')
+        return {**state, 'live': self.live, 'transitions': int(self.pair_totals.sum())}
+
+
+ROUTE_PATTERNS = None
+_ROUTE_MINING_TASK = None
+_ROUTE_MINING_LOCK = None
+
+
+def get_route_mining_lock():
+    global _ROUTE_MINING_LOCK
+    import asyncio
+
+    if _ROUTE_MINING_LOCK is None:
+        _ROUTE_MINING_LOCK = asyncio.Lock()
+    return _ROUTE_MINING_LOCK
+
+
+async def record_route_visit(model: RoutePatterns, table: AttractionTable, visit: dict) -> bool:
+    """Інкрементальне врахування відвідування: дві попередні зупинки користувача беруться з db.visits"""
+    user = str(visit.get('user_id') or '')
+    row = table.row_by_id.get(str(visit.get('attraction_id')))
+    if user in ANONYMOUS_USERS or row is None or not visit.get('visit_date'):
+        return False
+    previous = await db.visits.find(
+        {"user_id": visit['user_id'], "id": {"$ne": visit.get('id')}, "visit_date": {"$lte": visit['visit_date']}},
+        ROUTE_VISIT_FIELDS
+    ).sort([("visit_date", -1), ("id", -1)]).limit(2).to_list(2)
+
+    tail = model.tail
+    model.tail = [None, -1, -1, None]
+    for item in reversed(previous):
+        model.consume(user, table.row_by_id.get(str(item.get('attraction_id'))), item.get('visit_date'), count=False)
+    model.consume(user, row, visit['visit_date'])
+    model.tail = tail
+    return True
+
+
+async def mine_route_patterns(resume: bool = True) -> RoutePatterns:
+    """
+    Пакетний прохід по db.visits (зупинки кожного користувача в порядку visit_date).
+    resume=True - продовження з контрольної точки для поточного порядку об'єктів
+    (завершена точка, свіжіша за ROUTE_MINING_REFRESH_S, використовується без повторного проходу).
+    """
+    global ROUTE_PATTERNS
+
+    async with get_route_mining_lock():
+        table = get_attraction_table()
+        layout = route_layout(table)
+        model = None
+        if resume:
+            snapshot = load_snapshot('route_patterns', layout)
+            if snapshot is not None and len(snapshot['pair_totals']) == len(table):
+                model = RoutePatterns.from_snapshot(len(table), snapshot)
+                age = datetime.now() - datetime.fromisoformat(model.high_water)
+                if model.done and age.total_seconds() > ROUTE_MINING_REFRESH_S:
+                    model = None
+        if model is None:
+            model = RoutePatterns(len(table), layout, datetime.now().isoformat())
+        # Поки немає готової моделі, ендпоінт читає частково накопичені лічильники
+        if ROUTE_PATTERNS is None or ROUTE_PATTERNS.layout != layout:
+            ROUTE_PATTERNS = model
+
+        base_query = {
+            "user_id": {"$nin": [*ANONYMOUS_USERS, None]},
+            "visit_date": {"$ne": None},
+            "id": {"$ne": None},
+            "created_at": {"$lte": model.high_water}
+        }
+        since_checkpoint = 0
+        while not model.done:
+            query = dict(base_query)
+            if model.cursor is not None:
+                user, visit_date, visit_id = model.cursor
+                query["$or"] = [
+                    {"user_id": {"$gt": user}},
+                    {"user_id": user, "visit_date": {"$gt": visit_date}},
+                    {"user_id": user, "visit_date": visit_date, "id": {"$gt": visit_id}}
+                ]
+            batch = await db.visits.find(query, ROUTE_VISIT_FIELDS).sort(
+                [("user_id", 1), ("visit_date", 1), ("id", 1)]
+            ).limit(ROUTE_MINING_BATCH).to_list(ROUTE_MINING_BATCH)
+            if not batch:
+                model.done = True
+                break
+            for visit in batch:
+                model.consume(str(visit['user_id']), table.row_by_id.get(str(visit.get('attraction_id'))),
+                              visit['visit_date'])
+            last = batch[-1]
+            model.cursor = [last['user_id'], last['visit_date'], last['id']]
+            model.processed += len(batch)
+            since_checkpoint += len(batch)
+            if since_checkpoint >= ROUTE_CHECKPOINT_EVERY:
+                model.save_checkpoint()
+                since_checkpoint = 0
+        model.save_checkpoint()
+
+        # Відвідування після high_water (не входять у контрольну точку) - інкрементально
+        recent = await db.visits.find({"created_at": {"$gt": model.high_water}}, ROUTE_VISIT_FIELDS).sort(
+            [("created_at", 1), ("id", 1)]
+        ).to_list(None)
+        for visit in recent:
+            await record_route_visit(model, table, visit)
+        model.live = True
+        ROUTE_PATTERNS = model
+        logger.info(f"[Routes] Route patterns mined: {model.stats()}")
+        return model
+
+
+async def get_route_patterns() -> Optional[RoutePatterns]:
+    """Поточна модель маршрутів; без неї (і без активного проходу) - пакетний прохід"""
+    if ((ROUTE_PATTERNS is None or ROUTE_PATTERNS.n_items != len(get_attraction_table()))
+            and not get_route_mining_lock().locked()):
+        await mine_route_patterns()
+    return ROUTE_PATTERNS
+
+
+async def route_mining_loop():
+    """Перший прохід продовжує контрольну точку, далі - повний перерахунок за розкладом"""
+    import asyncio
+
+    resume = True
+    while True:
+        try:
+            await mine_route_patterns(resume)
+            resume = False
+        except Exception as e:
+            logger.error(f"[Routes] Route pattern mining failed: {str(e)}")
+        await asyncio.sleep(ROUTE_MINING_REFRESH_S)
 
 
 # ============= RECOMMENDATIONS ENGINE =============
 
-def get_personalized_recommendations(preferences, visited_ids=None):
+# Категорії, для яких фронтенд передає вподобання (за замовчуванням 0.5), решта - 0.1
+PREFERENCE_CATEGORIES = ('historical', 'culture', 'nature', 'parks', 'shopping', 'gastro', 'hotels')
+RECOMMENDATION_WEIGHTS = {'rating': 0.3, 'popularity': 0.2, 'distance': 0.3}
+RECOMMENDATION_DISTANCE_SCALE_KM = 10.0
+MAX_RECOMMENDATIONS = 50
+
+
+class RecommendationMatrix:
+    """
+    Матриця ознак для оцінки рекомендацій (рядки - AttractionTable):
+    [one-hot категорії | нормалізований рейтинг (r - 1) / 4 | популярність].
+    Популярність - log(1 + відвідування) / log(1 + max) з db.visits.
+
+    Оцінка всіх об'єктів - один добуток матриці на вектор ваг;
+    близькість до туриста exp(-d / масштаб) додається окремим векторним доданком.
+    З радіусом подорожі оцінюються лише кандидати з просторового індексу (score_rows).
+    Результат детермінований (рівні оцінки впорядковуються за рядком таблиці).
+    """
+
+    def __init__(self, table: AttractionTable, visit_counts: np.ndarray, visits_stamp: str):
+        self.table = table
+        self.version = table.version
+        self.visits_stamp = visits_stamp
+
+        n, n_categories = len(table), len(table.categories)
+        # Поколонкове зберігання: швидка вибірка окремих ознак для підмножини рядків
+        self.features = np.zeros((n, n_categories + 2), dtype=np.float64, order='F')
+        self.features[np.arange(n), table.category_codes] = 1.0
+        self.features[:, n_categories] = (table.rating.astype(np.float64) - 1) / 4
+        peak = np.log1p(visit_counts.max()) if len(visit_counts) and visit_counts.max() > 0 else 1.0
+        self.features[:, n_categories + 1] = np.log1p(visit_counts) / peak
+
+    def weight_vector(self, preferences: dict) -> np.ndarray:
+        return np.array([
+            float(preferences.get(category, 0.5)) if category in PREFERENCE_CATEGORIES else 0.1
+            for category in self.table.categories
+        ] + [RECOMMENDATION_WEIGHTS['rating'], RECOMMENDATION_WEIGHTS['popularity']])
+
+    def score(self, preferences: dict, location: Optional[tuple] = None) -> np.ndarray:
+        scores = self.features @ self.weight_vector(preferences)
+        if location is not None:
+            distance = haversine_km(location[0], location[1], self.table.lat, self.table.lng)
+            scores += RECOMMENDATION_WEIGHTS['distance'] * np.exp(-distance / RECOMMENDATION_DISTANCE_SCALE_KM)
+        return scores
+
+    def score_rows(self, preferences: dict, rows: np.ndarray, distances: np.ndarray,
+                   decay_km: float) -> np.ndarray:
+        """
+        Оцінка підмножини рядків з доданком спаду за відстанню exp(-d / decay_km).
+        Те саме, що features[rows] @ w, але без копіювання рядків матриці:
+        one-hot частина зводиться до вибірки ваги за кодом категорії.
+        """
+        weights = self.weight_vector(preferences)
+        n_categories = len(self.table.categories)
+        scores = weights[self.table.category_codes[rows]]
+        scores += self.features[rows, n_categories] * weights[n_categories]
+        scores += self.features[rows, n_categories + 1] * weights[n_categories + 1]
+        return scores + RECOMMENDATION_WEIGHTS['distance'] * np.exp(-distances / decay_km)
+
+    def visited_mask(self, visited_ids) -> np.ndarray:
+        """Бітова маска відвіданих об'єктів (пошук рядків через словник, O(len(visited_ids)))"""
+        mask = np.zeros(len(self.table), dtype=bool)
+        rows = [self.table.row_by_id[i] for i in {str(v) for v in visited_ids or ()} if i in self.table.row_by_id]
+        mask[rows] = True
+        return mask
+
+
+def top_k_rows(scores: np.ndarray, k: int, rows: Optional[np.ndarray] = None):
+    """
+    Позиції k найкращих оцінок (argpartition + сортування лише k елементів) і самі оцінки.
+    rows - номери рядків таблиці для оцінок підмножини (для детермінованого порядку рівних оцінок).
+    """
+    valid = np.isfinite(scores)
+    k = min(k, int(valid.sum()))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    # Детермінований порядок: спадання оцінки, потім номер рядка
+    tie_break = candidates if rows is None else rows[candidates]
+    candidates = candidates[np.lexsort((tie_break, -scores[candidates]))]
+    return candidates, scores[candidates]
+
+
+RECOMMENDATION_MATRIX = None
+
+
+async def get_recommendation_matrix() -> RecommendationMatrix:
+    """Матриця ознак для поточної версії набору даних і свіжих лічильників відвідувань"""
+    global RECOMMENDATION_MATRIX
+
+    table = get_attraction_table()
+    counts, stamp = await get_visit_counts(table)
+    if (RECOMMENDATION_MATRIX is None or RECOMMENDATION_MATRIX.version != table.version
+            or RECOMMENDATION_MATRIX.visits_stamp != stamp):
+        RECOMMENDATION_MATRIX = RecommendationMatrix(table, counts, stamp)
+    return RECOMMENDATION_MATRIX
+
+
+# Кеш результатів: близькі положення повзунків вподобань дають однаковий ключ
+RECOMMENDATION_CACHE_TTL = float(os.environ.get('RECOMMENDATION_CACHE_TTL', VISIT_COUNTS_TTL))
+RECOMMENDATION_CACHE = TTLCache(maxsize=int(os.environ.get('RECOMMENDATION_CACHE_SIZE', 4096)),
+                                ttl=RECOMMENDATION_CACHE_TTL)
+PREFERENCE_QUANTUM = 0.05
+LOCATION_CELL_DEG = 0.01  # ~1.1 км за широтою
+# Найбільша відстань від точки до центру її комірки (половина діагоналі на екваторі)
+LOCATION_CELL_MARGIN_KM = float(np.radians(LOCATION_CELL_DEG) * EARTH_RADIUS_KM * np.sqrt(2) / 2)
+
+
+def quantize_preferences(preferences: dict) -> tuple:
+    """
+    Ваги категорій, округлені до кроку PREFERENCE_QUANTUM. Нульові ваги зберігаються:
+    без них відновлені ваги отримали б для цих категорій типові 0.5
+    """
+    return tuple(sorted((str(category), round(float(weight) / PREFERENCE_QUANTUM))
+                        for category, weight in preferences.items()))
+
+
+def visited_digest(visited_ids) -> str:
+    """Відбиток множини відвіданих об'єктів (не залежить від порядку й повторів)"""
+    ids = sorted({str(i) for i in visited_ids or ()})
+    return hashlib.sha1('\n'.join(ids).encode('utf-8')).hexdigest()[:16] if ids else ''
+
+
+def location_cell(lat: float, lng: float) -> tuple:
+    """Комірка сітки LOCATION_CELL_DEG і її центр, для якого рахується ранжування"""
+    cell = (int(np.floor(lat / LOCATION_CELL_DEG)), int(np.floor(lng / LOCATION_CELL_DEG)))
+    return cell, ((cell[0] + 0.5) * LOCATION_CELL_DEG, (cell[1] + 0.5) * LOCATION_CELL_DEG)
+
+
+def get_personalized_recommendations(matrix: RecommendationMatrix, preferences, visited_ids=None,
+                                     open_mask=None, location=None, k: int = 10,
+                                     radius_km: Optional[float] = None,
+                                     candidate_rows: Optional[np.ndarray] = None) -> list:
     """
     Рекомендаційна система на основі вподобань туриста
+    open_mask - необов'язковий фільтр open_at (маска рядків AttractionTable)
+    location + radius_km - кандидати лише в радіусі подорожі (просторовий індекс),
+    спад за відстанню з масштабом radius_km / 2
+    candidate_rows - готова надмножина кандидатів (кеш комірки) замість запиту до просторового індексу
     """
-    import random
-    
-    if visited_ids is None:
-        visited_ids = []
-    
-    # Категорії вподобань
-    category_weights = {
-        'historical': preferences.get('historical', 0.5),
-        'culture': preferences.get('culture', 0.5),
-        'nature': preferences.get('nature', 0.5),
-        'parks': preferences.get('parks', 0.5),
-        'shopping': preferences.get('shopping', 0.5),
-        'gastro': preferences.get('gastro', 0.5),
-        'hotels': preferences.get('hotels', 0.5)
-    }
-    
-    # Фільтруємо невідвідані об'єкти
-    available_attractions = [
-        attr for attr in ATTRACTIONS_DATA 
-        if attr.get('id') not in visited_ids
+    excluded = matrix.visited_mask(visited_ids)
+    if open_mask is not None:
+        excluded |= ~open_mask
+
+    if location is not None and radius_km is not None:
+        if candidate_rows is None:
+            rows, distances = get_spatial_index().within(location[0], location[1], radius_km)
+        else:
+            rows = candidate_rows
+            distances = haversine_km(location[0], location[1], matrix.table.lat[rows], matrix.table.lng[rows])
+            inside = distances <= radius_km
+            rows, distances = rows[inside], distances[inside]
+        keep = ~excluded[rows]
+        rows, distances = rows[keep], distances[keep]
+        scores = matrix.score_rows(preferences or {}, rows, distances, radius_km / 2)
+        top, top_scores = top_k_rows(scores, k, rows)
+        rows, distances = rows[top], distances[top]
+    else:
+        scores = matrix.score(preferences or {}, location)
+        scores[excluded] = -np.inf
+        rows, top_scores = top_k_rows(scores, k)
+        distances = (haversine_km(location[0], location[1], matrix.table.lat[rows], matrix.table.lng[rows])
+                     if location is not None else None)
+
+    table = matrix.table
+    return [
+        {
+            'attraction': table.records[row],
+            'score': float(score),
+            'distance_km': None if distances is None else round(float(distances[i]), 3),
+            'match_reason': f"Відповідає вашим інтересам: {table.records[row].get('category', 'other')}"
+        }
+        for i, (row, score) in enumerate(zip(rows.tolist(), top_scores.tolist()))
     ]
-    
-    # Підрахунок релевантності
-    scored_attractions = []
-    for attr in available_attractions:
-        category = attr.get('category', 'other')
-        base_score = category_weights.get(category, 0.1)
-        
-        # Додаткові фактори
-        popularity_bonus = random.uniform(0.1, 0.3)
-        rating_bonus = random.uniform(0.1, 0.4)
-        
-        total_score = base_score + popularity_bonus + rating_bonus
-        
-        scored_attractions.append({
-            'attraction': attr,
-            'score': total_score,
-            'match_reason': f"Відповідає вашим інтересам: {category}"
+
+
+def get_similar_text_recommendations(index: TextIndex, table: AttractionTable, row: int,
+                                     visited_ids=None, open_mask=None, k: int = 10) -> list:
+    """Режим «схожі за описом»: косинусна подібність TF-IDF векторів назви, опису й адреси"""
+    excluded = np.zeros(len(table), dtype=bool)
+    excluded[[table.row_by_id[i] for i in map(str, visited_ids or ()) if i in table.row_by_id]] = True
+    if open_mask is not None:
+        excluded |= ~open_mask
+    rows, scores = index.similar(row, k + int(excluded.sum()))
+    keep = ~excluded[rows]
+    name = table.records[row].get('name', '')
+    return [
+        {
+            'attraction': table.records[neighbor],
+            'score': float(score),
+            'distance_km': None,
+            'match_reason': f"Схоже за описом на «{name}»"
+        }
+        for neighbor, score in zip(rows[keep][:k].tolist(), scores[keep][:k].tolist())
+    ]
+
+
+def get_also_visited_recommendations(model: CoVisitationModel, table: AttractionTable, row: int,
+                                     visited_ids=None, open_mask=None, k: int = 10) -> list:
+    """Режим «ті, хто відвідав X, також відвідали»: готові top-N сусіди з моделі спільних відвідувань"""
+    rows, scores = model.neighbors_of(row)
+    excluded = {table.row_by_id[i] for i in map(str, visited_ids or ()) if i in table.row_by_id}
+    name = table.records[row].get('name', '')
+    result = []
+    for neighbor, score in zip(rows.tolist(), scores.tolist()):
+        if neighbor in excluded or (open_mask is not None and not open_mask[neighbor]):
+            continue
+        result.append({
+            'attraction': table.records[neighbor],
+            'score': float(score),
+            'distance_km': None,
+            'match_reason': f"Також відвідали туристи, які були в «{name}»"
         })
-    
-    # Сортування за score
-    scored_attractions.sort(key=lambda x: x['score'], reverse=True)
-    
-    return scored_attractions[:10]
+        if len(result) == k:
+            break
+    return result
 
 
 @api_router.post("/recommendations/personalized")
 async def get_recommendations(request: Request):
     """
     Персоналізовані рекомендації для туриста
+
+    Тіло запиту: preferences (ваги категорій), visited_ids, limit (1-50),
+    location {"lat", "lng"} - бонус за близькість, radius_km - лише об'єкти в радіусі подорожі,
+    open_at / include_unknown_hours,
+    mode: "preferences" (за замовчуванням) | "also_visited" | "similar_description" з attraction_id
+
+    Результати кешуються (TTLCache) за ключем: квантовані вподобання, відбиток visited_ids,
+    комірка сітки location та решта параметрів; ранжування рахується для центру комірки.
+    З radius_km кешуються лише кандидати комірки, а ранжування - для точного положення.
     """
     try:
         data = await request.json()
-        preferences = data.get('preferences', {})
-        visited_ids = data.get('visited_ids', [])
+        try:
+            preferences = quantize_preferences(data.get('preferences') or {})
+        except (AttributeError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="preferences must map categories to numbers")
+        visited_ids = data.get('visited_ids') or []
+        open_at = data.get('open_at')
+        try:
+            open_at = datetime.fromisoformat(open_at) if open_at else None
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="open_at must be an ISO 8601 datetime")
+        include_unknown = bool(data.get('include_unknown_hours', False))
+        location = data.get('location') or None
+        if location is not None:
+            try:
+                location = (float(location['lat']), float(location['lng']))
+            except (KeyError, TypeError, ValueError):
+                raise HTTPException(status_code=400, detail="location must contain numeric lat and lng")
+        try:
+            limit = int(data.get('limit', 10))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="limit must be an integer")
+        if not 1 <= limit <= MAX_RECOMMENDATIONS:
+            raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_RECOMMENDATIONS}")
+        radius_km = data.get('radius_km')
+        if radius_km is not None:
+            if location is None:
+                raise HTTPException(status_code=400, detail="radius_km requires location")
+            try:
+                radius_km = float(radius_km)
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail="radius_km must be a number")
+            if radius_km <= 0:
+                raise HTTPException(status_code=400, detail="radius_km must be positive")
         
-        recommendations = get_personalized_recommendations(preferences, visited_ids)
+        mode = data.get('mode', 'preferences')
+        cell, cell_center = location_cell(*location) if location is not None else (None, None)
+        table = get_attraction_table()
+        RECOMMENDATION_CACHE.ensure_version(table.version)
+        weights = {category: q * PREFERENCE_QUANTUM for category, q in preferences}
+        if mode == 'preferences' and radius_km is not None:
+            # Кешуються лише рядки-кандидати комірки (радіус, розширений на її півдіагональ);
+            # оцінка, точний радіус і top-k - щоразу для фактичного положення туриста
+            candidates_key = ('radius_candidates', cell, radius_km)
+            candidates = RECOMMENDATION_CACHE.get(candidates_key)
+            cached = candidates is not None
+            if not cached:
+                candidates, _ = get_spatial_index().within(cell_center[0], cell_center[1],
+                                                           radius_km + LOCATION_CELL_MARGIN_KM)
+                candidates = np.sort(candidates)
+                RECOMMENDATION_CACHE.set(candidates_key, candidates)
+            matrix = await get_recommendation_matrix()
+            recommendations = get_personalized_recommendations(
+                matrix, weights, visited_ids, open_at_mask(open_at, include_unknown), location, limit, radius_km,
+                candidate_rows=candidates
+            )
+            return {"success": True, "recommendations": recommendation_items(recommendations), "cached": cached}
+
+        cache_key = (
+            mode, str(data.get('attraction_id')), preferences, visited_digest(visited_ids), cell,
+            week_minute(open_at) if open_at else None, include_unknown, limit, radius_km
+        )
+        items = RECOMMENDATION_CACHE.get(cache_key)
+        if items is not None:
+            return {"success": True, "recommendations": with_distances(items, location), "cached": True}
         
-        return {
-            "success": True,
-            "recommendations": [
-                {
-                    'id': r['attraction'].get('id'),
-                    'name': r['attraction'].get('name'),
-                    'category': r['attraction'].get('category'),
-                    'address': r['attraction'].get('address'),
-                    'coordinates': r['attraction'].get('coordinates'),
-                    'score': round(r['score'], 2),
-                    'match_reason': r['match_reason']
-                }
-                for r in recommendations
-            ]
-        }
+        open_mask = open_at_mask(open_at, include_unknown)
+        if mode in ('also_visited', 'similar_description'):
+            row = table.row_by_id.get(str(data.get('attraction_id')))
+            if row is None:
+                raise HTTPException(status_code=404, detail="Attraction not found")
+            if mode == 'also_visited':
+                model = await get_covisitation_model()
+                recommendations = get_also_visited_recommendations(model, table, row, visited_ids, open_mask, limit)
+            else:
+                recommendations = get_similar_text_recommendations(get_text_index(), table, row, visited_ids,
+                                                                   open_mask, limit)
+        elif mode == 'preferences':
+            matrix = await get_recommendation_matrix()
+            recommendations = get_personalized_recommendations(matrix, weights, visited_ids, open_mask,
+                                                               cell_center, limit)
+        else:
+            raise HTTPException(status_code=400,
+                                detail="mode must be 'preferences', 'also_visited' or 'similar_description'")
+        
+        items = recommendation_items(recommendations)
+        RECOMMENDATION_CACHE.set(cache_key, items)
+        return {"success": True, "recommendations": with_distances(items, location), "cached": False}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Recommendations error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1550,6 +6327,16 @@ async def log_visit(request: Request):
         
         await db.visits.insert_one(visit)
         
+        # Інкрементальне оновлення моделі спільних відвідувань
+        if COVISITATION_MODEL is not None:
+            row = get_attraction_table().row_by_id.get(str(visit['attraction_id']))
+            if row is not None:
+                COVISITATION_MODEL.add_visit(visit['user_id'], row)
+        
+        # Інкрементальне оновлення лічильників маршрутів (після завершення пакетного проходу)
+        if ROUTE_PATTERNS is not None and ROUTE_PATTERNS.live:
+            await record_route_visit(ROUTE_PATTERNS, get_attraction_table(), visit)
+        
         return {
             "success": True,
             "message": "Відвідування зареєстровано"
@@ -1559,6 +6346,101 @@ async def log_visit(request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def recommendation_items(recommendations: list) -> list:
+    """Поля рекомендацій, що повертаються клієнту (і зберігаються в кеші)"""
+    return [
+        {
+            'id': r['attraction'].get('id'),
+            'name': r['attraction'].get('name'),
+            'category': r['attraction'].get('category'),
+            'address': r['attraction'].get('address'),
+            'coordinates': r['attraction'].get('coordinates'),
+            'score': round(r['score'], 2),
+            'distance_km': r['distance_km'],
+            'match_reason': r['match_reason']
+        }
+        for r in recommendations
+    ]
+
+
+def with_distances(items: list, location) -> list:
+    """Копії закешованих рекомендацій з відстанню від точного (не центру комірки) положення туриста"""
+    if location is None:
+        return items
+    result = []
+    for item in items:
+        coords = item.get('coordinates') or {}
+        distance = None
+        if item['distance_km'] is not None and coords.get('lat') is not None:
+            distance = round(float(haversine_km(location[0], location[1], coords['lat'], coords['lng'])), 3)
+        result.append({**item, 'distance_km': distance})
+    return result
+
+
+@api_router.get("/recommendations/cache/stats")
+async def get_recommendation_cache_stats():
+    """Статистика кешу рекомендацій (розмір, влучання, прострочені записи)"""
+    return {"success": True, "data": RECOMMENDATION_CACHE.stats()}
+
+
+@api_router.post("/recommendations/covisitation/rebuild")
+async def rebuild_covisitation(similarity: Optional[str] = None, admin: bool = Depends(verify_admin)):
+    """Позапланова перебудова моделі спільних відвідувань (similarity: cosine | jaccard)"""
+    if similarity is not None and similarity not in COVISITATION_SIMILARITIES:
+        raise HTTPException(status_code=400, detail=f"similarity must be one of {list(COVISITATION_SIMILARITIES)}")
+    model = await build_covisitation_model(similarity)
+    RECOMMENDATION_CACHE.clear()
+    return {"success": True, "data": model.stats()}
+
+
+@api_router.get("/attractions/{attraction_id}/next")
+async def get_next_stops(attraction_id: str, k: int = 10, previous: Optional[str] = None):
+    """
+    Найімовірніші наступні зупинки після об'єкта за частими маршрутами туристів (db.visits).
+    previous - попередня зупинка: спершу враховуються трійки previous → attraction_id → next.
+    """
+    if k < 1 or k > MAX_NEXT_STOPS:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {MAX_NEXT_STOPS}")
+
+    table = get_attraction_table()
+    row = table.row_by_id.get(attraction_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Attraction not found")
+    previous_row = None
+    if previous is not None:
+        previous_row = table.row_by_id.get(previous)
+        if previous_row is None:
+            raise HTTPException(status_code=404, detail="Previous attraction not found")
+
+    model = await get_route_patterns()
+    stops = model.next_stops(row, k, previous_row) if model is not None and model.n_items == len(table) else []
+    return {
+        "success": True,
+        "attraction_id": attraction_id,
+        "total": len(stops),
+        "data": [
+            {
+                'id': table.records[nxt].get('id'),
+                'name': table.records[nxt].get('name'),
+                'category': table.records[nxt].get('category'),
+                'coordinates': table.records[nxt].get('coordinates'),
+                'probability': round(probability, 4),
+                'transitions': count,
+                'pattern': pattern
+            }
+            for nxt, probability, count, pattern in stops
+        ],
+        "complete": bool(model is not None and model.done)
+    }
+
+
+@api_router.post("/recommendations/route-patterns/rebuild")
+async def rebuild_route_patterns(admin: bool = Depends(verify_admin)):
+    """Позаплановий повний прохід по db.visits для шаблонів маршрутів"""
+    model = await mine_route_patterns(resume=False)
+    return {"success": True, "data": model.stats()}
+
+
 @api_router.get("/visits/statistics")
 async def get_visit_statistics():
     """
@@ -1696,6 +6578,10 @@ async def get_full_spatial_analysis():
         # Статистика по районах
         district_stats = calculate_district_statistics_geopandas()
         
+        # Буферні зони та відстані між об'єктами (кеш на версію набору даних)
+        buffer_analysis = [calculate_buffer_analysis(radius) for radius in BUFFER_RADII_KM]
+        distance_analysis = calculate_nearest_neighbor_distances()
+        
         # Загальна статистика
         total_objects = len(ATTRACTIONS_DATA)
         objects_with_coords = sum(1 for a in ATTRACTIONS_DATA 
@@ -1703,10 +6589,7 @@ async def get_full_spatial_analysis():
         
         # Географічні межі Житомирської області (Розділ 2.4)
         geo_bounds = {
-            "lat_min": 49.44,
-            "lat_max": 51.50,
-            "lng_min": 27.15,
-            "lng_max": 29.15,
+            **OBLAST_BOUNDS,
             "description": "Географічні межі Житомирської області"
         }
         
@@ -1720,6 +6603,8 @@ async def get_full_spatial_analysis():
             },
             "geographic_bounds": geo_bounds,
             "district_statistics": district_stats,
+            "buffer_analysis": buffer_analysis,
+            "distance_analysis": distance_analysis,
             "geopandas_info": {
                 "library_version": gpd.__version__,
                 "crs": "EPSG:4326 (WGS84)",
@@ -1728,7 +6613,9 @@ async def get_full_spatial_analysis():
                     "Point-in-polygon (spatial join)",
                     "Distance calculation",
                     "Area calculation",
-                    "Centroid computation"
+                    "Centroid computation",
+                    "Buffer zones (KD-tree, UTM 35N)",
+                    "Nearest-neighbour distances (Clark-Evans index)"
                 ]
             },
             "methodology_reference": "Розділ 2.5: Інтеграція алгоритму з геоінформаційною системою"
@@ -1738,6 +6625,237 @@ async def get_full_spatial_analysis():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@api_router.get("/geo/buffer-analysis")
+async def get_buffer_analysis(radius: float = 5.0, include_attractions: bool = False):
+    """
+    Буферний аналіз: кількість об'єктів у радіусі radius км від центрів районів
+    та від кожного об'єкта (include_attractions=true - з переліком по об'єктах)
+    """
+    if not (0 < radius <= 100):
+        raise HTTPException(status_code=400, detail="Radius must be between 0 and 100 km")
+
+    try:
+        return {
+            "success": True,
+            "data": calculate_buffer_analysis(radius, include_attractions),
+            "dataset_version": get_attraction_table().version
+        }
+    except Exception as e:
+        logger.error(f"Buffer analysis error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/geo/hotspots")
+async def get_spatial_hotspots(variable: str = "rating", weights: str = "knn", k: int = 8,
+                               band_km: float = 2.0, permutations: int = 999, include_all: bool = False):
+    """
+    Просторова автокореляція: глобальний I Морана та локальні Gi* z-оцінки
+
+    - variable: rating | visits (кількість відвідувань з db.visits)
+    - weights: knn (k сусідів) | distance_band (сусіди в радіусі band_km)
+    - permutations: кількість перестановок для псевдо-p (0 - лише аналітичний тест)
+    """
+    if variable not in HOTSPOT_VARIABLES:
+        raise HTTPException(status_code=400, detail=f"variable must be one of {HOTSPOT_VARIABLES}")
+    if weights not in HOTSPOT_WEIGHT_TYPES:
+        raise HTTPException(status_code=400, detail=f"weights must be one of {HOTSPOT_WEIGHT_TYPES}")
+    if not (1 <= k <= 50):
+        raise HTTPException(status_code=400, detail="k must be between 1 and 50")
+    if not (0 < band_km <= 50):
+        raise HTTPException(status_code=400, detail="band_km must be between 0 and 50")
+    if not (0 <= permutations <= 9999):
+        raise HTTPException(status_code=400, detail="permutations must be between 0 and 9999")
+
+    try:
+        result = await calculate_hotspots(variable, weights, k, band_km, permutations, include_all)
+        return {
+            "success": True,
+            "data": result,
+            "dataset_version": get_attraction_table().version,
+            "methodology": {
+                "global": "Moran's I (row-standardized weights, normality + permutation inference)",
+                "local": "Getis-Ord Gi* (binary weights incl. self)",
+                "crs": f"{METRIC_CRS} (UTM 35N)"
+            }
+        }
+    except Exception as e:
+        logger.error(f"Hotspot analysis error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/geo/coverage-gaps")
+async def get_coverage_gaps(resolution_m: int = 2000, threshold_km: float = 10.0,
+                            category: Optional[str] = None, limit: int = 1000):
+    """
+    Аналіз прогалин покриття: клітинки сітки, віддалені від найближчого об'єкта
+    (заданої категорії) більше ніж на threshold_km
+    """
+    if not (COVERAGE_MIN_RESOLUTION_M <= resolution_m <= 20000):
+        raise HTTPException(status_code=400, detail=f"resolution_m must be between {COVERAGE_MIN_RESOLUTION_M} and 20000")
+    if threshold_km <= 0:
+        raise HTTPException(status_code=400, detail="threshold_km must be positive")
+    if not (1 <= limit <= 20000):
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 20000")
+
+    try:
+        table = get_attraction_table()
+        if category and category not in table.category_index:
+            raise HTTPException(status_code=404, detail="Category not found")
+
+        grid = get_coverage_grid(resolution_m)
+        return {
+            "success": True,
+            "data": find_coverage_gaps(grid, threshold_km, category, limit),
+            "dataset_version": COVERAGE_CACHE.version
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Coverage gaps error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/geo/service-areas")
+async def get_voronoi_service_areas(category: Optional[str] = None):
+    """
+    Зони обслуговування (діаграма Вороного) об'єктів категорії, обрізані межами районів.
+    Для кожної комірки - обслуговуючий об'єкт та площа в км².
+    """
+    try:
+        table = get_attraction_table()
+        if category and category not in table.category_index:
+            raise HTTPException(status_code=404, detail="Category not found")
+
+        return Response(
+            content=get_service_areas(category),
+            media_type="application/geo+json",
+            headers={"Cache-Control": "public, max-age=300"}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Service areas error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/geo/districts")
+async def get_district_geometries(zoom: Optional[int] = None):
+    """
+    Межі районів у форматі GeoJSON, спрощені під масштаб карти
+
+    Кожен Feature містить попередньо обчислені площу (км²), центроїд та межі.
+    Без параметра zoom повертається повна точність.
+    """
+    if zoom is not None and not (0 <= zoom <= 22):
+        raise HTTPException(status_code=400, detail="Zoom must be between 0 and 22")
+
+    try:
+        geometry_cache = get_district_geometry()
+        tolerance = geometry_cache.tolerance_for_zoom(zoom)
+        return Response(
+            content=geometry_cache.geojson.get(tolerance, b'{"type":"FeatureCollection","features":[]}'),
+            media_type="application/geo+json",
+            headers={"Cache-Control": "public, max-age=3600", "X-Simplify-Tolerance": str(tolerance)}
+        )
+    except Exception as e:
+        logger.error(f"District geometries error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def validate_tile_coordinates(z: int, x: int, y: int):
+    """Перевірка координат тайла Web Mercator"""
+    if z < 0 or z > 20:
+        raise HTTPException(status_code=400, detail="Zoom must be between 0 and 20")
+    if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=400, detail="Tile coordinates out of range")
+
+
+@api_router.get("/geo/heatmap/{z}/{x}/{y}.png")
+async def get_heatmap_tile_png(z: int, x: int, y: int, weight: str = "none",
+                               bandwidth: Optional[float] = None):
+    """
+    Тайл теплової карти щільності туристичних об'єктів (гаусова KDE)
+
+    - weight: none | rating | visits (відвідування з db.visits)
+    - bandwidth: ширина ядра в км (за замовчуванням залежить від масштабу)
+    """
+    validate_tile_coordinates(z, x, y)
+    if weight not in HEATMAP_WEIGHTS:
+        raise HTTPException(status_code=400, detail=f"weight must be one of {HEATMAP_WEIGHTS}")
+    if bandwidth is not None and not (0.05 <= bandwidth <= 50):
+        raise HTTPException(status_code=400, detail="bandwidth must be between 0.05 and 50 km")
+
+    try:
+        png = await get_heatmap_tile(z, x, y, 'png', HEATMAP_TILE_SIZE, weight, bandwidth)
+        return Response(content=png, media_type="image/png", headers={"Cache-Control": "public, max-age=300"})
+    except Exception as e:
+        logger.error(f"Heatmap tile error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/geo/heatmap/{z}/{x}/{y}.json")
+async def get_heatmap_tile_json(z: int, x: int, y: int, weight: str = "none",
+                                bandwidth: Optional[float] = None, size: int = 64):
+    """
+    Сітка щільності KDE для тайла у форматі JSON (об'єктів на км²)
+    """
+    validate_tile_coordinates(z, x, y)
+    if weight not in HEATMAP_WEIGHTS:
+        raise HTTPException(status_code=400, detail=f"weight must be one of {HEATMAP_WEIGHTS}")
+    if bandwidth is not None and not (0.05 <= bandwidth <= 50):
+        raise HTTPException(status_code=400, detail="bandwidth must be between 0.05 and 50 km")
+    if size < 4 or size > HEATMAP_TILE_SIZE:
+        raise HTTPException(status_code=400, detail=f"size must be between 4 and {HEATMAP_TILE_SIZE}")
+
+    try:
+        grid = await get_heatmap_tile(z, x, y, 'json', size, weight, bandwidth)
+        return {"success": True, "data": grid}
+    except Exception as e:
+        logger.error(f"Heatmap grid error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ============= VECTOR TILE ENDPOINTS =============
+
+@api_router.get("/tiles/{z}/{x}/{y}.mvt")
+async def get_vector_tile(z: int, x: int, y: int):
+    """
+    Векторний тайл (Mapbox Vector Tile) з шарами attractions та districts
+    """
+    if z > MVT_MAX_ZOOM:
+        raise HTTPException(status_code=400, detail=f"Zoom must be between 0 and {MVT_MAX_ZOOM}")
+    validate_tile_coordinates(z, x, y)
+
+    try:
+        tile = get_mvt_tile(z, x, y)
+        return Response(
+            content=tile,
+            media_type="application/vnd.mapbox-vector-tile",
+            headers={"Cache-Control": "public, max-age=300"}
+        )
+    except Exception as e:
+        logger.error(f"Vector tile error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.post("/tiles/prerender")
+async def prerender_vector_tiles(background_tasks: BackgroundTasks, min_zoom: int = 6, max_zoom: int = 12,
+                                 admin: bool = Depends(verify_admin)):
+    """Попередній рендер векторних тайлів на диск (admin only)"""
+    if not (0 <= min_zoom <= max_zoom <= MVT_PRERENDER_MAX_ZOOM):
+        raise HTTPException(status_code=400, detail=f"Zoom range must be within 0..{MVT_PRERENDER_MAX_ZOOM}")
+
+    def run_prerender():
+        try:
+            count = prerender_mvt_tiles(min_zoom, max_zoom)
+            logger.info(f"Pre-rendered {count} vector tiles (z{min_zoom}-{max_zoom})")
+        except Exception as e:
+            logger.error(f"Vector tile pre-render error: {str(e)}")
+
+    background_tasks.add_task(run_prerender)
+    return {"success": True, "message": "Pre-render started", "min_zoom": min_zoom, "max_zoom": max_zoom}
+
+
 # ============= CLUSTER ANALYTICS ENDPOINTS =============
 
 def calculate_clustering_for_k(k_value: int):
@@ -2175,6 +7293,13 @@ async def upload_data(request: DataUploadRequest):
         else:
             recommendations.append("✅ Збалансована кількість категорій!")
         
+        # Зворотне геокодування завантажених об'єктів тим самим пакетним методом
+        localities = get_gazetteer().resolve_records(attractions_data)
+        for attraction, locality in zip(attractions_data, localities):
+            if locality:
+                attraction['locality'] = locality
+        resolved_localities = sum(1 for locality in localities if locality)
+        
         coords_percentage = (valid_coordinates / total_objects * 100) if total_objects > 0 else 0
         if coords_percentage < 80:
             recommendations.append("⚠️ Багато об'єктів без координат. Додайте геолокацію.")
@@ -2190,6 +7315,7 @@ async def upload_data(request: DataUploadRequest):
             "avgPerCluster": round(avg_per_cluster, 1),
             "validCoordinates": valid_coordinates,
             "coordinatesPercentage": round(coords_percentage, 1),
+            "resolvedLocalities": resolved_localities,
             "silhouetteScore": silhouette_score,
             "daviesBouldinIndex": davies_bouldin_index,
             "recommendations": recommendations,
@@ -2230,9 +7356,62 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def load_place_overrides():
+    """Застосування збережених правок адміністратора (db.places) до in-memory набору даних"""
+    try:
+        custom_places = await db.places.find({}, {"_id": 0}).sort("updated_at", 1).to_list(None)
+        for place in custom_places:
+            if 'original_id' in place:
+                apply_place_edit(place['original_id'], place)
+        logger.info(f"Applied {len(custom_places)} admin place edits, dataset version {DATASET_VERSION}")
+    except Exception as e:
+        logger.error(f"Failed to load admin place edits: {str(e)}")
+
+# Хуки запуску виконуються в порядку реєстрації - наступні бачать уже застосовані правки
+@app.on_event("startup")
+async def warm_reverse_geocoding():
+    """Зворотне геокодування всіх об'єктів одним пакетним проходом"""
+    try:
+        localities = get_attraction_localities()
+        logger.info(f"Reverse geocoded {sum(1 for l in localities if l)} attractions to settlements")
+    except Exception as e:
+        logger.error(f"Failed to reverse geocode attractions: {str(e)}")
+
+@app.on_event("startup")
+async def warm_text_index():
+    """TF-IDF індекс для пошуку схожих за описом і довідки AI-помічника"""
+    try:
+        text_index = get_text_index()
+        logger.info(f"Text index ready: {text_index.matrix.shape[0]} documents, {text_index.matrix.shape[1]} n-grams")
+    except Exception as e:
+        logger.error(f"Failed to build text index: {str(e)}")
+
+@app.on_event("startup")
+async def start_covisitation_refresh():
+    """Перебудова моделі спільних відвідувань за розкладом"""
+    import asyncio
+    global _COVISITATION_TASK
+
+    _COVISITATION_TASK = asyncio.create_task(covisitation_refresh_loop())
+
+@app.on_event("startup")
+async def start_route_mining():
+    """Пакетний прохід шаблонів маршрутів (з контрольної точки) і повтор за розкладом"""
+    import asyncio
+    global _ROUTE_MINING_TASK
+
+    _ROUTE_MINING_TASK = asyncio.create_task(route_mining_loop())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if _COVISITATION_TASK is not None:
+        _COVISITATION_TASK.cancel()
+    if _ROUTE_MINING_TASK is not None:
+        _ROUTE_MINING_TASK.cancel()
     client.close()
+    if _HOTSPOT_POOL is not None:
+        _HOTSPOT_POOL.shutdown(wait=False, cancel_futures=True)
 @app.get("/api/download-presentation")
 async def download_presentation():
     """Download the presentation PDF"""
@@ -810,6 +810,322 @@ class BackendTester:
             self.log_result("GeoPandas District Statistics API", "FAIL",
                           "Request failed", e)
     
+    def test_nearby_search_api(self):
+        """Test nearest-neighbour and radius search endpoints"""
+        try:
+            print("\n📍 Testing Nearby Search")
+            print("-" * 60)
+            
+            params = {"lat": 50.2547, "lng": 28.6587, "radius": 2, "k": 50}
+            response = requests.get(f"{BACKEND_URL}/attractions/nearby", params=params, timeout=10)
+            
+            if response.status_code == 200:
+                data = response.json()
+                results = data.get("data", [])
+                distances = [r.get("distance_km", 0) for r in results]
+                
+                if data.get("success") and distances == sorted(distances) and all(d <= 2 for d in distances):
+                    self.log_result("Nearby Search - Radius Query", "PASS",
+                                  f"{len(results)} objects within 2 km, sorted by distance")
+                else:
+                    self.log_result("Nearby Search - Radius Query", "FAIL",
+                                  f"Unsorted or out-of-radius results: {distances[:10]}")
+            else:
+                self.log_result("Nearby Search - Radius Query", "FAIL",
+                              f"HTTP {response.status_code}: {response.text}")
+            
+            params = {"lat": 50.2547, "lng": 28.6587, "k": 20, "open_at": "2026-10-19T23:30:00"}
+            response = requests.get(f"{BACKEND_URL}/attractions/nearby", params=params, timeout=10)
+            
+            if response.status_code == 200 and response.json().get("success"):
+                self.log_result("Nearby Search - Open At Filter", "PASS",
+                              f"{response.json().get('total')} objects open on Monday 23:30")
+            else:
+                self.log_result("Nearby Search - Open At Filter", "FAIL",
+                              f"HTTP {response.status_code}: {response.text}")
+            
+            batch = {"points": [{"lat": 50.2547, "lng": 28.6587}, {"lat": 49.8992, "lng": 28.6025}], "k": 5}
+            response = requests.post(f"{BACKEND_URL}/attractions/nearby/batch", json=batch, timeout=10)
+            
+            if response.status_code == 200 and len(response.json().get("data", [])) == 2:
+                self.log_result("Nearby Search - Batch Query", "PASS",
+                              "Results returned for every query point")
+            else:
+                self.log_result("Nearby Search - Batch Query", "FAIL",
+                              f"HTTP {response.status_code}: {response.text}")
+                
+        except Exception as e:
+            self.log_result("Nearby Search API", "FAIL", "Request failed", e)
+
+    def test_trip_route_optimizer(self):
+        """Test trip route optimization and distance/time calculation"""
+        try:
+            print("\n🧭 Testing Trip Route Optimizer")
+            print("-" * 60)
+            
+            points = [(50.2547, 28.6587), (49.8992, 28.6025), (50.9550, 28.6386),
+                      (50.2600, 28.6700), (49.9100, 28.5900), (50.9400, 28.6500)]
+            places = [{"place_id": str(i), "name": f"Point {i}", "order": i,
+                       "coordinates": {"lat": lat, "lng": lng}} for i, (lat, lng) in enumerate(points)]
+            
+            response = requests.post(f"{BACKEND_URL}/trips", json={"name": "Route test", "places": places}, timeout=10)
+            if response.status_code != 200:
+                self.log_result("Trip Optimizer - Create Trip", "FAIL",
+                              f"HTTP {response.status_code}: {response.text}")
+                return
+            
+            trip = response.json()
+            if trip.get("total_distance") and trip.get("estimated_time"):
+                self.log_result("Trip Optimizer - Distance On Save", "PASS",
+                              f"{trip['total_distance']} km, {trip['estimated_time']}")
+            else:
+                self.log_result("Trip Optimizer - Distance On Save", "FAIL",
+                              "total_distance/estimated_time not computed")
+            
+            response = requests.post(f"{BACKEND_URL}/trips/{trip['id']}/optimize", timeout=10)
+            if response.status_code == 200:
+                optimized = response.json()
+                first = optimized["places"][0]["place_id"]
+                if optimized["total_distance"] < trip["total_distance"] and first == "0":
+                    self.log_result("Trip Optimizer - Optimize", "PASS",
+                                  f"{trip['total_distance']} km -> {optimized['total_distance']} km")
+                else:
+                    self.log_result("Trip Optimizer - Optimize", "FAIL",
+                                  f"Route not improved: {optimized['total_distance']} km, start {first}")
+            else:
+                self.log_result("Trip Optimizer - Optimize", "FAIL",
+                              f"HTTP {response.status_code}: {response.text}")
+            
+            requests.delete(f"{BACKEND_URL}/trips/{trip['id']}", timeout=10)
+                
+        except Exception as e:
+            self.log_result("Trip Optimizer API", "FAIL", "Request failed", e)
+
+    def test_trip_generator(self):
+        """Test multi-day itinerary generation"""
+        try:
+            print("\n🗓️ Testing Trip Generator")
+            print("-" * 60)
+            
+            request = {"start": {"lat": 50.2547, "lng": 28.6587}, "days": 3,
+                       "preferences": {"historical": 1.0, "nature": 0.8}, "daily_hours": 6}
+            response = requests.post(f"{BACKEND_URL}/trips/generate", json=request, timeout=10)
+            
+            if response.status_code == 200:
+                trip = response.json()
+                days = {p.get("day") for p in trip.get("places", [])}
+                if trip.get("places") and days <= {1, 2, 3} and trip.get("estimated_time"):
+                    self.log_result("Trip Generator - 3 Days", "PASS",
+                                  f"{len(trip['places'])} places over {len(days)} days, {trip['total_distance']} km")
+                else:
+                    self.log_result("Trip Generator - 3 Days", "FAIL",
+                                  f"Unexpected plan: days {sorted(days)}")
+            else:
+                self.log_result("Trip Generator - 3 Days", "FAIL",
+                              f"HTTP {response.status_code}: {response.text}")
+                
+        except Exception as e:
+            self.log_result("Trip Generator API", "FAIL", "Request failed", e)
+
+    def test_recommendations_api(self):
+        """Test deterministic personalized recommendations"""
+        try:
+            print("\n💡 Testing Personalized Recommendations")
+            print("-" * 60)
+            
+            request = {"preferences": {"historical": 0.9, "nature": 0.7, "gastro": 0.2}, "visited_ids": []}
+            first = requests.post(f"{BACKEND_URL}/recommendations/personalized", json=request, timeout=10)
+            second = requests.post(f"{BACKEND_URL}/recommendations/personalized", json=request, timeout=10)
+            
+            if first.status_code == 200 and second.status_code == 200:
+                items = first.json().get("recommendations", [])
+                scores = [r["score"] for r in items]
+                if (items and items == second.json().get("recommendations") and second.json().get("cached")
+                        and scores == sorted(scores, reverse=True)):
+                    self.log_result("Recommendations - Deterministic Ranking", "PASS",
+                                  f"{len(items)} results, top: {items[0]['name']}")
+                else:
+                    self.log_result("Recommendations - Deterministic Ranking", "FAIL",
+                                  "Results differ between identical requests or are unsorted")
+            else:
+                self.log_result("Recommendations - Deterministic Ranking", "FAIL",
+                              f"HTTP {first.status_code}: {first.text}")
+
+            response = requests.get(f"{BACKEND_URL}/recommendations/cache/stats", timeout=10)
+            if response.status_code == 200 and response.json().get("data", {}).get("hits", 0) > 0:
+                self.log_result("Recommendations - Result Cache", "PASS", f"Stats: {response.json()['data']}")
+            else:
+                self.log_result("Recommendations - Result Cache", "FAIL",
+                              f"HTTP {response.status_code}: {response.text}")
+                
+        except Exception as e:
+            self.log_result("Recommendations API", "FAIL", "Request failed", e)
+
+    def test_similar_places_api(self):
+        """Test content-similarity search in the clustering feature space"""
+        try:
+            print("\n🔗 Testing Similar Places")
+            print("-" * 60)
+            
+            response = requests.get(f"{BACKEND_URL}/attractions/10/similar", params={"k": 5}, timeout=10)
+            
+            if response.status_code == 200:
+                data = response.json()
+                similarity = [r.get("similarity", 0) for r in data.get("data", [])]
+                if data.get("success") and similarity == sorted(similarity, reverse=True):
+                    self.log_result("Similar Places - Single", "PASS",
+                                  f"{len(similarity)} similar places, best {similarity[:1]}")
+                else:
+                    self.log_result("Similar Places - Single", "FAIL", f"Unsorted similarity: {similarity}")
+            else:
+                self.log_result("Similar Places - Single", "FAIL",
+                              f"HTTP {response.status_code}: {response.text}")
+
+            request = {"mode": "similar_description", "attraction_id": 10, "limit": 5}
+            response = requests.post(f"{BACKEND_URL}/recommendations/personalized", json=request, timeout=10)
+
+            if response.status_code == 200:
+                items = response.json().get("recommendations", [])
+                scores = [r["score"] for r in items]
+                if all(r["id"] != 10 for r in items) and scores == sorted(scores, reverse=True):
+                    self.log_result("Similar Places - By Description", "PASS",
+                                  f"{len(items)} places, top: {items[0]['name'] if items else None}")
+                else:
+                    self.log_result("Similar Places - By Description", "FAIL", f"Unexpected ranking: {scores}")
+            else:
+                self.log_result("Similar Places - By Description", "FAIL",
+                              f"HTTP {response.status_code}: {response.text}")
+
+        except Exception as e:
+            self.log_result("Similar Places API", "FAIL", "Request failed", e)
+
+    def test_next_stops_api(self):
+        """Test next-stop suggestions mined from visit sequences"""
+        try:
+            print("\n🧭 Testing Next Stop Suggestions")
+            print("-" * 60)
+            
+            user_id = f"route-test-{uuid.uuid4().hex[:8]}"
+            for attraction_id, visit_date in ((10, "2026-07-01T10:00:00"), (57, "2026-07-01T11:30:00")):
+                requests.post(f"{BACKEND_URL}/visits/log", json={
+                    "attraction_id": attraction_id, "user_id": user_id, "visit_date": visit_date
+                }, timeout=10)
+            
+            response = requests.get(f"{BACKEND_URL}/attractions/10/next", params={"k": 5}, timeout=30)
+            
+            if response.status_code == 200:
+                data = response.json()
+                probabilities = [r["probability"] for r in data.get("data", [])]
+                if data.get("success") and probabilities == sorted(probabilities, reverse=True):
+                    self.log_result("Next Stops - Route Patterns", "PASS",
+                                  f"{len(probabilities)} next stops, complete: {data.get('complete')}")
+                else:
+                    self.log_result("Next Stops - Route Patterns", "FAIL", f"Unsorted: {probabilities}")
+            else:
+                self.log_result("Next Stops - Route Patterns", "FAIL",
+                              f"HTTP {response.status_code}: {response.text}")
+                
+        except Exception as e:
+            self.log_result("Next Stops API", "FAIL", "Request failed", e)
+
+    def test_search_api(self):
+        """Test full-text search with transliteration and autocomplete"""
+        try:
+            print("\n🔎 Testing Full-Text Search")
+            print("-" * 60)
+            
+            cyrillic = requests.get(f"{BACKEND_URL}/search", params={"q": "Житомир", "limit": 5}, timeout=10)
+            latin = requests.get(f"{BACKEND_URL}/search", params={"q": "Zhytomyr", "limit": 5}, timeout=10)
+            
+            if cyrillic.status_code == 200 and latin.status_code == 200:
+                names = [r["name"] for r in cyrillic.json().get("data", [])]
+                if names and names == [r["name"] for r in latin.json().get("data", [])]:
+                    self.log_result("Search - Transliteration", "PASS",
+                                  f"{cyrillic.json().get('total')} matches, top: {names[0]}")
+                else:
+                    self.log_result("Search - Transliteration", "FAIL",
+                                  "Cyrillic and Latin queries returned different results")
+            else:
+                self.log_result("Search - Transliteration", "FAIL",
+                              f"HTTP {cyrillic.status_code}/{latin.status_code}")
+            
+            response = requests.get(f"{BACKEND_URL}/search", params={"q": "Бердичив", "limit": 5}, timeout=10)
+            if response.status_code == 200 and any(r.get("match") == "fuzzy" for r in response.json().get("data", [])):
+                self.log_result("Search - Fuzzy Matching", "PASS",
+                              f"Misspelled query found: {[r['name'] for r in response.json()['data'][:3]]}")
+            else:
+                self.log_result("Search - Fuzzy Matching", "FAIL",
+                              f"HTTP {response.status_code}: {response.text}")
+            
+            response = requests.get(f"{BACKEND_URL}/search/autocomplete", params={"q": "муз"}, timeout=10)
+            if response.status_code == 200 and response.json().get("suggestions"):
+                self.log_result("Search - Autocomplete", "PASS",
+                              f"Suggestions: {[s['name'] for s in response.json()['suggestions'][:3]]}")
+            else:
+                self.log_result("Search - Autocomplete", "FAIL",
+                              f"HTTP {response.status_code}: {response.text}")
+                
+        except Exception as e:
+            self.log_result("Search API", "FAIL", "Request failed", e)
+
+    def test_faceted_query_api(self):
+        """Test faceted attraction filtering with facet counts"""
+        try:
+            print("\n🧮 Testing Faceted Query")
+            print("-" * 60)
+            
+            params = {"category": "historical,culture", "min_rating": 4, "limit": 10}
+            response = requests.get(f"{BACKEND_URL}/attractions/query", params=params, timeout=10)
+            
+            if response.status_code == 200:
+                data = response.json()
+                facets = data.get("facets", {})
+                selected = sum(facets.get("category", {}).get(c, 0) for c in ("historical", "culture"))
+                if data.get("success") and selected == data.get("total") and "district" in facets:
+                    self.log_result("Faceted Query - Counts", "PASS",
+                                  f"{data.get('total')} matches, districts: {facets['district']}")
+                else:
+                    self.log_result("Faceted Query - Counts", "FAIL",
+                                  f"Facet counts {facets.get('category')} do not match total {data.get('total')}")
+            else:
+                self.log_result("Faceted Query - Counts", "FAIL",
+                              f"HTTP {response.status_code}: {response.text}")
+                
+        except Exception as e:
+            self.log_result("Faceted Query API", "FAIL", "Request failed", e)
+
+    def test_attractions_list_api(self):
+        """Test paginated attractions API with projection and ETag"""
+        try:
+            print("\n📄 Testing Paginated Attractions API")
+            print("-" * 60)
+            
+            params = {"limit": 50, "fields": "id,name,coordinates", "precision": 5}
+            response = requests.get(f"{BACKEND_URL}/attractions", params=params, timeout=10)
+            
+            if response.status_code == 200:
+                data = response.json()
+                items = data.get("data", [])
+                if len(items) == 50 and all(set(item) == {"id", "name", "coordinates"} for item in items):
+                    self.log_result("Attractions - Projection", "PASS",
+                                  f"{data.get('total')} total, next cursor: {data.get('next_cursor')}")
+                else:
+                    self.log_result("Attractions - Projection", "FAIL", f"Unexpected page: {items[:2]}")
+                
+                etag = response.headers.get("ETag")
+                cached = requests.get(f"{BACKEND_URL}/attractions", params=params,
+                                      headers={"If-None-Match": etag or ""}, timeout=10)
+                if etag and cached.status_code == 304:
+                    self.log_result("Attractions - ETag", "PASS", f"304 Not Modified for {etag}")
+                else:
+                    self.log_result("Attractions - ETag", "FAIL", f"HTTP {cached.status_code} for ETag {etag}")
+            else:
+                self.log_result("Attractions - Projection", "FAIL",
+                              f"HTTP {response.status_code}: {response.text}")
+                
+        except Exception as e:
+            self.log_result("Attractions List API", "FAIL", "Request failed", e)
+
     def run_all_tests(self):
         """Run all backend tests"""
         print("🚀 Starting Comprehensive Backend Testing for Zhytomyr Tourism Website")
@@ -840,6 +1156,23 @@ class BackendTester:
         # Additional analytics tests
         self.test_cluster_analytics_apis()
         
+        # Spatial search tests
+        self.test_nearby_search_api()
+        
+        # Trip planner tests
+        self.test_trip_route_optimizer()
+        self.test_trip_generator()
+        
+        # Recommendation tests
+        self.test_recommendations_api()
+        self.test_similar_places_api()
+        self.test_next_stops_api()
+        
+        # Search tests
+        self.test_search_api()
+        self.test_faceted_query_api()
+        self.test_attractions_list_api()
+        
         # Other API tests
         self.test_data_upload_api()
         self.test_google_places_api()